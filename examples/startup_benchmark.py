@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+    Startup time benchmark for DataExplore.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+#Reports the time to import pandastable.app and the time until the
+#first table is drawn. Each run is done in a new python process so that
+#modules are not already loaded. Heavy modules that were imported during
+#startup are also listed, these should only be loaded when needed.
+#
+#Usage: python startup_benchmark.py [-n runs] [-p project file]
+
+import sys, os
+import json
+import subprocess
+from optparse import OptionParser
+
+heavy = ['matplotlib', 'matplotlib.pyplot', 'pandastable.plotting',
+         'pandastable.stats', 'statsmodels', 'seaborn', 'IPython']
+
+script = '''
+import sys, time, json
+t1 = time.perf_counter()
+from pandastable import app
+t2 = time.perf_counter()
+projfile = %r
+if projfile is None:
+    a = app.DataExplore()
+else:
+    a = app.DataExplore(projfile=projfile)
+a.update()
+t3 = time.perf_counter()
+loaded = [m for m in %r if m in sys.modules and
+          not type(sys.modules[m]).__name__.startswith('_Lazy')]
+a.main.destroy()
+print(json.dumps({'import': t2-t1, 'paint': t3-t2, 'loaded': loaded}))
+'''
+
+def run(projfile=None):
+    """Time one startup in a new process"""
+
+    code = script %(projfile, heavy)
+    out = subprocess.check_output([sys.executable, '-c', code])
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-n", "--runs", dest="runs", type="int", default=5,
+                        help="Number of runs")
+    parser.add_option("-p", "--project", dest="projfile",
+                        help="Project file to open", metavar="FILE")
+    opts, remainder = parser.parse_args()
+
+    results = [run(opts.projfile) for i in range(opts.runs)]
+    imp = sorted(r['import'] for r in results)
+    paint = sorted(r['paint'] for r in results)
+    mid = len(results)//2
+    print ('runs: %s' %len(results))
+    print ('import pandastable.app: median %.3fs, min %.3fs' %(imp[mid], imp[0]))
+    print ('first paint after import: median %.3fs, min %.3fs' %(paint[mid], paint[0]))
+    print ('total: %.3fs' %(imp[mid]+paint[mid]))
+    loaded = sorted(set(m for r in results for m in r['loaded']))
+    if len(loaded) > 0:
+        print ('heavy modules loaded at startup: %s' %', '.join(loaded))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -50,7 +50,7 @@ def main():
         elif opts.csv != None:
             app = DataExplore()
             t = app.getCurrentTable()
-            t.importCSV(opts.csv, dialog=True)
+            t.importCSV(opts.csv, dialog=True, background=True)
         elif opts.excel != None:
             app = DataExplore()
             app.importExcel(opts.excel)
@@ -1,7 +1,18 @@
 import platform
 if platform.system() == 'Darwin':
-    import matplotlib
-    matplotlib.use('TkAgg')
+    import os, sys
+    #matplotlib is only imported when the first plot is made
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('TkAgg')
+    else:
+        os.environ.setdefault('MPLBACKEND', 'TkAgg')
 from .core import *
 from .data import *
 __version__ = '0.14.0'
+
+def __getattr__(name):
+    #plotting classes are imported when first used
+    if name in ['PlotViewer', 'MPLBaseOptions']:
+        from . import plotting
+        return getattr(plotting, name)
+    raise AttributeError("module 'pandastable' has no attribute '%s'" %name)
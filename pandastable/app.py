@@ -20,7 +20,7 @@
 """
 
 from __future__ import absolute_import, print_function
-import sys, datetime, pickle, gzip
+import sys, datetime, pickle, gzip, threading, weakref
 try:
     from tkinter import *
     from tkinter.ttk import *
@@ -37,14 +37,18 @@ else:
     import tkMessageBox as messagebox
 
 from collections import OrderedDict
-import matplotlib
-matplotlib.use('TkAgg')
 import pandas as pd
 import re, os, platform, time
+#matplotlib is only imported when the first plot is made
+if 'matplotlib' in sys.modules:
+    sys.modules['matplotlib'].use('TkAgg')
+else:
+    os.environ.setdefault('MPLBACKEND', 'TkAgg')
 from .core import Table
-from .data import TableModel
+from .data import TableModel, PagedTableModel
+from .selection import asSelection
 #from .prefs import Preferences
-from . import images, util, dialogs, plotting, config
+from . import images, util, dialogs, config, project
 from .dialogs import MultipleValDialog
 from . import plugin
 
@@ -90,6 +94,12 @@ class DataExplore(Frame):
         self.main.title('DataExplore')
         self.createMenuBar()
         self.discoverPlugins()
+        self.pendingsheets = {}
+        self.projectreader = None
+        self.savejob = None
+        self.sheetviewed = {}
+        #settings of each table when last saved or loaded
+        self.savedmeta = weakref.WeakKeyDictionary()
         self.setupGUI()
         self.setStyles()
         self.clipboarddf = None
@@ -108,6 +118,8 @@ class DataExplore(Frame):
             self.newProject()
         self.main.protocol('WM_DELETE_WINDOW',self.quit)
         self.main.lift()
+        self.startAutoSave()
+        self.startIdleCheck()
         return
 
     def start_logging(self):
@@ -152,6 +164,7 @@ class DataExplore(Frame):
         self.m = PanedWindow(self.main, orient=HORIZONTAL)
         self.m.pack(fill=BOTH,expand=1)
         self.nb = Notebook(self.main)
+        self.nb.bind('<<NotebookTabChanged>>', self.sheetSelected)
         self.m.add(self.nb)
         self.setGeometry()
         return
@@ -168,11 +181,13 @@ class DataExplore(Frame):
                     '03Close':{'cmd':self.closeProject},
                     '04Save':{'cmd':self.saveProject},
                     '05Save As':{'cmd':self.saveasProject},
+                    '05Autosave':{'cmd':self.setAutoSave},
                     '06sep':'',
                     '07Import CSV':{'cmd':self.importCSV},
                     '08Import HDF5':{'cmd':self.importHDF},
                     '09Import from URL':{'cmd':self.importURL},
                     '10Import Excel':{'cmd':self.importExcel},
+                    '10Browse Large File':{'cmd':self.browseFile},
                     '10Export CSV':{'cmd':self.exportCSV},
                     '11sep':'',
                     '12Quit':{'cmd':self.quit}}
@@ -192,6 +207,7 @@ class DataExplore(Frame):
                          '02Remove Sheet':{'cmd': lambda: self.deleteSheet(ask=True)},
                          '03Copy Sheet':{'cmd':self.copySheet},
                          '04Rename Sheet':{'cmd':self.renameSheet},
+                         '05Unload Idle Sheets':{'cmd':self.setIdleTimeout},
                          #'05Sheet Description':{'cmd':self.editSheetDescription}
                          }
         self.sheet_menu = self.createPulldown(self.menu,self.sheet_menu)
@@ -217,6 +233,7 @@ class DataExplore(Frame):
                          '07Concatenate Tables':{'cmd':self.concat},
                          '08Table to Text':{'cmd': lambda: self._call('showasText')},
                          '09Table Info':{'cmd': lambda: self._call('showInfo')},
+                         '09Optimize Memory':{'cmd': lambda: self._call('optimizeMemory')},
                          '10sep':'',
                          '11Transform Values':{'cmd': lambda: self._call('transform')},
                          '12Group-Aggregate':{'cmd': lambda: self._call('aggregate')},
@@ -378,10 +395,33 @@ class DataExplore(Frame):
             childsettings = meta['childselected']
         else:
             childtable = None
-        #load plot options
-        opts = {'mplopts': table.pf.mplopts,
-                'mplopts3d': table.pf.mplopts3d,
-                'labelopts': table.pf.labelopts
+        #plot options are only saved if the plot viewer was used
+        if 'mplopts' in meta:
+            self.loadPlotMeta(table, meta)
+
+        #load table settings
+        util.setAttributes(table, tablesettings)
+
+        if childtable is not None:
+            table.createChildTable(df=childtable)
+            util.setAttributes(table.child, childsettings)
+
+        #redraw col selections
+        if type(table.multiplecollist) is tuple:
+            table.multiplecollist = list(table.multiplecollist)
+        #older projects saved the selected rows as a list
+        table.multiplerowlist = asSelection(table.multiplerowlist)
+        table.drawMultipleCols()
+        return
+
+    def loadPlotMeta(self, table, meta):
+        """Load plot options for a sheet, creating the plot viewer"""
+
+        from . import plotting
+        pf = table.showPlotViewer()
+        opts = {'mplopts': pf.mplopts,
+                'mplopts3d': pf.mplopts3d,
+                'labelopts': pf.labelopts
                 }
         for m in opts:
             if m in meta and meta[m] is not None:
@@ -393,41 +433,30 @@ class DataExplore(Frame):
                 for key in defaults:
                     if key not in opts[m].opts:
                         opts[m].opts[key] = defaults[key]
-
-        #load table settings
-        util.setAttributes(table, tablesettings)
         #load plotviewer
         if 'plotviewer' in meta:
             #print (meta['plotviewer'])
-            util.setAttributes(table.pf, meta['plotviewer'])
-            table.pf.updateWidgets()
-
-        if childtable is not None:
-            table.createChildTable(df=childtable)
-            util.setAttributes(table.child, childsettings)
-
-        #redraw col selections
-        if type(table.multiplecollist) is tuple:
-            table.multiplecollist = list(table.multiplecollist)
-        table.drawMultipleCols()
+            util.setAttributes(pf, meta['plotviewer'])
+            pf.updateWidgets()
         return
 
     def saveMeta(self, table):
         """Save meta data such as current plot options"""
 
         meta = {}
-        #save plot options
-        meta['mplopts'] = table.pf.mplopts.kwds
-        meta['mplopts3d'] = table.pf.mplopts3d.kwds
-        meta['labelopts'] = table.pf.labelopts.kwds
-        #print (table.pf.mplopts.kwds)
+        #save plot options if the plot viewer has been made
+        if getattr(table, 'pf', None) is not None:
+            meta['mplopts'] = table.pf.mplopts.kwds
+            meta['mplopts3d'] = table.pf.mplopts3d.kwds
+            meta['labelopts'] = table.pf.labelopts.kwds
+            meta['plotviewer'] = util.getAttributes(table.pf)
 
         #save table selections
         meta['table'] = util.getAttributes(table)
-        meta['plotviewer'] = util.getAttributes(table.pf)
         #print (meta['plotviewer'])
         #save row colors since its a dataframe and isn't picked up by getattributes currently
-        meta['table']['rowcolors'] = table.rowcolors
+        #copied as the project is written in another thread
+        meta['table']['rowcolors'] = table.rowcolors.copy()
         #save child table if present
         if table.child != None:
             meta['childtable'] = table.child.model.df
@@ -455,8 +484,14 @@ class DataExplore(Frame):
             self.appoptions['recent'] = []
         return
 
-    def newProject(self, data=None, df=None):
-        """Create a new project from data or empty"""
+    def newProject(self, data=None, df=None, reader=None):
+        """Create a new project from data or empty.
+        Args:
+            data: dict of sheets from an older project file
+            df: not used
+            reader: ProjectReader for a project file, sheets are only
+                read in when first selected
+        """
 
         w = self.closeProject()
         if w == None:
@@ -468,19 +503,27 @@ class DataExplore(Frame):
         for n in self.nb.tabs():
             self.nb.forget(n)
         if data != None:
-            for s in sorted(data.keys()):
-                if s == 'meta':
-                    continue
+            names = [s for s in sorted(data.keys()) if s != 'meta']
+            for s in names:
                 df = data[s]['table']
                 if 'meta' in data[s]:
                     meta = data[s]['meta']
                 else:
                     meta=None
-                #try:
-                self.addSheet(s, df, meta)
-                '''except Exception as e:
-                    print ('error reading in options?')
-                    print (e)'''
+                if 'source' in data[s]:
+                    model = self.openPagedModel(data[s]['source'])
+                else:
+                    model = TableModel(df)
+                self.addPendingSheet(s, {'model': model, 'meta': meta})
+        elif reader != None:
+            self.projectreader = reader
+            names = reader.getSheetNames()
+            for s in names:
+                self.addPendingSheet(s)
+        if data != None or reader != None:
+            #only the first sheet is shown now, others when selected
+            if len(names) > 0:
+                self.loadPendingSheet(names[0])
         else:
             self.addSheet('sheet1')
         self.filename = None
@@ -513,10 +556,12 @@ class DataExplore(Frame):
         if ext != '.dexpl':
             print ('does not appear to be a project file')
             return
-        if os.path.isfile(filename):
-            #new format uses pickle
+        data = None
+        reader = None
+        if os.path.isfile(filename) and project.isLegacyProject(filename):
+            #older format is one gzipped pickle
             try:
-                data = pickle.load(gzip.GzipFile(filename, 'r'))
+                data = project.loadLegacyProject(filename)
             except OSError as oe:
                 msg = 'DataExplore can no longer open the old format project files.\n'\
                 'if you really need the file revert to pandastable<=0.12.1 and save the data.'
@@ -525,11 +570,19 @@ class DataExplore(Frame):
             #create backup file before we change anything
             #backupfile = filename+'.bak'
             #pd.to_msgpack(backupfile, data, encoding='utf-8')
+        elif os.path.isfile(filename):
+            #sheets are stored separately and read when needed
+            try:
+                reader = project.ProjectReader(filename)
+            except Exception as e:
+                msg = 'Could not read project file.\n%s' %e
+                messagebox.showwarning("Project open error", msg)
+                return
         else:
             print ('no such file')
             self.quit()
             return
-        self.newProject(data)
+        self.newProject(data, reader=reader)
         self.filename = filename
         self.main.title('%s - DataExplore' %filename)
         self.projopen = True
@@ -583,31 +636,152 @@ class DataExplore(Frame):
         self.addRecent(filename)
         return
 
-    def doSaveProject(self, filename):
-        """Save sheets as dict in msgpack"""
+    def doSaveProject(self, filename, background=True):
+        """Save sheets to a project file. Only sheets changed since the
+        last save are written out, the others are copied from the current
+        file. The file is written in a thread from a snapshot of the data.
+
+        Args:
+            filename: project file name
+            background: if False wait for the save to finish
+        """
+
+        self.finishSave()
+        reader = self.projectreader
+        sheets = []
+        versions = []
+        metas = []
+        for n in self.nb.tabs():
+            name = self.nb.tab(n, 'text')
+            if name in self.sheets:
+                table = self.sheets[name]
+                model, meta = table.model, self.saveMeta(table)
+                metas.append((table, meta))
+            elif self.pendingsheets[name] != None:
+                info = self.pendingsheets[name]
+                model, meta = info['model'], info['meta']
+                metas.append((info, meta))
+            else:
+                #not read from the project file yet
+                sheets.append({'name': name})
+                continue
+            sheets.append(project.getSheet(name, model, meta, reader))
+            versions.append((model, model.version))
+
+        source = None
+        if reader != None:
+            source = reader.filename
+        job = {'filename': filename, 'tmp': project.tempName(filename),
+               'versions': versions, 'metas': metas, 'error': None}
+        def write():
+            try:
+                project.writeArchive(job['tmp'], sheets, source)
+            except Exception as e:
+                job['error'] = e
+            return
+        job['thread'] = threading.Thread(target=write, daemon=True)
+        job['thread'].start()
+        self.savejob = job
+        if background == True:
+            self.main.after(100, self.checkSave)
+        else:
+            self.finishSave()
+        return
+
+    def checkSave(self):
+        """Poll a background save and finish it when the file is written"""
+
+        job = self.savejob
+        if job == None:
+            return
+        if job['thread'].is_alive():
+            self.main.after(100, self.checkSave)
+            return
+        self.finishSave()
+        return
+
+    def finishSave(self):
+        """Wait for any save in progress and move the new file into place"""
+
+        job = self.savejob
+        if job == None:
+            return
+        self.savejob = None
+        job['thread'].join()
+        tmp = job['tmp']
+        if job['error'] != None:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            messagebox.showwarning("Project save error",
+                                   'Could not save project.\n%s' %job['error'])
+            return
+        #unchanged sheets are read from the new file from now on
+        self.projectreader = project.replaceProject(tmp, job['filename'],
+                                                    self.projectreader)
+        for model, version in job['versions']:
+            model.savedversion = version
+        for obj, meta in job['metas']:
+            if isinstance(obj, dict):
+                obj['metachanged'] = False
+            else:
+                self.savedmeta[obj] = meta
+        return
+
+    def metaChanged(self, table):
+        """True if the settings of a table such as formats, colors or
+        column widths changed since the project was saved or loaded"""
+
+        return not util.equalData(self.saveMeta(table), self.savedmeta.get(table))
+
+    def isChanged(self):
+        """True if any sheet has changed since the project was saved"""
+
+        for n in self.sheets:
+            if self.metaChanged(self.sheets[n]):
+                return True
+        for i in self.pendingsheets.values():
+            if i != None and i.get('metachanged') == True:
+                return True
+        models = [self.sheets[n].model for n in self.sheets]
+        models += [i['model'] for i in self.pendingsheets.values() if i != None]
+        for model in models:
+            if not isinstance(model, PagedTableModel) and model.isChanged():
+                return True
+        return False
+
+    def setAutoSave(self):
+        """Set the interval for saving the project automatically"""
 
-        self._checkTables()
-        data={}
-        for i in self.sheets:
-            table = self.sheets[i]
-            data[i] = {}
-            data[i]['table'] = table.model.df
-            data[i]['meta'] = self.saveMeta(table)
+        val = simpledialog.askinteger("Autosave",
+                                      "Save every n minutes (0 is off):",
+                                      initialvalue=self.appoptions.get('autosave', 0),
+                                      minvalue=0, parent=self.main)
+        if val == None:
+            return
+        self.appoptions['autosave'] = val
+        self.saveAppOptions()
+        self.startAutoSave()
+        return
 
-        #pd.to_msgpack(filename, data, encoding='utf-8')
-        #changed to pickle format
-        file = gzip.GzipFile(filename, 'w')
-        pickle.dump(data, file)
+    def startAutoSave(self):
+        """Start or restart the autosave timer"""
+
+        if getattr(self, 'autosaveid', None) != None:
+            self.main.after_cancel(self.autosaveid)
+            self.autosaveid = None
+        mins = self.appoptions.get('autosave', 0)
+        if mins > 0:
+            self.autosaveid = self.main.after(int(mins*60000), self.autoSave)
         return
 
-    def _checkTables(self):
-        """Check tables before saving that so we are not saving
-        filtered copies"""
+    def autoSave(self):
+        """Save the project if it has a file name and has changed"""
 
-        for s in self.sheets:
-            t=self.sheets[s]
-            if t.filtered==True:
-                t.showAll()
+        self.autosaveid = None
+        if getattr(self, 'filename', None) != None and self.savejob == None \
+            and self.isChanged():
+            self.doSaveProject(self.filename)
+        self.startAutoSave()
         return
 
     def closeProject(self):
@@ -625,8 +799,13 @@ class DataExplore(Frame):
             self.saveProject()
         else:
             pass
+        self.finishSave()
         for n in self.nb.tabs():
             self.nb.forget(n)
+        self.pendingsheets = {}
+        if self.projectreader != None:
+            self.projectreader.close()
+            self.projectreader = None
         self.filename = None
         self.projopen = False
         self.main.title('DataExplore')
@@ -637,7 +816,7 @@ class DataExplore(Frame):
 
         self.addSheet(select=True)
         table = self.getCurrentTable()
-        table.importCSV(dialog=True)
+        table.importCSV(dialog=True, background=True)
         return
 
     def importHDF(self):
@@ -648,6 +827,38 @@ class DataExplore(Frame):
         table.importHDF(dialog=True)
         return
 
+    def browseFile(self, filename=None):
+        """Open a large Parquet, Feather or Arrow file in a new sheet
+        without loading it. Rows are read as they are shown."""
+
+        if filename is None:
+            filename = filedialog.askopenfilename(parent=self.master,
+                                                  initialdir=self.defaultsavedir,
+                                                  filetypes=[("parquet","*.parquet"),
+                                                             ("feather","*.feather"),
+                                                             ("arrow","*.arrow"),
+                                                             ("All files","*.*")])
+        if not filename:
+            return
+        model = self.openPagedModel(filename)
+        if model is None:
+            return
+        name = os.path.basename(filename)
+        self.addSheet(sheetname=name, model=model, select=True)
+        return
+
+    def openPagedModel(self, filename):
+        """Create a paged table model for a file, None if it can't be read"""
+
+        try:
+            model = PagedTableModel(filename)
+        except Exception as e:
+            messagebox.showwarning("File open error",
+                                   'Could not read %s\n%s' %(filename, e),
+                                   parent=self.main)
+            return
+        return model
+
     def importURL(self):
         """Import CSV from URL"""
 
@@ -722,7 +933,7 @@ class DataExplore(Frame):
         self.load_dataframe(df, name, select=True)
         return
 
-    def addSheet(self, sheetname=None, df=None, meta=None, select=False):
+    def addSheet(self, sheetname=None, df=None, meta=None, select=False, model=None):
         """Add a sheet with new or existing data"""
 
         names = [self.nb.tab(i, "text") for i in self.nb.tabs()]
@@ -742,15 +953,33 @@ class DataExplore(Frame):
             return
         if checkName(sheetname) == 0:
             return
+        if select == False and noshts > 0:
+            #table is made when the sheet is first selected
+            if model == None:
+                model = TableModel(df)
+            self.addPendingSheet(sheetname, {'model': model, 'meta': meta})
+            return sheetname
         #Create the table
         main = PanedWindow(orient=HORIZONTAL)
         self.sheetframes[sheetname] = main
         self.nb.add(main, text=sheetname)
+        self.createSheet(sheetname, df, meta, model)
+
+        if select == True:
+            ind = self.nb.index('end')-1
+            s = self.nb.tabs()[ind]
+            self.nb.select(s)
+        return sheetname
+
+    def createSheet(self, sheetname, df=None, meta=None, model=None):
+        """Create the table and plot viewer inside the sheet frame"""
+
+        main = self.sheetframes[sheetname]
         f1 = Frame(main)
-        table = Table(f1, dataframe=df, showtoolbar=1, showstatusbar=1)
+        table = Table(f1, dataframe=df, model=model, showtoolbar=1, showstatusbar=1)
         f2 = Frame(main)
-        #show the plot frame
-        pf = table.showPlotViewer(f2)
+        #plot viewer is made in this frame when first needed
+        table.plotframe = f2
         #load meta data
         if meta != None:
             self.loadMeta(table, meta)
@@ -768,12 +997,122 @@ class DataExplore(Frame):
         #attach menu state of undo item so that it's disabled after an undo
         #table.undo_callback = lambda: self.toggleUndoMenu('active')
         self.sheets[sheetname] = table
+        self.sheetviewed[sheetname] = time.time()
+        #settings as loaded, see metaChanged
+        self.savedmeta[table] = self.saveMeta(table)
+        return table
 
-        if select == True:
-            ind = self.nb.index('end')-1
-            s = self.nb.tabs()[ind]
-            self.nb.select(s)
-        return sheetname
+    def addPendingSheet(self, sheetname, info=None):
+        """Add a tab for a sheet without creating its table.
+        Args:
+            sheetname: name of sheet
+            info: dict with the model and meta data for the sheet,
+                if None the sheet is read from the project file
+        """
+
+        main = PanedWindow(orient=HORIZONTAL)
+        self.sheetframes[sheetname] = main
+        self.nb.add(main, text=sheetname)
+        self.pendingsheets[sheetname] = info
+        return
+
+    def loadPendingSheet(self, sheetname):
+        """Create the table for a sheet not shown yet"""
+
+        if sheetname not in self.pendingsheets:
+            return
+        info = self.pendingsheets.pop(sheetname)
+        if info != None:
+            table = self.createSheet(sheetname, meta=info['meta'], model=info['model'])
+            if info.get('metachanged') == True:
+                #settings changed before the sheet was unloaded
+                del self.savedmeta[table]
+            return table
+        df, meta, source = self.projectreader.readSheet(sheetname)
+        model = None
+        if source != None:
+            model = self.openPagedModel(source)
+        table = self.createSheet(sheetname, df, meta, model)
+        #data is the same as in the file
+        table.model.savedversion = table.model.version
+        return table
+
+    def unloadSheet(self, sheetname):
+        """Remove the table widgets for a sheet, keeping the model and
+        meta data so that it can be made again when selected. Sheets
+        still importing a file are not unloaded.
+        Returns:
+            True if the sheet was unloaded
+        """
+
+        table = self.sheets[sheetname]
+        if table.importing == True:
+            return False
+        #no timer callbacks should run once the widgets are gone
+        table.stopTimers()
+        del self.sheets[sheetname]
+        if table.filtered == True:
+            table.showAll()
+        info = {'model': table.model, 'meta': self.saveMeta(table),
+                'metachanged': self.metaChanged(table)}
+        main = self.sheetframes[sheetname]
+        for w in main.winfo_children():
+            w.destroy()
+        if self.currenttable is table:
+            self.currenttable = None
+        self.pendingsheets[sheetname] = info
+        return True
+
+    def sheetSelected(self, event=None):
+        """Create the table for the selected sheet if not done yet"""
+
+        if self.nb.select() == '':
+            return
+        name = self.getCurrentSheet()
+        self.sheetviewed[name] = time.time()
+        self.loadPendingSheet(name)
+        return
+
+    def setIdleTimeout(self):
+        """Set the time after which sheets not in view are unloaded"""
+
+        val = simpledialog.askinteger("Unload Idle Sheets",
+                                      "Unload sheets not viewed for n minutes (0 is off):",
+                                      initialvalue=self.appoptions.get('sheetidle', 0),
+                                      minvalue=0, parent=self.main)
+        if val == None:
+            return
+        self.appoptions['sheetidle'] = val
+        self.saveAppOptions()
+        self.startIdleCheck()
+        return
+
+    def startIdleCheck(self):
+        """Start or restart the timer for unloading idle sheets"""
+
+        if getattr(self, 'idleid', None) != None:
+            self.main.after_cancel(self.idleid)
+            self.idleid = None
+        if self.appoptions.get('sheetidle', 0) > 0:
+            self.idleid = self.main.after(60000, self.unloadIdleSheets)
+        return
+
+    def unloadIdleSheets(self):
+        """Unload sheets that have not been viewed for a while"""
+
+        self.idleid = None
+        timeout = self.appoptions.get('sheetidle', 0) * 60
+        current = None
+        if self.nb.select() != '':
+            current = self.getCurrentSheet()
+        now = time.time()
+        for name in list(self.sheets.keys()):
+            if name == current:
+                self.sheetviewed[name] = now
+            elif now - self.sheetviewed.get(name, now) > timeout:
+                self.unloadSheet(name)
+        self.startIdleCheck()
+        return
 
     def deleteSheet(self, ask=False):
         """Delete a sheet"""
@@ -788,7 +1127,8 @@ class DataExplore(Frame):
         if w==False:
             return
         self.nb.forget(s)
-        del self.sheets[name]
+        self.sheets.pop(name, None)
+        self.pendingsheets.pop(name, None)
         del self.sheetframes[name]
         return
 
@@ -837,11 +1177,18 @@ class DataExplore(Frame):
 
         s = self.nb.index(self.nb.select())
         name = self.nb.tab(s, 'text')
-        table = self.sheets[name]
+        table = self.getTable(name)
         return table
 
+    def getTable(self, name):
+        """Get the table for a sheet, creating it if needed"""
+
+        if name in self.pendingsheets:
+            self.loadPendingSheet(name)
+        return self.sheets[name]
+
     def getSheetList(self):
-        return list(self.sheets.keys())
+        return [self.nb.tab(i, 'text') for i in self.nb.tabs()]
 
     def describe(self):
         """Describe dataframe"""
@@ -861,7 +1208,7 @@ class DataExplore(Frame):
     def concat(self):
         """Concat 2 tables"""
 
-        vals = list(self.sheets.keys())
+        vals = self.getSheetList()
         if len(vals)<=1:
             return
         d = MultipleValDialog(title='Concat',
@@ -876,8 +1223,8 @@ class DataExplore(Frame):
             s2 = d.results[1]
         if s1 == s2:
             return
-        df1 = self.sheets[s1].model.df
-        df2 = self.sheets[s2].model.df
+        df1 = self.getTable(s1).model.df
+        df2 = self.getTable(s2).model.df
         m = pd.concat([df1,df2])
         self.addSheet('concat-%s-%s' %(s1,s2),m)
         return
@@ -897,7 +1244,7 @@ class DataExplore(Frame):
         df = TableModel.getSampleData(rows=rows,cols=cols)
         name='sample'
         i=1
-        while name in self.sheets:
+        while name in self.getSheetList():
             name='sample'+str(i)
             i+=1
         self.addSheet(sheetname=name, df=df, select=True)
@@ -1004,9 +1351,9 @@ class DataExplore(Frame):
 
     def showPlot(self):
         name = self.getCurrentSheet()
-        table = self.sheets[name]
+        table = self.getTable(name)
         pw = self.sheetframes[name]
-        pw.add(table.pf, weight=2)
+        pw.add(table.showPlotViewer(), weight=2)
         return
 
     def addPlot(self):
@@ -1015,8 +1362,8 @@ class DataExplore(Frame):
         import pickle
         from . import plotting
         name = self.getCurrentSheet()
-        table = self.sheets[name]
-        fig = table.pf.fig
+        table = self.getTable(name)
+        fig = table.showPlotViewer().fig
         t = time.strftime("%H:%M:%S")
         label = name+'-'+t
         #dump and reload the figure to get a new object
@@ -1114,6 +1461,7 @@ class DataExplore(Frame):
 
         pandasver = pd.__version__
         pythonver = platform.python_version()
+        import matplotlib
         mplver = matplotlib.__version__
 
         text='DataExplore Application\n'\
@@ -1156,6 +1504,7 @@ class DataExplore(Frame):
         return
 
     def quit(self):
+        self.finishSave()
         self.main.destroy()
         return
 
@@ -1222,7 +1571,7 @@ def main():
         elif opts.csv != None:
             app = DataExplore()
             t = app.getCurrentTable()
-            t.importCSV(opts.csv, dialog=True)
+            t.importCSV(opts.csv, dialog=True, background=True)
         elif opts.excel != None:
             app = DataExplore()
             app.importExcel(opts.excel)
@@ -34,7 +34,7 @@ try:
     import configparser
 except:
     import ConfigParser as configparser
-from . import util, plotting, dialogs
+from . import util, dialogs
 
 homepath = os.path.join(os.path.expanduser('~'))
 configpath = os.path.join(homepath,'.config/pandastable')
@@ -50,7 +50,8 @@ baseoptions['base'] = {'font': 'Arial','fontsize':12, 'fontstyle':'',
                         'floatprecision':2, 'timeformat':"%Y-%m-%d %H:%M:%S",
                         'thousandseparator': '',
                         'rowheight':22,'cellwidth':80, 'linewidth':1,
-                        'align':'w',
+                        'align':'w', 'undolevels':20, 'undomemory':200,
+                        'textindexrows':100000,
                         }
 baseoptions['colors'] =  {'cellbackgr':'#F4F4F3',
                         'textcolor':'black',
@@ -204,6 +205,8 @@ def apply_options(options, table):
     for i in options:
         table.__dict__[i] = options[i]
     table.setFont()
+    if hasattr(table, 'formatter'):
+        table.formatter.clear()
     #if hasattr(table,'colheader'):
     #    table.colheader.redraw()
     table.redraw()
@@ -233,12 +236,17 @@ class preferencesDialog(Frame):
     def createWidgets(self):
         """create widgets"""
 
+        from . import plotting
         fonts = util.getFonts()
 
         self.opts = {'rowheight':{'type':'scale','default':18,'range':(5,50),'interval':1,'label':'row height'},
                 'cellwidth':{'type':'scale','default':80,'range':(10,300),'interval':5,'label':'cell width'},
                 'linewidth':{'type':'scale','default':1,'range':(1,10),'interval':1,'label':'grid line width'},
                 'align':{'type':'combobox','default':'w','items':['w','e','center'],'label':'text align'},
+                'undolevels':{'type':'scale','default':20,'range':(1,100),'interval':1,'label':'undo levels'},
+                'undomemory':{'type':'entry','default':200,'label':'undo memory (MB)'},
+                'textindexrows':{'type':'entry','default':100000,'label':'index text columns over (rows)',
+                                 'tooltip':'build search indexes for text columns with this many rows, 0 for none'},
                 'vertlines':{'type':'checkbutton','default':1,'label':'show vertical lines'},
                 'horizlines':{'type':'checkbutton','default':1,'label':'show horizontal lines'},
                 'font':{'type':'combobox','default':'Arial','items':fonts},
@@ -261,7 +269,7 @@ class preferencesDialog(Frame):
                 'grid':{'type':'checkbutton','default':0,'label':'show grid'},
                 }
         sections = {'table':['align','floatprecision','timeformat','thousandseparator','rowheight',
-                             'cellwidth','linewidth'],
+                             'cellwidth','linewidth','undolevels','undomemory','textindexrows'],
                     'formats':['font','fontstyle','fontsize','cellbackgr','textcolor',
                                'grid_color','rowselectedcolor','colheaderbgcolor','rowheaderbgcolor','vertlines','horizlines']}
                     #'plotting':['marker','linestyle','ms','grid','colormap']}
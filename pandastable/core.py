@@ -39,9 +39,12 @@ import platform
 import logging
 import numpy as np
 import pandas as pd
-from .data import TableModel
+from .data import TableModel, CSVChunkReader
+from .formatting import CellFormatter
+from .selection import Selection, asSelection, getIndexer, labelMask
+from .formulas import FormulaEngine, evaluate
+from .undo import UndoJournal
 from .headers import ColumnHeader, RowHeader, IndexHeader
-from .plotting import MPLBaseOptions, PlotViewer
 #from .prefs import Preferences
 from .dialogs import ImportDialog
 from . import images, util, config
@@ -109,13 +112,18 @@ class Table(Canvas):
         self.startrow = self.endrow = None
         self.startcol = self.endcol = None
         self.allrows = False
-        self.multiplerowlist=[]
+        self.multiplerowlist=Selection()
         self.multiplecollist=[]
-        self.col_positions=[]
+        self.col_positions=np.array([self.x_start])
+        #pooled canvas text items keyed by (row, col)
+        self._textitems = {}
+        self._freetext = []
+        self._gridlines = {}
+        self.formatter = CellFormatter()
+        self.scheduler = RedrawScheduler(self)
         self.mode = 'normal'
         self.editable = editable
         self.enable_menus = enable_menus
-        self.filtered = False
         self.child = None
         self.queryrow = 4
         self.childrow = 5
@@ -132,6 +140,8 @@ class Table(Canvas):
             self.model = model
         else:
             self.model = TableModel(rows=rows,columns=cols)
+        if getattr(self.model, 'readonly', False):
+            self.editable = False
 
         self.rows = self.model.getRowCount()
         self.cols = self.model.getColumnCount()
@@ -145,12 +155,24 @@ class Table(Canvas):
                               'number' : {"Edit": 'drawCellEntry' }}
         #self.setFontSize()
         self.plotted = False
+        #frame the plot viewer is placed in when it is first needed
+        self.plotframe = None
         self.importpath = None
-        self.prevdf = None
+        #state of a background csv import, see startCSVImport
+        self.importer = None
+        self.importmodel = None
+        self.importcompact = False
+        self.importing = False
+        self.importtimer = None
+        self.formulae = {}
+        self.formulaengine = None
+        self.journal = UndoJournal(self.undolevels, self.undomemory)
         self.__last_left_click_src = "column"
         return
 
     def close(self, evt=None):
+        self.stopTimers()
+        self.journal.clear()
         if hasattr(self, 'parenttable'):
             return
         if hasattr(self, 'pf') and self.pf is not None:
@@ -159,6 +181,25 @@ class Table(Canvas):
         if util.SCRATCH is not None:
             util.SCRATCH.destroy()
             util.SCRATCH = None
+        util.clearFontMetrics()
+        return
+
+    def stopTimers(self):
+        """Cancel pending redraws and any import, so that no callbacks
+        are left to run on destroyed widgets"""
+
+        self.scheduler.cancel()
+        if self.importtimer is not None:
+            try:
+                self.after_cancel(self.importtimer)
+            except:
+                pass
+            self.importtimer = None
+        if self.importer is not None:
+            self.importer.cancel()
+            self.importer = None
+            self.importmodel = None
+            self.importing = False
         return
 
     def set_defaults(self):
@@ -195,13 +236,17 @@ class Table(Canvas):
         self.timeformat = "%Y-%m-%d %H:%M:%S"
         self.thousandseparator = ''
         self.showindex = False
-        self.columnwidths = {}
+        self.columnwidths = util.ColumnWidths()
+        self._colposkey = None
         self.columncolors = {}
         #store general per column formatting as sub dicts
         self.columnformats = {}
         self.columnformats['alignment'] = {}
         self.rowcolors = pd.DataFrame()
         self.highlighted = None
+        self.undolevels = 20
+        self.undomemory = 200
+        self.textindexrows = 100000
         #self.bg = Style().lookup('TLabel.label', 'background')
         return
 
@@ -222,6 +267,7 @@ class Table(Canvas):
         for s in style:
             if s in self.__dict__:
                 self.__dict__[s] = style[s]
+        self.formatter.clear()
         self.redraw()
         return
 
@@ -236,7 +282,7 @@ class Table(Canvas):
                 return
             event.widget.yview_scroll(-1, UNITS)
             self.rowheader.yview_scroll(-1, UNITS)
-        self.redrawVisible()
+        self.redrawScrolled()
         return
 
     def doBindings(self):
@@ -354,7 +400,7 @@ class Table(Canvas):
             return
         if self.currwidth != self.parentframe.winfo_width() or \
            self.currheight != self.parentframe.winfo_height():
-            self.redrawVisible()
+            self.scheduler.schedule('table')
         self.currwidth = self.parentframe.winfo_width()
         self.currheight = self.parentframe.winfo_height()
 
@@ -393,16 +439,13 @@ class Table(Canvas):
     def getColPosition(self, x):
         """Get column position at coord"""
 
-        x_start = self.x_start
+        pos = self.col_positions
+        if len(pos) == 0:
+            return 0
         w = self.cellwidth
-        i=0
-        col=0
-        for c in self.col_positions:
-            col = i
-            if c+w>=x:
-                break
-            i+=1
-        return int(col)
+        #first column whose start is within a cell width of x
+        col = np.searchsorted(pos, x-w, side='left')
+        return int(min(col, len(pos)-1))
 
     def getVisibleRows(self, y1, y2):
         """Get the visible row range"""
@@ -433,17 +476,21 @@ class Table(Canvas):
 
         if not hasattr(self, 'colheader'):
             return
+        self.scheduler.done('table', 'colheader', 'rowheader')
         model = self.model
-        self.rows = len(self.model.df.index)
-        self.cols = len(self.model.df.columns)
+        self.rows = self.model.getRowCount()
+        self.cols = self.model.getColumnCount()
         if self.cols == 0 or self.rows == 0:
             self.delete('entry')
             self.delete('rowrect','colrect')
             self.delete('currentrect','fillrect')
-            self.delete('gridline','text')
+            self.delete('gridline')
+            self._gridlines = {}
+            self.clearTextItems()
             self.delete('multicellrect','multiplesel')
             self.delete('colorrect')
             self.setColPositions()
+            self._drawn = None
             if self.cols == 0:
                 self.colheader.redraw()
             if self.rows == 0:
@@ -458,7 +505,7 @@ class Table(Canvas):
         if self.filtered == True:
             self.delete('colrect')
 
-        self.rowrange = list(range(0,self.rows))
+        self.rowrange = range(0,self.rows)
         self.configure(scrollregion=(0,0, self.tablewidth+self.x_start,
                         self.rowheight*self.rows+10))
 
@@ -468,41 +515,12 @@ class Table(Canvas):
         startvisiblecol, endvisiblecol = self.getVisibleCols(x1, x2)
         self.visiblecols = list(range(startvisiblecol, endvisiblecol))
 
+        self.recycleTextItems(startvisiblerow, endvisiblerow,
+                              startvisiblecol, endvisiblecol)
         self.drawGrid(startvisiblerow, endvisiblerow)
-        align = self.align
         self.delete('fillrect')
-        bgcolor = self.cellbackgr
-        df = self.model.df
-
-        prec = self.floatprecision
-        rows = self.visiblerows
-
-        for col in self.visiblecols:
-            coldata = df.iloc[rows,col]
-            colname = df.columns[col]
-            cfa = self.columnformats['alignment']
-            if colname in cfa:
-                align = cfa[colname]
-            else:
-                align = self.align
-
-            #set precision
-            if coldata.dtype in ['float64','float32','int']:
-                #coldata = coldata.apply(lambda x: self.setPrecision(x, prec), 1)
-                coldata = coldata.apply(lambda x: self.setPrecision(x, prec))
-
-            if pd.api.types.is_datetime64_any_dtype(coldata):
-                coldata = coldata.dt.strftime(self.timeformat)
-
-            #convert column data to object for display
-            #coldata = coldata.astype(object).fillna('')
-            coldata = coldata.infer_objects(copy=False).fillna('')
-
-            offset = rows[0]
-            for row in self.visiblerows:
-                text = coldata.iloc[row-offset]
-                self.drawText(row, col, text, align=align)
-
+        self.drawCellText(startvisiblerow, endvisiblerow, self.visiblecols)
+        self.purgeTextItems()
         self.colorColumns()
         self.colorRows()
         self.colheader.redraw(align=self.align)
@@ -517,6 +535,96 @@ class Table(Canvas):
             self.drawMultipleCells()
 
         self.drawHighlighted()
+        self._drawn = (startvisiblerow, endvisiblerow, startvisiblecol, endvisiblecol)
+        self._drawkey = self.getDrawKey()
+        return
+
+    def getDrawKey(self):
+        """Values that must be unchanged for the drawn items to be reused
+        when scrolling, so text is drawn again after edits or format
+        changes"""
+
+        model = self.model
+        df = model.df
+        aligned = tuple(self.columnformats['alignment'].items())
+        return (id(df), model.version, model.viewversion, model.getRowCount(),
+                len(df.columns), self.rowheight, self.tablewidth, self.thefont,
+                self.showindex, self.floatprecision, self.thousandseparator,
+                self.timeformat, self.align, aligned)
+
+    def redrawScrolled(self):
+        """Redraw after the view has been scrolled. Items already drawn stay in
+        place and only the rows and columns that have come into view are drawn.
+        Falls back to a full redraw if the table changed since the last one."""
+
+        if not hasattr(self, 'colheader'):
+            return
+        if getattr(self, '_drawn', None) is None or self._drawkey != self.getDrawKey():
+            self.redrawVisible()
+            return
+        x1, y1, x2, y2 = self.getVisibleRegion()
+        sr, er = self.getVisibleRows(y1, y2)
+        sc, ec = self.getVisibleCols(x1, x2)
+        osr, oer, osc, oec = self._drawn
+        if (sr, er, sc, ec) == self._drawn:
+            return
+        #no overlap with what is drawn so redraw everything
+        if sr >= oer or er <= osr or sc >= oec or ec <= osc:
+            self.redrawVisible()
+            return
+
+        self.visiblerows = list(range(sr, er))
+        self.visiblecols = list(range(sc, ec))
+        self.recycleTextItems(sr, er, sc, ec)
+        #new rows across all visible columns
+        if sr < osr:
+            self.drawCellText(sr, min(er, osr), self.visiblecols)
+        if er > oer:
+            self.drawCellText(max(sr, oer), er, self.visiblecols)
+        #new columns for the rows already drawn
+        newcols = [c for c in self.visiblecols if c < osc or c >= oec]
+        if len(newcols) > 0:
+            self.drawCellText(max(sr, osr), min(er, oer), newcols)
+        self.purgeTextItems()
+        self.drawGrid(sr, er)
+
+        if len(self.columncolors) > 0 or len(self.rowcolors) > 0:
+            self.colorColumns()
+            self.colorRows()
+        if (sc, ec) != (osc, oec):
+            self.colheader.redrawScrolled(align=self.align)
+        if (sr, er) != (osr, oer):
+            self.rowheader.redrawScrolled()
+        self.drawSelectedRow()
+        self.drawSelectedRect(self.currentrow, self.currentcol)
+        if len(self.multiplerowlist)>1:
+            self.rowheader.drawSelectedRows(self.multiplerowlist)
+            self.drawMultipleRows(self.multiplerowlist)
+            self.drawMultipleCells()
+        if self.highlighted is not None:
+            self.drawHighlighted()
+        self._drawn = (sr, er, sc, ec)
+        return
+
+    def drawCellText(self, startrow, endrow, cols):
+        """Draw the cell text for a block of rows in the given columns"""
+
+        if endrow <= startrow:
+            return
+        df = self.model.df
+        prec = self.floatprecision
+        cfa = self.columnformats['alignment']
+        for col in cols:
+            colname = df.columns[col]
+            if colname in cfa:
+                align = cfa[colname]
+            else:
+                align = self.align
+            #formatted strings are cached by the formatter
+            coldata = self.formatter.getText(self.model, col, startrow, endrow,
+                                             prec, self.timeformat, self.thousandseparator)
+            for row in range(startrow, endrow):
+                self.drawText(row, col, coldata[row-startrow], align=align)
         return
 
     def setPrecision(self, x, p):
@@ -535,32 +643,105 @@ class Table(Canvas):
         """Redraw table"""
 
         self.redrawVisible(event, callback)
+        self.scheduler.done('statusbar')
         if hasattr(self, 'statusbar'):
             self.statusbar.update()
         return
 
+    def scheduleRedraw(self):
+        """Redraw the table once the event loop is idle, so that several
+        calls in one action only render once"""
+
+        self.scheduler.schedule('table', 'statusbar')
+        return
+
     def drawHighlighted(self):
         """Color an arbitrary selection of cells. Set the 'highlighted'
-        attribute which is a masked dataframe of the table."""
+        attribute which is a masked dataframe of the table or a dict of
+        column positions and sorted arrays of the rows to color."""
 
         rows = self.visiblerows
         self.delete('temprect')
         hl = self.highlighted
-        if hl is not None:
-            for col in self.visiblecols:
-                coldata = hl.iloc[rows,col]
-                offset = rows[0]
-                for row in rows:
-                    val = coldata.iloc[row-offset]
-                    if val == True:
-                        self.drawRect(row, col, color='lightblue', tag='temprect', delete=1)
+        if hl is not None and len(rows) > 0:
+            cols = self.visiblecols
+            if isinstance(hl, dict):
+                #only the found rows in view are used
+                mask = np.zeros((len(rows), len(cols)), dtype=bool)
+                for j in range(len(cols)):
+                    found = hl.get(cols[j])
+                    if found is None:
+                        continue
+                    start = np.searchsorted(found, rows[0])
+                    end = np.searchsorted(found, rows[-1], side='right')
+                    mask[found[start:end] - rows[0], j] = True
+            else:
+                mask = hl.iloc[rows,cols].to_numpy() == True
+            colors = np.where(mask, 'lightblue', '')
+            self.drawColorLayer(colors, rows[0], cols, tag='temprect')
+            self.lower('temprect')
+        return
+
+    def drawColorLayer(self, colors, startrow, cols, tag, outline=None):
+        """Draw background colors for a block of cells. Runs of the same
+        color down a column are drawn as one rectangle and these are merged
+        across neighbouring columns with the same runs.
+
+        Args:
+            colors: 2d array of colors for the block, one column per entry in
+                cols. Empty or null values are not drawn
+            startrow: row of the first line of the block
+            cols: column positions
+            tag: tag(s) for the rectangles
+            outline: outline color, defaults to the fill color
+        """
+
+        colors = np.array(colors, dtype=object)
+        if colors.size == 0:
+            return
+        colors[pd.isnull(colors)] = ''
+        colors[colors == self.cellbackgr] = ''
+        n = colors.shape[0]
+        rects = []
+        prev = {}
+        lastcol = None
+        for j in range(len(cols)):
+            col = cols[j]
+            vals = colors[:,j]
+            starts = np.flatnonzero(np.r_[True, vals[1:] != vals[:-1]])
+            ends = np.r_[starts[1:], n]
+            current = {}
+            for s,e in zip(starts, ends):
+                clr = vals[s]
+                if clr == '':
+                    continue
+                key = (s,e,clr)
+                if lastcol == col-1 and key in prev:
+                    r = prev[key]
+                    r[3] = col+1
+                else:
+                    r = [s,e,col,col+1,clr]
+                    rects.append(r)
+                current[key] = r
+            prev = current
+            lastcol = col
+
+        pos = self.col_positions
+        h = self.rowheight
+        y = self.y_start + startrow*h
+        w = 1
+        for s,e,c1,c2,clr in rects:
+            x1 = pos[c1]
+            x2 = pos[c2] if c2 < len(pos) else x1+self.cellwidth
+            self.create_rectangle(x1+w/2,y+s*h+w/2,x2-w/2,y+e*h-w/2,
+                                  fill=clr, outline=outline or clr,
+                                  width=w, tag=tag)
         return
 
     def redrawCell(self, row=None, col=None, recname=None, colname=None):
         """Redraw a specific cell only"""
 
         text = self.model.getValueAt(row,col)
-        self.delete('celltext'+str(col)+'_'+str(row))
         self.drawText(row, col, text)
         return
 
@@ -576,7 +757,7 @@ class Table(Canvas):
         colnames = self.model.df.columns[cols]
         for c in colnames:
             self.columncolors[c] = clr
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def colorColumns(self, cols=None, color='gray'):
@@ -615,23 +796,19 @@ class Table(Canvas):
         """Color individual cells in column(s). Requires that the rowcolors
          dataframe has been set. This needs to be updated if the index is reset"""
 
-        #print (self.rowcolors)
         df = self.model.df
         rc = self.rowcolors
         rows = self.visiblerows
-        offset = rows[0]
-        idx = df.index[rows]
-        #diff = df.index.difference(rc.index)
-        #print (diff)
-        #print (rc)
-        for col in self.visiblecols:
-            colname = df.columns[col]
-            if colname in list(rc.columns):
-                colors = rc[colname].loc[idx]
-                for row in rows:
-                    clr = colors.iloc[row-offset]
-                    if not pd.isnull(clr):
-                        self.drawRect(row, col, color=clr, tag='colorrect', delete=0)
+        if len(rows) == 0 or len(rc.columns) == 0:
+            return
+        cols = [c for c in self.visiblecols if df.columns[c] in rc.columns]
+        if len(cols) == 0:
+            return
+        #look up the colors for the visible block in one go
+        idx = self.model.getIndex()[rows]
+        colors = rc.loc[idx, df.columns[cols]].to_numpy(dtype=object)
+        self.drawColorLayer(colors, rows[0], cols, tag='colorrect')
+        self.lower('colorrect')
         return
 
     def setRowColors(self, rows=None, clr=None, cols=None):
@@ -646,10 +823,10 @@ class Table(Canvas):
             clr = pickColor(self,'#dcf1fc')
         if clr == None:
             return
-        if rows == None:
+        if rows is None:
             rows = self.multiplerowlist
         df = self.model.df
-        idx = df.index[rows]
+        idx = self.model.getIndex()[getIndexer(rows)]
         rc = self.rowcolors
         if cols is None:
             cols = self.multiplecollist
@@ -661,7 +838,7 @@ class Table(Canvas):
                 rc[c] = pd.Series("",index=df.index)
             #update colors dataframe
             rc.loc[idx,c] = clr
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def setColorbyValue(self):
@@ -687,7 +864,7 @@ class Table(Canvas):
             clrs = pd.Series(clrs,index=df.index)
             rc = self.rowcolors
             rc[colname] = clrs
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def values_to_colors(self, x, cmap='jet', alpha=1):
@@ -723,7 +900,7 @@ class Table(Canvas):
         for col in cols:
             colname = df.columns[col]
             cfa[colname] = aln
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def getScale(self):
@@ -742,7 +919,7 @@ class Table(Canvas):
             ch.wrap = True
         else:
             ch.wrap = False
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def zoomIn(self, event=None):
@@ -828,45 +1005,85 @@ class Table(Canvas):
         return
 
     def setColPositions(self):
-        """Determine current column grid positions"""
+        """Determine current column grid positions. These are stored as a
+        cumulative array of column widths that is only rebuilt when the
+        columns, cell width or the version of columnwidths change."""
 
         df = self.model.df
-        self.col_positions=[]
+        cols = df.columns
+        cw = self.columnwidths
+        if type(cw) is not util.ColumnWidths:
+            #replaced with a plain dict, e.g. when settings are loaded
+            cw = self.columnwidths = util.ColumnWidths(cw)
+        key = (cols, cw, cw.version, self.cellwidth, self.x_start)
+        old = self._colposkey
+        if old is not None and old[0] is cols and old[1] is cw \
+            and old[2:] == key[2:] and isinstance(self.col_positions, np.ndarray):
+            self.tablewidth = self.col_positions[-1].item()
+            return
         w = self.cellwidth
-        x_pos = self.x_start
-        self.col_positions.append(x_pos)
-        for col in range(self.cols):
-            try:
-                colname = df.columns[col].encode('utf-8','ignore').decode('utf-8')
-            except:
-                colname = str(df.columns[col])
-            if colname in self.columnwidths:
-                x_pos = x_pos+self.columnwidths[colname]
-            else:
-                x_pos = x_pos+w
-            self.col_positions.append(x_pos)
-        self.tablewidth = self.col_positions[len(self.col_positions)-1]
-        return
+        if len(cw) > 0:
+            widths = [cw.get(str(c), w) for c in cols]
+        else:
+            widths = [w] * len(cols)
+        pos = np.empty(len(cols)+1, dtype=np.asarray(widths+[w]).dtype)
+        pos[0] = self.x_start
+        np.cumsum(widths, out=pos[1:])
+        pos[1:] += self.x_start
+        self.col_positions = pos
+        self.tablewidth = pos[-1].item()
+        self._colposkey = key
+        return
+
+    def getColumnAt(self, x):
+        """Get the column containing canvas coordinate x using a binary
+        search of the column positions. Returns None if outside the table."""
+
+        pos = self.col_positions
+        col = int(np.searchsorted(pos, x, side='left')) - 1
+        if col < 0 or col >= len(pos)-1:
+            return
+        return col
 
     def sortTable(self, columnIndex=None, ascending=1, index=False):
         """Sort rows based on currently selected columns"""
 
-        df = self.model.df
         if columnIndex == None:
             columnIndex = self.multiplecollist
         if isinstance(columnIndex, int):
             columnIndex = [columnIndex]
 
-        if index == True:
-            df.sort_index(inplace=True)
+        if self.filtered == True:
+            #only the order of the shown rows is changed
+            self.sortRowView(columnIndex, ascending, index)
         else:
-            colnames = list(df.columns[columnIndex])
             try:
-                df.sort_values(by=colnames, inplace=True, ascending=ascending)
+                self.model.sortRows(columnIndex, ascending, index)
             except Exception as e:
                 print('could not sort')
                 print (e)
-        self.redraw()
+        self.scheduleRedraw()
+        return
+
+    def sortRowView(self, columnIndex, ascending=1, index=False):
+        """Sort the rows shown in a filtered table"""
+
+        model = self.model
+        view = model.rowview
+        if index == True:
+            sub = model.getIndex().to_frame(index=False)
+            by = list(sub.columns)
+        else:
+            sub = model.df.iloc[view, columnIndex]
+            sub.columns = by = list(range(len(columnIndex)))
+            sub = sub.reset_index(drop=True)
+        try:
+            order = sub.sort_values(by=by, ascending=ascending).index.to_numpy()
+        except Exception as e:
+            print('could not sort')
+            print (e)
+            return
+        model.setRowView(view[order])
         return
 
     def sortColumnIndex(self):
@@ -883,7 +1100,7 @@ class Table(Canvas):
         a = list(set(cols) - set(newcols))
         newcols.extend(a)
         self.model.df = self.model.df.reindex(columns=newcols)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def groupby(self, colindex):
@@ -902,7 +1119,7 @@ class Table(Canvas):
         self.setSelectedCol(0)
         self.update_rowcolors()
         #self.set_rowcolors_index()
-        self.redraw()
+        self.scheduleRedraw()
         if hasattr(self, 'pf'):
             self.pf.updateData()
         return
@@ -918,7 +1135,7 @@ class Table(Canvas):
         self.model.df.reset_index(drop=drop, inplace=True)
         self.update_rowcolors()
         #self.set_rowcolors_index()
-        self.redraw()
+        self.scheduleRedraw()
         #self.drawSelectedCol()
         if hasattr(self, 'pf'):
             self.pf.updateData()
@@ -943,7 +1160,7 @@ class Table(Canvas):
 
         self.storeCurrent()
         df.columns = df.columns.get_level_values(level)
-        self.redraw()
+        self.scheduleRedraw()
         if hasattr(self, 'pf'):
             self.pf.updateData()
         self.tableChanged()
@@ -953,7 +1170,7 @@ class Table(Canvas):
         """Copy index to a column"""
 
         self.model.copyIndex()
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def renameIndex(self, ):
@@ -965,6 +1182,7 @@ class Table(Canvas):
                                        parent=self.parentframe)
         if name:
             self.model.df.index.name = name
+            self.model.markChanged()
             self.rowindexheader.redraw()
         return
 
@@ -1011,7 +1229,7 @@ class Table(Canvas):
 
         self.xview(*args)
         self.colheader.xview(*args)
-        self.redrawVisible()
+        self.redrawScrolled()
         return
 
     def set_yviews(self,*args):
@@ -1019,7 +1237,7 @@ class Table(Canvas):
 
         self.yview(*args)
         self.rowheader.yview(*args)
-        self.redrawVisible()
+        self.redrawScrolled()
         return
 
     def insertRow(self):
@@ -1029,7 +1247,7 @@ class Table(Canvas):
         key = self.model.insertRow(row)
         #self.rowcolors.append(pd.DataFrame(np.nan,index=[key],columns=self.model.df.columns))
         self.update_rowcolors()
-        self.redraw()
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
@@ -1045,7 +1263,7 @@ class Table(Canvas):
         self.storeCurrent()
         keys = self.model.autoAddRows(num)
         self.update_rowcolors()
-        self.redraw()
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
@@ -1076,7 +1294,7 @@ class Table(Canvas):
                 self.model.addColumn(newname, dtype)
                 self.parentframe.configure(width=self.width)
                 self.update_rowcolors()
-                self.redraw()
+                self.scheduleRedraw()
                 self.tableChanged()
         return
 
@@ -1093,11 +1311,11 @@ class Table(Canvas):
             if n == True:
                 self.storeCurrent()
                 rows = self.multiplerowlist
-                self.model.deleteRows(rows)
+                self.model.deleteRows(asSelection(rows))
                 self.setSelectedRow(0)
                 self.clearSelected()
                 self.update_rowcolors()
-                self.redraw()
+                self.scheduleRedraw()
         else:
             if n:
                 self.storeCurrent()
@@ -1106,7 +1324,7 @@ class Table(Canvas):
                 self.setSelectedRow(row-1)
                 self.clearSelected()
                 self.update_rowcolors()
-                self.redraw()
+                self.scheduleRedraw()
         return
 
     def duplicateRows(self):
@@ -1114,9 +1332,9 @@ class Table(Canvas):
 
         rows = self.multiplerowlist
         df = self.model.df
-        d = df.iloc[rows]
+        d = df.iloc[self.model.getRowPositions(rows)]
         self.model.df = pd.concat([df, d])
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def deleteColumn(self, ask=True):
@@ -1134,7 +1352,7 @@ class Table(Canvas):
         self.model.deleteColumns(cols)
         self.setSelectedCol(0)
         self.update_rowcolors()
-        self.redraw()
+        self.scheduleRedraw()
         #self.drawSelectedCol()
         self.tableChanged()
         return
@@ -1170,7 +1388,7 @@ class Table(Canvas):
             self.model.df = m.join(df)
         else:
             self.model.df = df.join(m)
-        self.redraw()
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
@@ -1178,6 +1396,7 @@ class Table(Canvas):
         """Callback to be used when dataframe changes so that other
             widgets and data can be updated"""
 
+        self.model.markChanged()
         self.updateFunctions()
         self.updateWidgets()
         if hasattr(self, 'pf'):
@@ -1185,19 +1404,27 @@ class Table(Canvas):
         return
 
     def storeCurrent(self):
-        """Store current version of the table before a major change is made"""
+        """Store current version of the table before a major change is made.
+        Older versions are kept as the changes between them, see UndoJournal."""
 
-        self.prevdf = self.model.df.copy()
+        model = self.model
+        self.journal.levels = int(self.undolevels)
+        self.journal.budget = float(self.undomemory)
+        #only columns changed since the last entry are compared
+        self.journal.push(model.df, versions=(model, model.getColumnVersions()))
+        #the change that follows may be made in place
+        model.markChanged()
+        self.journal.setVersions((model, model.getColumnVersions()))
         return
 
     def undo(self, event=None):
         """Undo last major table change"""
 
-        if self.prevdf is None:
+        df = self.journal.undo(self.model.df)
+        if df is None:
             return
-        self.model.df = self.prevdf
+        self.model.df = df
         self.redraw()
-        self.prevdf = None
         self.updateModel(self.model)
         return
 
@@ -1214,7 +1441,7 @@ class Table(Canvas):
             return
         self.storeCurrent()
         self.model.deleteCells(rows, cols)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def clearData(self, evt=None):
@@ -1238,7 +1465,7 @@ class Table(Canvas):
         self.storeCurrent()
         model = TableModel(pd.DataFrame())
         self.updateModel(model)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def fillColumn(self):
@@ -1290,7 +1517,8 @@ class Table(Canvas):
             data = pd.Series(np.arange(low,high,step))
         col = df.columns[self.currentcol]
         df[col] = data
-        self.redraw()
+        self.model.markChanged([col])
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
@@ -1303,7 +1531,7 @@ class Table(Canvas):
                                                 parent=self.parentframe)
         self.model.auto_AddColumns(numcols)
         self.parentframe.configure(width=self.width)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def setColumnType(self):
@@ -1323,7 +1551,8 @@ class Table(Canvas):
         t = d.results[0]
         try:
             self.model.df[col] = df[col].astype(t)
-            self.redraw()
+            self.model.markChanged([col])
+            self.scheduleRedraw()
         except:
             logging.error("Exception occurred", exc_info=True)
             print(' to convert column data type')
@@ -1351,7 +1580,7 @@ class Table(Canvas):
         new = df[df.duplicated(subset=cols,keep=keep)]
         if remove == True:
             self.model.df = df.drop_duplicates(subset=cols,keep=keep)
-            self.redraw()
+            self.scheduleRedraw()
         if len(new)>0:
             self.createChildTable(new)
         return
@@ -1422,7 +1651,7 @@ class Table(Canvas):
         if n == None:
             return
         self.model.df = df
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def createCategorical(self):
@@ -1475,10 +1704,11 @@ class Table(Canvas):
             df[name] = pd.cut(df[col], bins, labels=binlabels)
         else:
             df[name] = df[col].astype('category')
+        self.model.markChanged([name])
         if name != col:
             self.placeColumn(name, col)
         else:
-            self.redraw()
+            self.scheduleRedraw()
         return
 
     def _getFunction(self, funcname, obj=None):
@@ -1541,10 +1771,11 @@ class Table(Canvas):
             if inplace == True:
                 newcol = cols[0]
             df[newcol] = df[cols].apply(func, 1)
+        self.model.markChanged([newcol])
         if inplace == False:
             self.placeColumn(newcol,cols[-1])
         else:
-            self.redraw()
+            self.scheduleRedraw()
         return
 
     def applyTransformFunction(self, evt=None):
@@ -1594,10 +1825,12 @@ class Table(Canvas):
         name = col+suffix
         if inplace == True:
             df[col] = new
+            self.model.markChanged([col])
         else:
             df[name] = new
+            self.model.markChanged([name])
             self.placeColumn(name, cols[-1])
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def resample(self):
@@ -1687,7 +1920,7 @@ class Table(Canvas):
             new = df[col].str.split(sep).apply(pd.Series)
             new.columns = [col+'_'+str(i) for i in new.columns]
             self.model.df = pd.concat([df,new],1)
-            self.redraw()
+            self.scheduleRedraw()
             return
         elif func == 'strip':
             x = df[col].str.strip()
@@ -1714,9 +1947,10 @@ class Table(Canvas):
         else:
             newcol = col
         df[newcol] = x
+        self.model.markChanged([newcol])
         if inplace == 0:
             self.placeColumn(newcol,col)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def convertDates(self):
@@ -1777,19 +2011,25 @@ class Table(Canvas):
                 messagebox.showwarning("Convert error", e,
                                         parent=self.parentframe)
                 return
+        self.model.markChanged([colname])
         if inplace == False or len(cols)>1:
             self.placeColumn(colname, cols[-1])
 
-        self.redraw()
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
+    @property
+    def filtered(self):
+        """True if only some rows of the model are shown"""
+
+        model = self.__dict__.get('model')
+        return getattr(model, 'rowview', None) is not None
+
     def showAll(self):
         """Re-show unfiltered"""
 
-        if hasattr(self, 'dataframe'):
-            self.model.df = self.dataframe
-        self.filtered = False
+        self.model.setRowView(None)
         self.redraw()
         return
 
@@ -1811,18 +2051,27 @@ class Table(Canvas):
         return self.sv
 
     def getRowsFromIndex(self, idx=None):
-        """Get row positions from index values"""
+        """Get row positions from index values. Every row with one of the
+        labels is included, also for a non unique index.
+        Returns:
+            a Selection of rows
+        """
 
-        df = self.model.df
-        if idx is not None:
-            return [df.index.get_loc(i) for i in idx]
-        return []
+        if idx is None:
+            return Selection()
+        if not hasattr(idx, '__len__') or isinstance(idx, (str, tuple)):
+            idx = [idx]
+        mask = labelMask(self.model.getIndex(), idx)
+        return Selection.fromMask(mask)
 
     def getRowsFromMask(self, mask):
-        df = self.model.df
-        if mask is not None:
-            idx = df.ix[mask].index
-        return self.getRowsFromIndex(idx)
+        """Get row positions from a boolean mask of the rows"""
+
+        if mask is None:
+            return Selection()
+        if isinstance(mask, pd.Series):
+            mask = mask.fillna(False).to_numpy()
+        return Selection.fromMask(np.asarray(mask, dtype=bool))
 
     def findText(self, evt=None):
         """Simple text search in whole table"""
@@ -1858,12 +2107,16 @@ class Table(Canvas):
     def _eval(self, df, ex):
         """Evaluate an expression using numexpr"""
 
-        #uses assignments to globals() - check this is ok
-        import numexpr as ne
-        for c in df:
-            globals()[c] = df[c].to_numpy()
-        a = ne.evaluate(ex)
-        return a
+        return evaluate(df, ex)
+
+    def getFormulaEngine(self):
+        """Get the formula engine for the stored formulae, a new one is
+        made if the formulae were replaced e.g. when a project is loaded"""
+
+        fe = self.formulaengine
+        if fe is None or fe.formulae is not self.formulae:
+            fe = self.formulaengine = FormulaEngine(self.formulae)
+        return fe
 
     def evalFunction(self, evt=None):
         """Apply a function to create new columns"""
@@ -1891,16 +2144,25 @@ class Table(Canvas):
             logging.error("Exception occurred", exc_info=True)
             self.functionentry.configure(style="Red.TCombobox")
             return
-        #keep track of which cols are functions?
-        self.formulae[n] = ex
+        self.model.markChanged([n])
+        #keep track of which cols are functions
+        fe = self.getFormulaEngine()
+        try:
+            fe.add(n, ex)
+            fe.setEvaluated(n, self.model)
+        except ValueError as e:
+            #the column no longer follows any stored formula
+            print ('%s, formula not stored' %e)
+            fe.remove(n)
+            self.functionentry.configure(style="Red.TCombobox")
 
         if self.placecolvar.get() == 1:
             cols = df.columns
             self.placeColumn(n,cols[0])
         if self.recalculatevar.get() == 1:
-            self.recalculateFunctions(omit=n)
+            self.recalculateFunctions(cols=[n])
         else:
-            self.redraw()
+            self.scheduleRedraw()
         if hasattr(self, 'pf') and self.updateplotvar.get()==1:
             self.plotSelected()
         #update functions list in dropdown
@@ -1908,21 +2170,30 @@ class Table(Canvas):
         self.functionentry['values'] = funclist
         return
 
-    def recalculateFunctions(self, omit=None):
-        """Re evaluate any columns that were derived from functions
-        and dependent on other columns (except self derived?)"""
+    def recalculateFunctions(self, cols=None):
+        """Re evaluate columns derived from functions that depend on
+        changed columns. Formulae are done after any they use.
+        Args:
+            cols: names of changed columns, if None all formulae whose
+                columns changed since they were last calculated
+        """
 
-        df = self.model.df
-        for n in self.formulae:
-            if n==omit: continue
-            ex = self.formulae[n]
-            #need to check if self calculation here...
-            try:
-                df[n] = self._eval(df, ex)
-            except:
-                logging.error("Exception occurred", exc_info=True)
-                print('could not calculate %s' %ex)
-        self.redraw()
+        fe = self.getFormulaEngine()
+        updated, errors = fe.recalculate(self.model, cols)
+        for n in errors:
+            logging.error("Exception occurred", exc_info=errors[n])
+            print('could not calculate %s' %self.formulae[n])
+        self.scheduleRedraw()
+        return
+
+    def updateFormulae(self, cols):
+        """Recalculate functions using edited columns if recalculation
+        is turned on in the function bar"""
+
+        if not hasattr(self, 'recalculatevar') or self.recalculatevar.get() == 0:
+            return
+        if len(self.getFormulaEngine().getDependents(cols)) > 0:
+            self.recalculateFunctions(cols)
         return
 
     def updateFunctions(self):
@@ -1932,9 +2203,10 @@ class Table(Canvas):
             return
         df = self.model.df
         cols = list(df.columns)
+        fe = self.getFormulaEngine()
         for n in list(self.formulae.keys()):
             if n not in cols:
-                del(self.formulae[n])
+                fe.remove(n)
         return
 
     def functionsBar(self, evt=None):
@@ -1993,6 +2265,7 @@ class Table(Canvas):
             if n == None:
                 return
             self.formulae = {}
+            self.formulaengine = None
             self.functionentry['values'] = []
             return
         def addcolname(evt):
@@ -2007,8 +2280,6 @@ class Table(Canvas):
 
         if hasattr(self, 'evalframe') and self.evalframe != None:
             return
-        if not hasattr(self, 'formulae'):
-            self.formulae = {}
         ef = self.evalframe = Frame(self.parentframe)
         ef.grid(row=self.queryrow,column=0,columnspan=3,sticky='news')
         bf = Frame(ef)
@@ -2040,7 +2311,7 @@ class Table(Canvas):
         self.recalculatevar = IntVar()
         Checkbutton(bf, text="Update plot", variable=self.updateplotvar).pack(side=LEFT)
         Checkbutton(bf, text="Place new columns", variable=self.placecolvar).pack(side=LEFT)
-        Checkbutton(bf, text="Recalculate all", variable=self.recalculatevar).pack(side=LEFT)
+        Checkbutton(bf, text="Recalculate", variable=self.recalculatevar).pack(side=LEFT)
         return
 
     def resizeColumn(self, col, width):
@@ -2070,25 +2341,15 @@ class Table(Canvas):
     def get_col_clicked(self,event):
         """Get column where event on the canvas occurs"""
 
-        w = self.cellwidth
         x = int(self.canvasx(event.x))
-        x_start = self.x_start
-        for colpos in self.col_positions:
-            try:
-                nextpos = self.col_positions[self.col_positions.index(colpos)+1]
-            except:
-                nextpos = self.tablewidth
-            if x > colpos and x <= nextpos:
-                #print 'x=', x, 'colpos', colpos, self.col_positio.drawSelectedRectns.index(colpos)
-                return self.col_positions.index(colpos)
-        return
+        return self.getColumnAt(x)
 
     def setSelectedRow(self, row=None):
         """Set currently selected row and reset multiple row list"""
 
         self.currentrow = row
         self.startrow = row
-        self.multiplerowlist = []
+        self.multiplerowlist = Selection()
         if row != None:
             self.multiplerowlist.append(row)
         return
@@ -2103,11 +2364,10 @@ class Table(Canvas):
 
     def setSelectedRows(self, rows):
 
-        self.startrow = rows[0]
-        self.endrow = rows[-1]
-        self.multiplerowlist = []
-        for r in rows:
-            self.multiplerowlist.append(r)
+        self.multiplerowlist = Selection(rows)
+        self.startrow = self.multiplerowlist[0]
+        self.endrow = self.multiplerowlist[-1]
+        return
 
     def setSelectedCells(self, startrow, endrow, startcol, endcol):
         """Set a block of cells selected"""
@@ -2118,8 +2378,8 @@ class Table(Canvas):
             return
         if endrow > self.rows or endcol > self.cols:
             return
-        for r in range(startrow, endrow):
-            self.multiplerowlist.append(r)
+        self.multiplerowlist = asSelection(self.multiplerowlist).copy()
+        self.multiplerowlist.addRange(startrow, endrow)
         for c in range(startcol, endcol):
             self.multiplecollist.append(c)
         return
@@ -2137,8 +2397,9 @@ class Table(Canvas):
 
         self.startrow = 0
         self.endrow = self.rows
-        self.multiplerowlist = list(range(self.startrow,self.endrow))
+        self.multiplerowlist = Selection.fromRange(self.startrow, self.endrow)
         self.drawMultipleRows(self.multiplerowlist)
+        self.rowheader.drawSelectedRows(self.multiplerowlist)
         self.startcol = 0
         self.endcol = self.cols
         self.multiplecollist = list(range(self.startcol, self.endcol))
@@ -2150,7 +2411,7 @@ class Table(Canvas):
         completely new cols and rows e.g. after model is updated."""
 
         self.multiplecollist = []
-        self.multiplerowlist = []
+        self.multiplerowlist = Selection()
         self.startrow = self.endrow = 0
         self.delete('multicellrect','multiplesel','colrect')
         return
@@ -2158,19 +2419,17 @@ class Table(Canvas):
     def getCellCoords(self, row, col):
         """Get x-y coordinates to drawing a cell in a given row/col"""
 
-        colname=self.model.getColumnName(col)
-        if colname in self.columnwidths:
-            w=self.columnwidths[colname]
-        else:
-            w=self.cellwidth
         h=self.rowheight
-        x_start=self.x_start
         y_start=self.y_start
+        pos = self.col_positions
 
         #get nearest rect co-ords for that row/col
-        x1=self.col_positions[col]
+        x1=pos[col]
+        if col+1 < len(pos):
+            x2=pos[col+1]
+        else:
+            x2=x1+self.cellwidth
         y1=y_start+h*row
-        x2=x1+w
         y2=y1+h
         return x1,y1,x2,y2
 
@@ -2218,8 +2477,7 @@ class Table(Canvas):
         self.startrow = current-1
         self.endrow = current-1
         #reset multiple selection list
-        self.multiplerowlist=[]
-        self.multiplerowlist.append(self.currentrow)
+        self.multiplerowlist = Selection([self.currentrow])
         self.drawSelectedRect(self.currentrow, self.currentcol)
         self.drawSelectedRow()
         coltype = self.model.getColumnType(self.currentcol)
@@ -2236,8 +2494,7 @@ class Table(Canvas):
         self.startrow = current+1
         self.endrow = current+1
         #reset multiple selection list
-        self.multiplerowlist=[]
-        self.multiplerowlist.append(self.currentrow)
+        self.multiplerowlist = Selection([self.currentrow])
         self.drawSelectedRect(self.currentrow, self.currentcol)
         self.drawSelectedRow()
         coltype = self.model.getColumnType(self.currentcol)
@@ -2270,8 +2527,7 @@ class Table(Canvas):
         self.startcol = colclicked
         self.endcol = colclicked
         #reset multiple selection list
-        self.multiplerowlist=[]
-        self.multiplerowlist.append(rowclicked)
+        self.multiplerowlist = Selection([rowclicked])
         if 0 <= rowclicked < self.rows and 0 <= colclicked < self.cols:
             self.setSelectedRow(rowclicked)
             self.setSelectedCol(colclicked)
@@ -2314,11 +2570,12 @@ class Table(Canvas):
         rowclicked = self.get_row_clicked(event)
         colclicked = self.get_col_clicked(event)
         if 0 <= rowclicked < self.rows and 0 <= colclicked < self.cols:
-            if rowclicked not in self.multiplerowlist:
-                self.multiplerowlist.append(rowclicked)
+            rows = self.multiplerowlist = asSelection(self.multiplerowlist)
+            if rowclicked not in rows:
+                rows.append(rowclicked)
             else:
-                self.multiplerowlist.remove(rowclicked)
-            self.drawMultipleRows(self.multiplerowlist)
+                rows.remove(rowclicked)
+            self.drawMultipleRows(rows)
             if colclicked not in self.multiplecollist:
                 self.multiplecollist.append(colclicked)
             self.drawMultipleCells()
@@ -2357,16 +2614,15 @@ class Table(Canvas):
         #draw the selected rows
         if self.endrow != self.startrow:
             if self.endrow < self.startrow:
-                self.multiplerowlist=list(range(self.endrow, self.startrow+1))
+                self.multiplerowlist = Selection.fromRange(self.endrow, self.startrow+1)
             else:
-                self.multiplerowlist=list(range(self.startrow, self.endrow+1))
+                self.multiplerowlist = Selection.fromRange(self.startrow, self.endrow+1)
             self.drawMultipleRows(self.multiplerowlist)
             self.rowheader.drawSelectedRows(self.multiplerowlist)
             #draw selected cells outline using row and col lists
             self.drawMultipleCells()
         else:
-            self.multiplerowlist = []
-            self.multiplerowlist.append(self.currentrow)
+            self.multiplerowlist = Selection([self.currentrow])
             if len(self.multiplecollist) >= 1:
                 self.drawMultipleCells()
             self.delete('multiplesel')
@@ -2414,7 +2670,7 @@ class Table(Canvas):
             #print (self.currentcol, self.visiblecols)
             self.xview('moveto', x)
             self.colheader.xview('moveto', x)
-            self.redraw()
+            self.redrawScrolled()
 
         if self.currentrow <= rmin:
             #we need to shift y to page up enough
@@ -2424,7 +2680,7 @@ class Table(Canvas):
         if self.currentrow >= rmax or self.currentrow <= rmin:
             self.yview('moveto', y)
             self.rowheader.yview('moveto', y)
-            self.redraw()
+            self.redrawScrolled()
 
         self.drawSelectedRect(self.currentrow, self.currentcol)
         coltype = self.model.getColumnType(self.currentcol)
@@ -2501,7 +2757,7 @@ class Table(Canvas):
         ind1 = self.model.df.columns.get_loc(col1)
         ind2 = self.model.df.columns.get_loc(col2)
         self.model.moveColumn(ind1, ind2+1)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def gotonextCell(self):
@@ -2520,6 +2776,8 @@ class Table(Canvas):
             if idx is None:
                 return
             rows = self.getRowsFromIndex(idx)
+            if len(rows) == 0:
+                return
             row=rows[0]
         self.setSelectedRow(row)
         self.drawSelectedRow()
@@ -2771,7 +3029,7 @@ class Table(Canvas):
             df.columns = df.columns.str.lower()
         elif upper == 1:
             df.columns = df.columns.str.upper()
-        self.redraw()
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
@@ -2815,8 +3073,9 @@ class Table(Canvas):
             if removetext == 1:
                 x = x.replace( '[^\d.]+', '', regex=True)
             self.model.df[c] = pd.to_numeric(x, errors='coerce').astype(convtype)
+        self.model.markChanged(list(colnames))
 
-        self.redraw()
+        self.scheduleRedraw()
         self.tableChanged()
         return
 
@@ -2919,7 +3178,31 @@ class Table(Canvas):
         """memory usage of current table"""
 
         df = self.model.df
-        return df.memory_usage()
+        return df.memory_usage(deep=True)
+
+    def optimizeMemory(self):
+        """Show the memory used by each column and convert columns to
+        smaller types"""
+
+        from .dialogs import MemoryDialog
+        dlg = MemoryDialog(self, df=self.model.df, title='Optimize Memory')
+        return
+
+    def compactColumns(self, catratio=0.5, arrowstrings=False):
+        """Convert columns to smaller dtypes without changing values.
+        Args:
+            catratio: strings with fewer unique values than this fraction
+                of rows become categories
+            arrowstrings: store other strings as pyarrow strings
+        Returns:
+            a report of the memory used by each column before and after
+        """
+
+        df, report = util.compactDtypes(self.model.df, catratio, arrowstrings)
+        self.storeCurrent()
+        self.model.df = df
+        self.scheduleRedraw()
+        return report
 
     def showasText(self):
         """Get table as formatted text - for printing"""
@@ -2979,6 +3262,7 @@ class Table(Canvas):
                         "Select All" : self.selectAll,
                         #"Auto Fit Columns" : self.autoResizeColumns,
                         "Table Info" : self.showInfo,
+                        "Optimize Memory" : self.optimizeMemory,
                         "Set Color" : self.setRowColors,
                         "Show as Text" : self.showasText,
                         "Filter Rows" : self.queryBar,
@@ -2986,7 +3270,7 @@ class Table(Canvas):
                         "Open": self.load,
                         "Save": self.save,
                         "Save As": self.saveAs,
-                        "Import Text/CSV": lambda: self.importCSV(dialog=True),
+                        "Import Text/CSV": lambda: self.importCSV(dialog=True, background=True),
                         "Import hdf5": lambda: self.importHDF(dialog=True),
                         "Export": self.doExport,
                         "Plot Selected" : self.plotSelected,
@@ -3008,7 +3292,7 @@ class Table(Canvas):
         filecommands = ['Open','Import Text/CSV',"Import hdf5",'Save','Save As','Export']
         editcommands = ['Undo Last Change','Copy Table','Find/Replace']
         plotcommands = ['Plot Selected','Hide plot','Show plot']
-        tablecommands = ['Table to Text','Clean Data','Clear Formatting']
+        tablecommands = ['Table to Text','Clean Data','Clear Formatting','Optimize Memory']
 
         def createSubMenu(parent, label, commands):
             menu = Menu(parent, tearoff = 0)
@@ -3042,7 +3326,7 @@ class Table(Canvas):
                         continue
                     if action == 'Fill Right' and (cols == None or len(cols) <= 1):
                         continue
-                    if action == 'Undo' and self.prevdf is None:
+                    if action == 'Undo' and not self.journal.canUndo():
                         continue
                     else:
                         popupmenu.add_command(label=action, command=defaultactions[action])
@@ -3073,11 +3357,15 @@ class Table(Canvas):
 
         self.storeCurrent()
         df = self.model.df
-        val = df.iloc[rowlist[0],collist[0]]
+        rows = getIndexer(rowlist)
+        if isinstance(rows, slice):
+            rows = np.arange(rows.start, rows.stop)
+        rows = self.model.getRowPositions(rows)
+        val = df.iloc[rows[0],collist[0]]
         #remove first element as we don't want to overwrite it
-        rowlist.remove(rowlist[0])
-        df.iloc[rowlist,collist] = val
-        self.redraw()
+        df.iloc[rows[1:],collist] = val
+        self.model.markChanged([df.columns[c] for c in collist])
+        self.scheduleRedraw()
         return
 
     def fillAcross(self, collist, rowlist):
@@ -3087,7 +3375,7 @@ class Table(Canvas):
         model = self.model
         frstcol = collist[0]
         collist.remove(frstcol)
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def getSelectionValues(self):
@@ -3119,7 +3407,14 @@ class Table(Canvas):
     def showPlotViewer(self, parent=None):
         """Create plot frame"""
 
+        if not hasattr(self, 'pf') and hasattr(self, 'parenttable'):
+            #child tables share the viewer of the parent
+            return self.parenttable.showPlotViewer()
         if not hasattr(self, 'pf'):
+            #matplotlib is only imported once a plot viewer is needed
+            from .plotting import PlotViewer
+            if parent is None:
+                parent = self.plotframe
             self.pf = PlotViewer(table=self, parent=parent)
         if hasattr(self, 'child') and self.child is not None:
             self.child.pf = self.pf
@@ -3144,16 +3439,16 @@ class Table(Canvas):
 
         df = self.model.df
         cols, rows = self.multiplecollist, self.multiplerowlist
-        if not type(rows) is list:  # or self.allcols == True:
-            rows = list(rows)
         if self.__last_left_click_src == "row":
             if len(cols) < 1:
                 cols = list(range(self.cols))
                 rows = [self.currentrow]
         else:
             if len(rows) < 1 or self.allrows == True:
-                rows = list(range(self.rows))
+                rows = Selection.fromRange(0, self.rows)
                 cols = [self.currentcol]
+        #a single block of rows is taken as a slice
+        rows = self.model.getRowPositions(rows)
         try:
             data = df.iloc[rows,cols]
         except Exception as e:
@@ -3177,9 +3472,10 @@ class Table(Canvas):
 
         df = self.model.df
         if len(self.multiplerowlist) > 0:
-            data = df.iloc[self.multiplerowlist,]
+            rows = self.multiplerowlist
         else:
-            data = df.iloc[[self.currentrow],]
+            rows = [self.currentrow]
+        data = df.iloc[self.model.getRowPositions(rows),]
         return data
 
     def getPlotData(self):
@@ -3193,7 +3489,10 @@ class Table(Canvas):
     def plotSelected(self):
         """Plot the selected data in the associated plotviewer"""
 
-        if not hasattr(self, 'pf') or self.pf == None:
+        if not hasattr(self, 'pf'):
+            self.showPlotViewer()
+        elif self.pf == None:
+            from .plotting import PlotViewer
             self.pf = PlotViewer(table=self)
         else:
             if type(self.pf.main) is Toplevel:
@@ -3213,7 +3512,7 @@ class Table(Canvas):
     def plot3D(self):
 
         if not hasattr(self, 'pf'):
-            self.pf = PlotViewer(table=self)
+            self.showPlotViewer()
 
         data = self.getPlotData()
         self.pf.data = data
@@ -3223,27 +3522,73 @@ class Table(Canvas):
     #--- Drawing stuff ---
 
     def drawGrid(self, startrow, endrow):
-        """Draw the table grid lines"""
+        """Draw the table grid lines. Only lines in the visible region plus a
+        small margin are drawn and the line items are reused when scrolling."""
 
-        self.delete('gridline','text')
-        rows=len(self.rowrange)
-        cols=self.cols
-        w = self.cellwidth
+        m = 2
         h = self.rowheight
-        x_start=self.x_start
-        y_start=self.y_start
-        x_pos=x_start
-
+        y_start = self.y_start
+        pos = self.col_positions
+        rows = self.rows
+        cols = self.cols
+        if len(self.visiblecols) == 0:
+            return
+        sr = max(0, startrow-m)
+        er = min(rows, endrow+m)
+        sc = max(0, self.visiblecols[0]-m)
+        ec = min(cols, self.visiblecols[-1]+1+m)
+        #line extents are rounded out to blocks so they are not moved on every scroll
+        y1 = y_start + (sr//64*64)*h
+        y2 = y_start + min(rows, (er//64+1)*64)*h
+        x1 = pos[sc//16*16]
+        x2 = pos[min(cols, (ec//16+1)*16)]
+
+        lines = {}
         if self.vertlines==1:
-            for col in range(cols+1):
-                x=self.col_positions[col]
-                self.create_line(x,y_start,x,y_start+rows*h, tag='gridline',
-                                     fill=self.grid_color, width=self.linewidth)
+            for col in range(sc, ec+1):
+                x = pos[col]
+                lines['v',col] = (x,y1,x,y2)
         if self.horizlines==1:
-            for row in range(startrow, endrow+1):
-                y_pos=y_start+row*h
-                self.create_line(x_start,y_pos,self.tablewidth,y_pos, tag='gridline',
-                                    fill=self.grid_color, width=self.linewidth)
+            for row in range(sr, er+1):
+                y = y_start+row*h
+                lines['h',row] = (x1,y,x2,y)
+        self.placeLines(lines)
+        return
+
+    def placeLines(self, lines):
+        """Set the pooled grid line items to the given coords, reusing items
+        no longer needed and only updating those that changed.
+
+        Args:
+            lines: dict of coords keyed by ('v', col) or ('h', row)
+        """
+
+        pool = self._gridlines
+        style = (self.grid_color, self.linewidth)
+        free = [pool.pop(k) for k in list(pool.keys()) if k not in lines]
+        created = False
+        for key in lines:
+            coords = lines[key]
+            entry = pool.get(key)
+            if entry is None and len(free) > 0:
+                entry = free.pop()
+            if entry is None:
+                item = self.create_line(*coords, tag='gridline',
+                                        fill=self.grid_color, width=self.linewidth)
+                pool[key] = [item, coords, style]
+                created = True
+                continue
+            item, old, oldstyle = entry
+            if old != coords:
+                self.coords(item, *coords)
+            if oldstyle != style:
+                self.itemconfigure(item, fill=self.grid_color, width=self.linewidth)
+            pool[key] = [item, coords, style]
+        if len(free) > 0:
+            self.delete(*[e[0] for e in free])
+        #text items are reused so keep new lines underneath them
+        if created and len(self._textitems) > 0:
+            self.tag_lower('gridline', 'text')
         return
 
     def drawRowHeader(self):
@@ -3287,7 +3632,8 @@ class Table(Canvas):
                                   width=w,
                                   tag='currentrect')
         #raise text above all
-        self.lift('celltext'+str(col)+'_'+str(row))
+        if (row,col) in self._textitems:
+            self.lift(self._textitems[row,col][0])
         return
 
     def drawRect(self, row, col, color=None, tag=None, delete=1):
@@ -3317,8 +3663,6 @@ class Table(Canvas):
         """Callback for cell entry"""
 
         value = self.cellentryvar.get()
-        if self.filtered == 1:
-            return
         df = None
         result = self.model.setValueAt(value,row,col,df=df)
         dtype = self.model.getColumnType(col)
@@ -3331,6 +3675,7 @@ class Table(Canvas):
         else:
             self.drawText(row, col, value, align=self.align)
             self.delete('entry')
+            self.updateFormulae([self.model.getColumnName(col)])
             self.gotonextCell()
         return
 
@@ -3346,6 +3691,7 @@ class Table(Canvas):
         except:
             self.model.setValueAt(float(value),row,col)
         self.drawText(row, col, value, align=self.align)
+        self.updateFormulae([self.model.getColumnName(col)])
         return
 
     def drawCellEntry(self, row, col, text=None):
@@ -3393,32 +3739,28 @@ class Table(Canvas):
         return 1
 
     def drawText(self, row, col, celltxt, align=None, single_line=True):
-        """Draw the text inside a cell area"""
+        """Draw the text inside a cell area. Text items are pooled per cell
+        and only reconfigured when the text or its position changes."""
 
-        self.delete('celltext'+str(col)+'_'+str(row))
         h = self.rowheight
         x1,y1,x2,y2 = self.getCellCoords(row,col)
         w=x2-x1
-        wrap = False
         pad=5
-        #if type(celltxt) is np.float64:
-        #    celltxt = np.round(celltxt,3)
         celltxt = str(celltxt)
+        key = (row,col)
+        #nothing to do if cell already shows this value
+        entry = self._textitems.get(key)
+        state = (celltxt, x1, y1, w, h, align, self.thefont, self.textcolor)
+        if entry is not None and entry[1] == state:
+            return
 
         if single_line:
             celltxt = celltxt.strip().split('\n', 1)[0]
-
-        length = len(celltxt)
-        if length == 0:
-            return
-
-        if w<=10:
-            return
         if w < 18:
-            celltxt = '.'
+            celltxt = ''
+        if len(celltxt) == 0 and entry is None:
             return
 
-        #fgcolor = self.textcolor
         if align == None:
             align = 'center'
         elif align == 'w':
@@ -3426,17 +3768,59 @@ class Table(Canvas):
         elif align == 'e':
             x1 = x1+w/2-pad
 
-        tw,newlength = util.getTextLength(celltxt, w-pad, font=self.thefont)
-        width=0
-        celltxt = celltxt[0:int(newlength)]
-        y=y1+h/2
-        rect = self.create_text(x1+w/2,y,
-                                  text=celltxt,
-                                  fill=self.textcolor,
-                                  font=self.thefont,
-                                  anchor=align,
-                                  tag=('text','celltext'+str(col)+'_'+str(row)),
-                                  width=width)
+        if len(celltxt) > 0:
+            tw,newlength = util.getTextLength(celltxt, w-pad, font=self.thefont)
+            celltxt = celltxt[0:int(newlength)]
+        self.placeText(key, x1+w/2, y1+h/2, celltxt, align, state)
+        return
+
+    def placeText(self, key, x, y, text, anchor, state=None):
+        """Set a pooled cell text item, creating one only if none is free.
+        Only the options that differ from the item's current ones are sent."""
+
+        opts = {'text':text, 'fill':self.textcolor, 'font':self.thefont,
+                'anchor':anchor}
+        entry = self._textitems.get(key)
+        if entry is None and len(self._freetext) > 0:
+            entry = self._freetext.pop()
+        if entry is None:
+            item = self.create_text(x, y, tag='text', width=0, **opts)
+            self._textitems[key] = [item, state, (x,y), opts]
+            return
+        item, old, pos, current = entry
+        if pos != (x,y):
+            self.coords(item, x, y)
+        changed = {k:opts[k] for k in opts if current.get(k) != opts[k]}
+        if len(changed) > 0:
+            self.itemconfigure(item, **changed)
+        self._textitems[key] = [item, state, (x,y), opts]
+        return
+
+    def recycleTextItems(self, startrow, endrow, startcol, endcol):
+        """Free pooled text items for cells outside the given range so they
+        can be reused by cells coming into view"""
+
+        pool = self._textitems
+        for key in list(pool.keys()):
+            r,c = key
+            if r < startrow or r >= endrow or c < startcol or c >= endcol:
+                self._freetext.append(pool.pop(key))
+        return
+
+    def purgeTextItems(self):
+        """Delete any text items left unused after a redraw"""
+
+        if len(self._freetext) > 0:
+            self.delete(*[e[0] for e in self._freetext])
+            self._freetext = []
+        return
+
+    def clearTextItems(self):
+        """Remove all cell text items"""
+
+        self.delete('text')
+        self._textitems = {}
+        self._freetext = []
         return
 
     def drawSelectedRow(self):
@@ -3484,11 +3868,15 @@ class Table(Canvas):
         """Draw more than one row selection"""
 
         self.delete('multiplesel')
-        #self.delete('rowrect')
         cols = self.visiblecols
-        rows = list(set(rowlist) & set(self.visiblerows))
-        if len(rows)==0:
+        rows = self.visiblerows
+        if len(rows) == 0 or len(cols) == 0:
+            return
+        sr = rows[0]
+        sel = asSelection(rowlist).intersect(sr, sr+len(rows))
+        if len(sel) == 0:
             return
+        clrs = []
         for col in cols:
             colname = self.model.df.columns[col]
             #if col is colored we darken it
@@ -3497,12 +3885,13 @@ class Table(Canvas):
                 clr = util.colorScale(clr, -30)
             else:
                 clr = self.rowselectedcolor
-            for r in rows:
-                x1,y1,x2,y2 = self.getCellCoords(r,col)
-                rect = self.create_rectangle(x1,y1,x2,y2,
-                                          fill=clr,
-                                          outline=self.rowselectedcolor,
-                                          tag=('multiplesel','rowrect'))
+            clrs.append(clr)
+        mask = np.zeros(len(rows), dtype=bool)
+        for start,end in sel:
+            mask[start-sr:end-sr] = True
+        colors = np.where(mask[:,None], np.array(clrs, dtype=object)[None,:], '')
+        self.drawColorLayer(colors, sr, cols, tag=('multiplesel','rowrect'),
+                            outline=self.rowselectedcolor)
         self.lower('multiplesel')
         self.lower('fillrect')
         self.lower('colorrect')
@@ -3599,6 +3988,8 @@ class Table(Canvas):
 
         if model is not None:
             self.model = model
+        if getattr(self.model, 'readonly', False):
+            self.editable = False
         self.rows = self.model.getRowCount()
         self.cols = self.model.getColumnCount()
         self.tablewidth = (self.cellwidth)*self.cols
@@ -3632,6 +4023,8 @@ class Table(Canvas):
                                                       defaultextension='.mpk',
                                                       initialdir=os.getcwd(),
                                                       filetypes=[("pickle","*.pickle"),
+                                                        ("feather","*.feather"),
+                                                        ("arrow","*.arrow"),
                                                         ("All files","*.*")])
         if not os.path.exists(filename):
             print('file does not exist')
@@ -3655,6 +4048,8 @@ class Table(Canvas):
             filename = filedialog.asksaveasfilename(parent=self.master,
                                                      initialdir = self.currentdir,
                                                      filetypes=[("pickle","*.pickle"),
+                                                                ("feather","*.feather"),
+                                                                ("arrow","*.arrow"),
                                                                 ("All files","*.*")])
         if filename:
             self.model.save(filename)
@@ -3668,8 +4063,12 @@ class Table(Canvas):
         self.saveAs(self.filename)
         return
 
-    def importCSV(self, filename=None, dialog=False, **kwargs):
-        """Import from csv file"""
+    def importCSV(self, filename=None, dialog=False, background=False,
+                  compact=False, **kwargs):
+        """Import from csv file. Use background to read the file in a
+        worker thread and show rows as they are read, otherwise the table
+        has all the rows on return. Use compact to convert columns to
+        smaller dtypes."""
 
         if self.importpath == None:
             self.importpath = os.getcwd()
@@ -3685,17 +4084,104 @@ class Table(Canvas):
             return
         if dialog == True:
             impdialog = ImportDialog(self, filename=filename)
-            df = impdialog.df
-            if df is None:
+            kwargs = impdialog.importkwds
+            if kwargs is None:
                 return
-        else:
-            df = pd.read_csv(filename, **kwargs)
+            compact = impdialog.compact
+        if background == True:
+            self.startCSVImport(filename, compact=compact, **kwargs)
+            return
+        df = pd.read_csv(filename, **kwargs)
+        if compact == True:
+            df = util.compactDtypes(df)[0]
         model = TableModel(dataframe=df)
         self.updateModel(model)
         self.redraw()
         self.importpath = os.path.dirname(filename)
         return
 
+    def startCSVImport(self, filename, compact=False, **kwargs):
+        """Read a csv file in a worker thread. The first rows are shown
+        straight away and the rest are added to the table as they are read.
+        Args:
+            filename: csv file
+            compact: convert columns to smaller dtypes
+            kwargs: passed to pandas.read_csv
+        """
+
+        self.cancelImport()
+        self.importer = CSVChunkReader(filename, **kwargs)
+        self.importmodel = None
+        self.importcompact = compact
+        self.importing = True
+        self.importer.start()
+        if hasattr(self, 'statusbar'):
+            self.statusbar.showProgress('reading %s' %os.path.basename(filename),
+                                        self.cancelImport)
+        self.importtimer = self.after(20, self.checkImport)
+        return
+
+    def checkImport(self):
+        """Add chunks read by the import thread to the table"""
+
+        self.importtimer = None
+        reader = self.importer
+        if reader is None:
+            return
+        if self.importmodel is not None and self.importmodel is not self.model:
+            #table was given another model so stop reading
+            reader.cancel()
+            self.endImport()
+            return
+        finished = reader.isFinished()
+        chunks = reader.getChunks()
+        if self.importcompact == True:
+            #categories are only made once all rows are read
+            chunks = [util.compactDtypes(c, catratio=0)[0] for c in chunks]
+        if len(chunks) > 0:
+            if self.importmodel is None:
+                self.importmodel = TableModel(dataframe=pd.concat(chunks))
+                self.updateModel(self.importmodel)
+            else:
+                #any sort or filter of the rows shown is kept
+                self.model.appendRows(chunks)
+            self.redraw()
+        if hasattr(self, 'statusbar'):
+            mb = 1024*1024
+            self.statusbar.setProgress('%.1f of %.1f MB, %s rows'
+                    %(reader.bytesread/mb, reader.filesize/mb, reader.rowsread))
+        if finished:
+            self.importpath = os.path.dirname(reader.filename)
+            if self.importcompact == True and self.importmodel is self.model:
+                self.model.df = util.compactDtypes(self.model.df)[0]
+                self.redraw()
+            self.endImport()
+            if reader.error is not None:
+                messagebox.showwarning("Import error",
+                                       "Could not read file:\n%s" %reader.error,
+                                       parent=self.parentframe)
+            return
+        self.importtimer = self.after(100, self.checkImport)
+        return
+
+    def endImport(self):
+        """Clear the state of a finished or abandoned import"""
+
+        self.importer = None
+        self.importmodel = None
+        self.importing = False
+        if hasattr(self, 'statusbar'):
+            self.statusbar.hideProgress()
+        return
+
+    def cancelImport(self):
+        """Stop a background csv import, rows already read are kept"""
+
+        if self.importer is None:
+            return
+        self.importer.cancel()
+        return
+
     def importHDF(self, filename=None, dialog=False, **kwargs):
 
         if self.importpath == None:
@@ -3768,12 +4254,84 @@ class Table(Canvas):
         self.columncolors = {}
         self.rowcolors = pd.DataFrame()
         self.columnformats['alignment'] = {}
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def setLeftClickSrc(self, src):
         self.__last_left_click_src = src
 
+class RedrawScheduler(object):
+    """Collects redraw requests for a table and renders the dirty parts
+    once when the event loop is next idle. Keeps a count of the redraws
+    that were avoided by merging requests.
+
+    Args:
+        table: the Table to redraw
+    """
+
+    def __init__(self, table):
+
+        self.table = table
+        self.dirty = set()
+        self.pending = None
+        self.renders = 0
+        self.avoided = 0
+        return
+
+    def schedule(self, *regions):
+        """Mark regions dirty, one of 'table', 'colheader', 'rowheader' or
+        'statusbar', and make sure a flush is queued"""
+
+        if self.pending is not None:
+            self.avoided += 1
+        self.dirty.update(regions)
+        if self.pending is None:
+            self.pending = self.table.after_idle(self.flush)
+        return
+
+    def done(self, *regions):
+        """Mark regions as drawn, e.g. after a direct redraw"""
+
+        if self.dirty & set(regions):
+            self.avoided += 1
+        self.dirty.difference_update(regions)
+        return
+
+    def flush(self):
+        """Render whatever is dirty now"""
+
+        if self.pending is not None:
+            self.table.after_cancel(self.pending)
+            self.pending = None
+        dirty = self.dirty
+        if len(dirty) == 0:
+            return
+        self.dirty = set()
+        table = self.table
+        if 'table' in dirty:
+            table.redrawVisible()
+        elif hasattr(table, 'colheader'):
+            if 'colheader' in dirty:
+                table.colheader.redraw(align=table.align)
+            if 'rowheader' in dirty:
+                table.rowheader.redraw()
+        if 'statusbar' in dirty and hasattr(table, 'statusbar'):
+            table.statusbar.update()
+        self.renders += 1
+        return
+
+    def cancel(self):
+        """Drop any pending redraw"""
+
+        if self.pending is not None:
+            try:
+                self.table.after_cancel(self.pending)
+            except:
+                pass
+            self.pending = None
+        self.dirty = set()
+        return
+
 class ToolBar(Frame):
     """Uses the parent instance to provide the functions"""
     def __init__(self, parent=None, parentapp=None):
@@ -3858,7 +4416,7 @@ class statusBar(Frame):
         sfont = ("Helvetica bold", 10)
         clr = '#A10000'
         self.rowsvar = StringVar()
-        self.rowsvar.set(len(df))
+        self.rowsvar.set(self.parentapp.model.getRowCount())
         l=Label(self,textvariable=self.rowsvar,font=sfont,foreground=clr)
         l.pack(fill=X, side=LEFT)
         Label(self,text='rows x',font=sfont,foreground=clr).pack(side=LEFT)
@@ -3883,11 +4441,34 @@ class statusBar(Frame):
         addButton(fr, 'Zoom In', self.parentapp.zoomIn, img, 'zoom in', side=LEFT, padding=1)
         return
 
+    def showProgress(self, text, cancel=None):
+        """Show progress of a background task with a cancel button"""
+
+        self.hideProgress()
+        fr = self.progressframe = Frame(self)
+        fr.pack(side=LEFT, padx=10)
+        self.progressvar = StringVar(value=text)
+        Label(fr, textvariable=self.progressvar).pack(side=LEFT)
+        if cancel is not None:
+            Button(fr, text='Cancel', command=cancel).pack(side=LEFT, padx=2)
+        return
+
+    def setProgress(self, text):
+        if getattr(self, 'progressframe', None) is not None:
+            self.progressvar.set(text)
+        return
+
+    def hideProgress(self):
+        if getattr(self, 'progressframe', None) is not None:
+            self.progressframe.destroy()
+            self.progressframe = None
+        return
+
     def update(self):
         """Update status bar"""
 
         model = self.parentapp.model
-        self.rowsvar.set(len(model.df))
+        self.rowsvar.set(model.getRowCount())
         self.colsvar.set(len(model.df.columns))
         if self.parentapp.filename != None:
             self.filenamevar.set(self.parentapp.filename)
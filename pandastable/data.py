@@ -25,9 +25,23 @@ from types import *
 import operator
 import os, string, types, copy
 import pickle
+import threading, queue
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+#errors from setting a value a column can't hold
+SETVALUE_ERRORS = (TypeError,)
+if pa is not None:
+    SETVALUE_ERRORS = (TypeError, pa.ArrowException)
 from . import util
+from .selection import getIndexer
+from .textindex import TrigramIndex
 
 class TableModel(object):
     """A data model for the Table class that uses pandas
@@ -119,8 +133,159 @@ class TableModel(object):
         """Create meta data fields"""
         self.meta = {}
         #self.columnwidths = {} #used to store col widths
+        self.version = 0
+        #version last written to a project file
+        self.savedversion = None
+        #versions of single columns changed since the last full change
+        self.colversions = {}
+        self.allversion = 0
+        self.strcache = {}
+        self.textindexes = {}
+        #positions of the rows shown when filtered
+        self.rowview = None
+        self.viewindex = None
+        #changes when the shown rows change
+        self.viewversion = 0
         return
 
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        old = getattr(self, '_df', None)
+        self._df = df
+        #positions are only kept if the rows are the same
+        if getattr(self, 'rowview', None) is not None:
+            if old is None or not (df.index is old.index or df.index.equals(old.index)):
+                self.setRowView(None)
+        self.markChanged()
+
+    def setRowView(self, rows):
+        """Show only some rows of the dataframe without copying them.
+        Table rows are then positions in this list of rows.
+        Args:
+            rows: positions of the rows in df, None to show all rows
+        """
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+        self.rowview = rows
+        self.viewindex = None
+        self.viewversion = getattr(self, 'viewversion', 0) + 1
+        return
+
+    def getRowPositions(self, rows):
+        """Positions in df of table rows.
+        Args:
+            rows: row number, list, Selection or slice of table rows
+        """
+
+        if not isinstance(rows, (slice, int, np.integer)):
+            rows = getIndexer(rows)
+        if self.rowview is None:
+            return rows
+        return self.rowview[rows]
+
+    def markChanged(self, cols=None):
+        """Record that the data has changed
+        Args:
+            cols: names of the changed columns, None if any part of the
+                table may have changed
+        """
+
+        self.version = getattr(self, 'version', 0) + 1
+        if cols is None or not hasattr(self, 'colversions'):
+            self.colversions = {}
+            self.allversion = self.version
+            self.strcache = {}
+            self.textindexes = {}
+        else:
+            for c in cols:
+                self.colversions[c] = self.version
+        return
+
+    def getColumnVersions(self):
+        """Versions of all the columns in order, see getColumnVersion"""
+
+        return [(c, self.getColumnVersion(c)) for c in self.df.columns]
+
+    def getColumnVersion(self, col):
+        """Version of the data in a column, this changes whenever
+        the column may have changed"""
+
+        return max(self.colversions.get(col, 0), self.allversion)
+
+    def getStringColumn(self, col):
+        """Values of a column as strings, used for searching. These are
+        kept until the column changes.
+        Args:
+            col: column position
+        """
+
+        name = self.df.columns[col]
+        key = (name, self.getColumnVersion(name))
+        if col in self.strcache and self.strcache[col][0] == key:
+            return self.strcache[col][1]
+        s = self.df.iloc[:, col].astype('object').astype('str')
+        self.strcache[col] = (key, s)
+        return s
+
+    def getTextIndex(self, col, minrows=100000):
+        """Get a trigram index of a text column for substring searches.
+        The index is built in the background when first asked for and
+        again after the column changes.
+        Args:
+            col: column position
+            minrows: only index columns with at least this many rows
+        Returns:
+            the index or None if it isn't ready or the column isn't text
+        """
+
+        s = self.df.iloc[:, col]
+        if minrows <= 0 or len(s) < minrows:
+            return None
+        if not (pd.api.types.is_object_dtype(s.dtype) or
+                pd.api.types.is_string_dtype(s.dtype) or
+                isinstance(s.dtype, pd.CategoricalDtype)):
+            return None
+        name = self.df.columns[col]
+        key = (name, self.getColumnVersion(name))
+        index = self.textindexes.get(col)
+        if index is None or index.key != key:
+            index = self.textindexes[col] = TrigramIndex(s, key)
+            index.start()
+        if index.ready == False:
+            return None
+        return index
+
+    def containsMask(self, col, text, case=True, regex=True, minrows=0):
+        """Find the rows of a column whose string value contains text.
+        A text index is used for columns with at least minrows rows.
+        Args:
+            col: column position
+            text: text to find
+            case: case sensitive search
+            regex: text is a regular expression
+            minrows: see getTextIndex, 0 to never use an index
+        Returns:
+            boolean numpy array
+        """
+
+        index = self.getTextIndex(col, minrows)
+        if index is not None:
+            mask = index.lookup(text, case, regex)
+            if mask is not None:
+                return mask
+        vals = self.getStringColumn(col)
+        return vals.str.contains(text, na=False, case=case, regex=regex).to_numpy(bool)
+
+    def isChanged(self):
+        """True if the data has changed since it was last saved"""
+
+        return self.savedversion != self.version
+
     def save(self, filename):
         """Save dataframe"""
 
@@ -131,6 +296,8 @@ class TableModel(object):
             self.df.to_excel(filename)
         elif ftype == '.csv':
             self.df.to_csv(filename)
+        elif ftype in ['.feather', '.arrow']:
+            self.saveArrow(filename)
         #elif ftype == '.html':
         #    self.df.to_html(filename)
         return
@@ -140,22 +307,53 @@ class TableModel(object):
 
         if filetype == '.mpk':
             self.df = pd.read_msgpack(filename)
+        elif filetype in ['.feather', '.arrow']:
+            self.df = self.loadArrow(filename)
         else:
             self.df = pd.read_pickle(filename)
             #print (len(self.df))
         return
 
+    @staticmethod
+    def loadArrow(filename):
+        """Open a Feather or Arrow IPC file using a memory map. Columns
+        use arrow backed types so uncompressed data is not copied and is
+        read from the file as needed."""
+
+        if pa is None:
+            raise ImportError('pyarrow is needed to read %s' %filename)
+        source = pa.memory_map(filename, 'r')
+        try:
+            table = pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            #older feather format
+            import pyarrow.feather as feather
+            table = feather.read_table(filename, memory_map=True)
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def saveArrow(self, filename):
+        """Save as an uncompressed Arrow IPC file so that it can be
+        memory mapped when opened"""
+
+        if pa is None:
+            raise ImportError('pyarrow is needed to write %s' %filename)
+        import pyarrow.feather as feather
+        table = pa.Table.from_pandas(self.df)
+        feather.write_feather(table, filename, compression='uncompressed')
+        return
+
     def getlongestEntry(self, colindex, n=500):
         """Get the longest string in the column for determining width. Just uses the first
          n rows for speed"""
 
         df = self.df
         col = df.columns[colindex]
+        rows = self.getRowPositions(slice(0, n))
         try:
             if df.dtypes[col] in ['float32','float64']:
-                c = df[col][:n].round(3)
+                c = df[col].iloc[rows].round(3)
             else:
-                c = df[col][:n]
+                c = df[col].iloc[rows]
         except:
             return 1
         longest = c.astype('object').astype('str').str.len().max()
@@ -166,7 +364,7 @@ class TableModel(object):
     def getRecordAtRow(self, rowindex):
         """Get the entire record at the specifed row"""
 
-        record = self.df.iloc[rowindex]
+        record = self.df.iloc[self.getRowPositions(rowindex)]
         return record
 
     def moveColumn(self, oldindex, newindex):
@@ -218,11 +416,18 @@ class TableModel(object):
         """Delete multiple or all rows"""
 
         df = self.df
+        view = self.rowview
+        keep = np.ones(len(df), dtype=bool)
+        keep[self.getRowPositions(rowlist)] = False
         if unique == True:
-            rows = list(set(range(len(df))) - set(rowlist))
-            self.df = df.iloc[rows]
+            self.df = df[keep]
         else:
-            df.drop(df.index[rowlist],inplace=True)
+            df.drop(df.index[~keep],inplace=True)
+            self.markChanged()
+        if view is not None:
+            #rows left in the view have new positions
+            newpos = np.cumsum(keep) - 1
+            self.setRowView(newpos[view[keep[view]]])
         return
 
     def addColumn(self, colname=None, dtype=None, data=None):
@@ -231,6 +436,7 @@ class TableModel(object):
         if data is None:
             data = pd.Series(dtype=dtype)
         self.df[colname] = data
+        self.markChanged([colname])
         return
 
     def deleteColumn(self, colindex):
@@ -239,6 +445,7 @@ class TableModel(object):
         df = self.df
         colname = df.columns[colindex]
         df.drop([colname], axis=1, inplace=True)
+        self.markChanged()
         return
 
     def deleteColumns(self, cols=None):
@@ -247,10 +454,12 @@ class TableModel(object):
         df = self.df
         colnames = df.columns[cols]
         df.drop(colnames, axis=1, inplace=True)
+        self.markChanged()
         return
 
     def deleteCells(self, rows, cols):
-        self.df.iloc[rows,cols] = np.nan
+        self.df.iloc[self.getRowPositions(rows),cols] = np.nan
+        self.markChanged([self.df.columns[c] for c in cols])
         return
 
     def resetIndex(self, drop=False):
@@ -258,6 +467,7 @@ class TableModel(object):
 
         df = self.df
         df.reset_index(drop=drop,inplace=True)
+        self.markChanged()
         return
 
     def setindex(self, colindex):
@@ -269,6 +479,7 @@ class TableModel(object):
         if indnames[0] != None:
             df.reset_index(inplace=True)
         df.set_index(colnames, inplace=True)
+        self.markChanged()
         return
 
     def copyIndex(self):
@@ -278,6 +489,38 @@ class TableModel(object):
         name = df.index.name
         if name == None: name='index'
         df[name] = df.index#.astype('object')
+        self.markChanged([name])
+        return
+
+    def sortRows(self, colindex=None, ascending=1, index=False):
+        """Sort the rows in place
+        Args:
+            colindex: positions of the columns to sort by
+            ascending: sort order, can be a list with one per column
+            index: sort by the index instead of columns
+        """
+
+        df = self.df
+        if index == True:
+            df.sort_index(inplace=True)
+        else:
+            colnames = list(df.columns[colindex])
+            df.sort_values(by=colnames, inplace=True, ascending=ascending)
+        #all cached values are now in the wrong rows
+        self.markChanged()
+        return
+
+    def appendRows(self, frames):
+        """Add rows to the end of the table with a single copy. Rows
+        already present keep their positions so any row view is kept.
+        Args:
+            frames: list of dataframes with the same columns
+        """
+
+        if len(frames) == 0:
+            return
+        self._df = pd.concat([self._df] + list(frames))
+        self.markChanged()
         return
 
     def groupby(self, cols):
@@ -307,14 +550,30 @@ class TableModel(object):
 
     def getRowCount(self):
          """Returns the number of rows in the table model."""
+         if self.rowview is not None:
+             return len(self.rowview)
          return len(self.df)
 
+    def getIndex(self):
+        """Returns the row index"""
+        if self.rowview is None:
+            return self.df.index
+        #the index of the shown rows is kept until df.index changes
+        if self.viewindex is None or self.viewindex[0] is not self.df.index:
+            self.viewindex = (self.df.index, self.df.index[self.rowview])
+        return self.viewindex[1]
+
+    def getDataBlock(self, start, end, col):
+        """Get the values for rows start to end-1 of a column, used when
+        drawing the table"""
+        return self.df.iloc[self.getRowPositions(slice(start, end)), col]
+
     def getValueAt(self, row, col):
          """Returns the cell value at location specified
              by columnIndex and rowIndex."""
 
          df = self.df
-         value = self.df.iloc[row,col]
+         value = self.df.iloc[self.getRowPositions(row),col]
          if type(value) is float and np.isnan(value):
              return ''
          return value
@@ -325,30 +584,77 @@ class TableModel(object):
 
         if df is None:
             df = self.df
-        rowindex = df.iloc[row].name
-        colindex = df.columns[col]
-        #print (df.loc[rowindex,colindex])
+            #edits of a filtered table change the full frame
+            row = self.getRowPositions(row)
         if value == '':
             value = np.nan
 
         dtype = self.getColumnType(col)
-        #try to cast to column type
+        #try to cast to column type, these checks include arrow types
         try:
-            if dtype in ['float32','float64']:
+            if value is np.nan:
+                pass
+            elif pd.api.types.is_float_dtype(dtype):
                 value = float(value)
-            elif dtype == 'int':
-                value = int(value)
-            elif dtype == 'datetime64[ns]':
+            elif pd.api.types.is_integer_dtype(dtype):
+                if isinstance(value, str):
+                    try:
+                        value = int(value)
+                    except ValueError:
+                        value = float(value)
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
                 value = pd.to_datetime(value)
         except Exception as e:
             print (e)
             return False
+        npdtype = getattr(dtype, 'numpy_dtype', dtype)
+        if npdtype == np.float32 and not np.isnan(value):
+            with np.errstate(over='ignore'):
+                if float(np.float32(value)) != value:
+                    #keep the precision of values added to compacted columns
+                    self.widenColumn(df, col, value)
+        elif pd.api.types.is_integer_dtype(dtype) and value is not np.nan:
+            if isinstance(value, float) or not -2**63 <= value < 2**63:
+                #some integer types would truncate the value
+                self.widenColumn(df, col, value)
+        try:
+            self._setValue(df, row, col, value)
+        except SETVALUE_ERRORS:
+            #the column type can't hold the value, e.g. a compacted column
+            self.widenColumn(df, col, value)
+            self._setValue(df, row, col, value)
+        if df is self.df:
+            self.markChanged([df.columns[col]])
+        return True
+
+    def _setValue(self, df, row, col, value):
+
         if df.index.is_unique is True:
-            df.loc[rowindex,colindex] = value
+            df.loc[df.index[row],df.columns[col]] = value
         else:
             #we cannot use index if not unique
             df.iloc[row,col] = value
-        return True
+        return
+
+    def widenColumn(self, df, col, value):
+        """Change a column to a type that can also hold value"""
+
+        s = df.iloc[:, col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.cat.add_categories([value])
+        elif isinstance(value, (int, np.integer)) and s.dtype.kind in 'iu':
+            if -2**63 <= value < 2**63:
+                s = s.astype('int64')
+            else:
+                s = s.astype('object')
+        elif isinstance(value, (float, int, np.number)) and s.dtype.kind in 'iuf':
+            s = s.astype('float64')
+        else:
+            s = s.astype('object')
+        df.isetitem(col, s)
+        return
 
     def transpose(self):
         """Transpose dataframe"""
@@ -383,3 +689,238 @@ class TableModel(object):
 
     def __repr__(self):
         return 'Table Model with %s rows' %len(self.df)
+
+
+class PagedTableModel(TableModel):
+    """A read only table model for Parquet, Feather or Arrow IPC files too
+    large to load. Only the row groups or record batches needed for the
+    rows in view are read and these are kept in a cache of limited size.
+    The df attribute is an empty frame with the file columns and types.
+    Requires pyarrow.
+
+    Args:
+        filename: .parquet, .feather or .arrow file
+        maxmemory: cache size in MB
+    """
+
+    readonly = True
+
+    def __init__(self, filename, maxmemory=500):
+
+        if pa is None:
+            raise ImportError('pyarrow is needed to read %s' %filename)
+        self.initialiseFields()
+        self.filename = filename
+        self.maxmemory = maxmemory
+        self.pages = OrderedDict()
+        self.cachesize = 0
+        self.openFile(filename)
+        return
+
+    def openFile(self, filename):
+        """Read the file schema and the row counts of each chunk"""
+
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in ['.parquet', '.pq']:
+            self.reader = pq.ParquetFile(filename)
+            meta = self.reader.metadata
+            counts = [meta.row_group(i).num_rows for i in range(meta.num_row_groups)]
+            schema = self.reader.schema_arrow
+            self.kind = 'parquet'
+        else:
+            #feather v2 files are arrow ipc files
+            source = pa.memory_map(filename, 'r')
+            self.reader = pa.ipc.open_file(source)
+            counts = [self.reader.get_batch(i).num_rows
+                      for i in range(self.reader.num_record_batches)]
+            schema = self.reader.schema
+            self.kind = 'ipc'
+        self.offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        self.names = schema.names
+        self.df = schema.empty_table().to_pandas()
+        if len(self.df.columns) != len(self.names):
+            #index columns stored by pandas are shown as ordinary columns
+            self.df = schema.empty_table().to_pandas(ignore_metadata=True)
+        return
+
+    def getRowCount(self):
+        return int(self.offsets[-1])
+
+    def getIndex(self):
+        return pd.RangeIndex(self.getRowCount())
+
+    def readChunk(self, chunk, col):
+        """Read one column of a row group or record batch"""
+
+        if self.kind == 'parquet':
+            t = self.reader.read_row_group(chunk, columns=[self.names[col]])
+            arr = t.column(0)
+        else:
+            arr = self.reader.get_batch(chunk).column(col)
+        s = arr.to_pandas()
+        s.index = pd.RangeIndex(self.offsets[chunk], self.offsets[chunk+1])
+        s.name = self.df.columns[col]
+        return s
+
+    def getChunk(self, chunk, col):
+        """Get a column chunk from the cache or the file"""
+
+        key = (chunk, col)
+        if key in self.pages:
+            self.pages.move_to_end(key)
+            return self.pages[key]
+        s = self.readChunk(chunk, col)
+        self.pages[key] = s
+        self.cachesize += s.memory_usage(index=False, deep=True)
+        limit = self.maxmemory * 1024**2
+        while self.cachesize > limit and len(self.pages) > 1:
+            k, old = self.pages.popitem(last=False)
+            self.cachesize -= old.memory_usage(index=False, deep=True)
+        return s
+
+    def getDataBlock(self, start, end, col):
+        """Get the values for rows start to end-1 of a column, reading
+        only the chunks that hold them"""
+
+        end = min(end, self.getRowCount())
+        if end <= start:
+            return self.df.iloc[:, col]
+        first = np.searchsorted(self.offsets, start, side='right') - 1
+        last = np.searchsorted(self.offsets, end, side='left')
+        parts = []
+        for c in range(first, last):
+            s = self.getChunk(c, col)
+            offset = self.offsets[c]
+            parts.append(s.iloc[max(start-offset, 0):end-offset])
+        if len(parts) == 1:
+            return parts[0]
+        return pd.concat(parts)
+
+    def getValueAt(self, row, col):
+
+        value = self.getDataBlock(row, row+1, col).iloc[0]
+        if type(value) is float and np.isnan(value):
+            return ''
+        return value
+
+    def setValueAt(self, value, row, col, df=None):
+
+        print ('table is read only')
+        return False
+
+    def getlongestEntry(self, colindex, n=500):
+
+        c = self.getDataBlock(0, n, colindex)
+        if c.dtype in ['float32','float64']:
+            c = c.round(3)
+        longest = c.astype('object').astype('str').str.len().max()
+        if pd.isnull(longest):
+            return 1
+        return longest
+
+    def getDataFrame(self, start=0, end=None):
+        """Load a range of rows, or the whole file, into a dataframe"""
+
+        if end is None:
+            end = self.getRowCount()
+        cols = [self.getDataBlock(start, end, i) for i in range(len(self.names))]
+        if len(cols) == 0:
+            return self.df
+        df = pd.concat(cols, axis=1)
+        df.columns = self.df.columns
+        return df
+
+    def clearCache(self):
+
+        self.pages.clear()
+        self.cachesize = 0
+        return
+
+    def __repr__(self):
+        return 'Paged Table Model with %s rows from %s' %(self.getRowCount(), self.filename)
+
+class CSVChunkReader(object):
+    """Reads a csv file in chunks in a worker thread so that large files
+    can be shown while they load. Chunks are put in a queue that the
+    table takes from. The first chunk is kept small so rows appear
+    quickly.
+
+    Args:
+        filename: csv file name
+        chunksize: rows per chunk after the first one
+        firstchunk: rows in the first chunk
+        kwargs: passed to pandas.read_csv
+    """
+
+    def __init__(self, filename, chunksize=200000, firstchunk=1000, **kwargs):
+
+        self.filename = filename
+        self.chunksize = chunksize
+        self.firstchunk = firstchunk
+        self.kwargs = kwargs
+        self.filesize = os.path.getsize(filename)
+        self.bytesread = 0
+        self.rowsread = 0
+        self.chunks = queue.Queue()
+        self.error = None
+        self.done = False
+        self.stopped = threading.Event()
+        self.thread = None
+        return
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return
+
+    def run(self):
+        """Read the file, called in the worker thread"""
+
+        try:
+            with open(self.filename, 'rb') as f:
+                reader = pd.read_csv(f, chunksize=self.chunksize, **self.kwargs)
+                size = self.firstchunk
+                while not self.stopped.is_set():
+                    try:
+                        df = reader.get_chunk(size)
+                    except StopIteration:
+                        break
+                    size = self.chunksize
+                    self.rowsread += len(df)
+                    self.bytesread = f.tell()
+                    self.chunks.put(df)
+                reader.close()
+        except Exception as e:
+            self.error = e
+        self.bytesread = self.filesize
+        self.done = True
+        return
+
+    def getChunks(self):
+        """Get the chunks read since the last call"""
+
+        chunks = []
+        while True:
+            try:
+                chunks.append(self.chunks.get_nowait())
+            except queue.Empty:
+                break
+        return chunks
+
+    def cancel(self):
+        """Stop reading after the current chunk"""
+
+        self.stopped.set()
+        return
+
+    def isFinished(self):
+        """True once the thread has stopped and all chunks are taken"""
+
+        return self.done and self.chunks.empty()
+
+    def getProgress(self):
+        """Fraction of the file read"""
+
+        if self.filesize == 0:
+            return 1.0
+        return min(self.bytesread / self.filesize, 1.0)
@@ -20,7 +20,7 @@
 """
 
 from __future__ import absolute_import, division, print_function
-import sys,os,types
+import sys,os,types,io
 import platform
 from datetime import datetime
 try:
@@ -45,6 +45,7 @@ import webbrowser
 import numpy as np
 import pandas as pd
 from .data import TableModel
+from .selection import Selection
 from . import util, images
 
 def setGeometry(win, width=None):
@@ -476,6 +477,8 @@ class ImportDialog(Frame):
         self.parent = parent
         self.filename = filename
         self.df = None
+        self.importkwds = None
+        self.compact = False
         self.main = Toplevel()
         self.master = self.main
         self.main.title('Text Import')
@@ -493,7 +496,7 @@ class ImportDialog(Frame):
                 'data':['header','skiprows','skipinitialspace',
                         'skip_blank_lines','numbers_as_string',
                         'parse_dates','time format','encoding','names'],
-                'other':['rowsperfile']}
+                'other':['rowsperfile','compact dtypes']}
         grps = OrderedDict(sorted(grps.items()))
         opts = self.opts = {'delimiter':{'type':'combobox','default':',',
                         'items':delimiters, 'tooltip':'seperator'},
@@ -525,7 +528,18 @@ class ImportDialog(Frame):
                                 'tooltip':'rows to read'},
                      'names':{'type':'entry','default':'','label':'column names',
                                 'tooltip':'col labels'},
+                     'compact dtypes':{'type':'checkbutton','default':0,'label':'compact dtypes',
+                                'tooltip':'convert columns to smaller types to save memory'},
                      }
+        #only the start of the file is used for previews
+        self.head, self.complete = util.readFileHead(filename)
+        sniffed = util.sniffText(self.head)
+        if sniffed['delimiter'] == '\t':
+            sniffed['delimiter'] = r'\t'
+        if sniffed['encoding'] not in encodings:
+            encodings.append(sniffed['encoding'])
+        opts['delimiter']['default'] = sniffed['delimiter']
+        opts['encoding']['default'] = sniffed['encoding']
         bf = Frame(self.main)
         bf.pack(side=LEFT,fill=BOTH)
         optsframe, self.tkvars, w = dialogFromOptions(bf, opts, grps,
@@ -552,13 +566,16 @@ class ImportDialog(Frame):
         return
 
     def showText(self, encoding='utf-8'):
-        """Show text contents"""
+        """Show text contents from the start of the file"""
 
-        with open(self.filename, 'r', encoding=encoding) as stream:
-            try:
-                text = stream.read()
-            except:
-                text = 'failed to preview this file, change the file encoding and then press update preview'
+        try:
+            text = self.head.decode(encoding)
+        except:
+            text = 'failed to preview this file, change the file encoding and then press update preview'
+        else:
+            if not self.complete:
+                size = os.path.getsize(self.filename)
+                text += '\n[showing the first %s KB of %.1f MB]' %(len(self.head)//1024, size/1048576)
         self.textpreview.delete('1.0', END)
         self.textpreview.insert('1.0', text)
         return
@@ -567,7 +584,7 @@ class ImportDialog(Frame):
         """Reload previews"""
 
         kwds = {}
-        other = ['rowsperfile','time format','numbers_as_string']
+        other = ['rowsperfile','time format','numbers_as_string','compact dtypes']
         for i in self.opts:
             if i in other:
                 continue
@@ -590,28 +607,17 @@ class ImportDialog(Frame):
         timeformat = self.tkvars['time format'].get()
         dateparse = lambda x: datetime.strptime(x, timeformat)
         self.showText(encoding=kwds['encoding'])
-        if as_string == True:
-            temp = pd.read_csv(self.filename, chunksize=50, **kwds).get_chunk()
-            cols = temp.columns
-            self.converters = {col: str for col in cols}
-        else:
-            self.converters = None
+        self.converters = None
         try:
-            f = self.textfilereader = pd.read_csv(self.filename,
-                        chunksize=500, on_bad_lines='skip',
-                        date_format=dateparse,
+            if as_string == True:
+                cols = pd.read_csv(io.BytesIO(self.head), nrows=0, **kwds).columns
+                self.converters = {col: str for col in cols}
+            df = pd.read_csv(io.BytesIO(self.head), nrows=500,
+                        on_bad_lines='skip', date_format=dateparse,
                         converters=self.converters, **kwds)
         except Exception as e:
             print ('read csv error')
             print (e)
-            f = None
-        if f is not None:
-            try:
-                df = f.get_chunk()
-            except:
-                print ('parser error')
-                df = pd.DataFrame()
-        else:
             df = pd.DataFrame()
         model = TableModel(dataframe=df)
         self.previewtable.updateModel(model)
@@ -620,10 +626,12 @@ class ImportDialog(Frame):
         return
 
     def doImport(self):
-        """Do the import"""
+        """Set the read_csv arguments for the import. The file itself is
+        read by the table in the background."""
 
         self.update()
-        self.df = pd.read_csv(self.filename, converters=self.converters, **self.kwds)
+        self.importkwds = dict(self.kwds, converters=self.converters)
+        self.compact = bool(self.tkvars['compact dtypes'].get())
         self.quit()
         return
 
@@ -892,6 +900,78 @@ class CrosstabDialog(BaseDialog):
         webbrowser.open(link,autoraise=1)
         return
 
+class MemoryDialog(BaseDialog):
+    """Shows the memory used by each column and the saving from
+    converting columns to smaller dtypes"""
+
+    def __init__(self, parent=None, df=None, title=''):
+
+        BaseDialog.__init__(self, parent, df, title)
+        self.main.resizable(width=True, height=True)
+        m = Frame(self.main)
+        m.pack(side=TOP,fill=BOTH,expand=1)
+        self.createWidgets(m)
+        self.profile()
+        return
+
+    def createWidgets(self, m):
+        """Options and a table of the columns"""
+
+        from .core import Table
+        f = Frame(m)
+        f.pack(side=TOP,fill=X,padx=2)
+        Label(f,text='category if unique fraction below').pack(side=LEFT,padx=2)
+        self.catvar = DoubleVar(value=0.5)
+        Entry(f,textvariable=self.catvar,width=5).pack(side=LEFT,padx=2)
+        self.arrowvar = BooleanVar(value=False)
+        Checkbutton(f,text='arrow strings',variable=self.arrowvar,
+                    command=self.profile).pack(side=LEFT,padx=2)
+        Button(f,text='Update',command=self.profile).pack(side=LEFT,padx=2)
+        tf = Frame(m)
+        tf.pack(side=TOP,fill=BOTH,expand=1)
+        self.table = Table(tf,rows=0,columns=0,editable=False,enable_menus=False)
+        self.table.show()
+        self.totalvar = StringVar()
+        Label(m,textvariable=self.totalvar).pack(side=TOP,pady=2)
+        self.buttonsFrame()
+        return
+
+    def profile(self):
+        """Find smaller dtypes for each column"""
+
+        try:
+            catratio = self.catvar.get()
+        except:
+            catratio = 0.5
+        self.df = self.parent.model.df
+        new, report = util.compactDtypes(self.df, catratio, self.arrowvar.get())
+        self.report = report
+        kb = report[['memory','new memory']]/1024
+        show = pd.concat([report[['dtype','new dtype']], kb.round(1)], axis=1)
+        show.columns = ['dtype','new dtype','KB','new KB']
+        self.table.updateModel(TableModel(show))
+        self.table.showIndex()
+        self.table.redraw()
+        before = report.memory.sum()/1048576
+        after = report['new memory'].sum()/1048576
+        self.totalvar.set('%.1f MB -> %.1f MB' %(before, after))
+        return
+
+    def apply(self):
+        """Convert the columns of the parent table"""
+
+        if self.parent.model.df is not self.df:
+            #table changed since the profile was made
+            self.profile()
+        self.parent.compactColumns(self.catvar.get(), self.arrowvar.get())
+        self.quit()
+        return
+
+    def help(self):
+        link='https://pandas.pydata.org/docs/user_guide/scale.html'
+        webbrowser.open(link,autoraise=1)
+        return
+
 class AggregateDialog(BaseDialog):
     """Provides a frame for split-apply-combine operations"""
 
@@ -1188,8 +1268,14 @@ class FindReplaceDialog(Frame):
         Frame.__init__(self, parent)
         self.parent = parent
         self.table = table
-        self.coords = []
-        self.current = 0 #coords of found cells
+        #rows and columns of found cells
+        self.foundrows = np.array([], dtype=int)
+        self.foundcols = np.array([], dtype=int)
+        self.current = 0
+        #masks for each column are kept until the column changes
+        self.masks = {}
+        self.version = None
+        self.search_changed = True
         self.setup()
         return
 
@@ -1219,6 +1305,9 @@ class FindReplaceDialog(Frame):
         self.casevar = BooleanVar()
         cb=Checkbutton(f, text= 'case sensitive', variable=self.casevar, command=self.updated)
         cb.pack(side=LEFT)
+        self.selectedvar = BooleanVar()
+        cb=Checkbutton(f, text= 'selected columns', variable=self.selectedvar, command=self.updated)
+        cb.pack(side=LEFT)
         return
 
     def updated(self, name='', index='', mode=''):
@@ -1226,34 +1315,56 @@ class FindReplaceDialog(Frame):
         self.search_changed=True
         return
 
+    def getMask(self, col, text, case):
+        """Get the cells of a column containing the search text"""
+
+        model = self.table.model
+        key = (model.df.columns[col], model.getColumnVersion(model.df.columns[col]),
+               len(model.df), text, case)
+        if col in self.masks and self.masks[col][0] == key:
+            return self.masks[col][1]
+        mask = model.containsMask(col, text, case,
+                                  minrows=int(self.table.textindexrows))
+        self.masks[col] = (key, mask)
+        return mask
+
     def find(self, event=None):
-        """Do string search. Creates a masked dataframe for results and then stores each cell
-        coordinate in a list."""
+        """Do string search. Stores the rows found in each column for
+        highlighting and the row and column of each found cell."""
 
         table = self.table
         df = table.model.df
-        df = df.astype('object').astype('str')
         s = self.searchvar.get()
         case = self.casevar.get()
         self.search_changed = False
         self.clear()
         if s == '':
             return
-        found = pd.DataFrame()
-        for col in df:
-            found[col] = df[col].str.contains(s, na=False, case=case)
-        #set the masked dataframe so that highlighted cells are shown on redraw
+        if self.selectedvar.get() == True:
+            cols = sorted(c for c in table.multiplecollist if c < len(df.columns))
+        else:
+            cols = list(range(len(df.columns)))
+        rowview = table.model.rowview
+        found = {}
+        for c in cols:
+            mask = self.getMask(c, s, case)
+            if rowview is not None:
+                #only rows shown in a filtered table
+                mask = mask[rowview]
+            rows = np.flatnonzero(mask)
+            if len(rows) > 0:
+                found[c] = rows
+        #set the found rows so that highlighted cells are shown on redraw
         table.highlighted = found
-        i=0
-        self.coords = []
-        for r,row in found.iterrows():
-            j=0
-            for col,val in row.items():
-                if val is True:
-                    #print (r,col,val, i, j)
-                    self.coords.append((i,j))
-                j+=1
-            i+=1
+        rows = [found[c] for c in found]
+        cols = [np.full(len(found[c]), c) for c in found]
+        if len(rows) > 0:
+            rows = np.concatenate(rows)
+            cols = np.concatenate(cols)
+            #go through the cells a row at a time
+            order = np.lexsort((cols, rows))
+            self.foundrows, self.foundcols = rows[order], cols[order]
+        self.version = (table.model.version, table.model.viewversion)
         self.current = 0
         return
 
@@ -1271,18 +1382,23 @@ class FindReplaceDialog(Frame):
         """Show next cell of search results"""
 
         table = self.table
-        s = self.searchvar.get()
-        if len(self.coords)==0  or self.search_changed == True:
+        if self.search_changed == True:
             self.find()
-        if len(self.coords)==0:
+        elif self.version != (table.model.version, table.model.viewversion):
+            #data or shown rows changed so search again but keep going from the same place
+            current = self.current
+            self.find()
+            if current < len(self.foundrows):
+                self.current = current
+        if len(self.foundrows)==0:
             return
-        idx = self.current
-        i,j = self.coords[idx]
+        i = int(self.foundrows[self.current])
+        j = int(self.foundcols[self.current])
         table.movetoSelection(row=i,col=j,offset=3)
         table.redraw()
         table.drawSelectedRect(i, j, color='red')
         self.current+=1
-        if self.current>=len(self.coords):
+        if self.current>=len(self.foundrows):
             self.current=0
         return
 
@@ -1303,7 +1419,8 @@ class FindReplaceDialog(Frame):
         return
 
     def clear(self):
-        self.coords = []
+        self.foundrows = np.array([], dtype=int)
+        self.foundcols = np.array([], dtype=int)
         self.table.delete('temprect')
         self.table.highlighted = None
         self.table.redraw()
@@ -1315,6 +1432,15 @@ class FindReplaceDialog(Frame):
         self.destroy()
         return
 
+def toMask(m):
+    """Boolean numpy array from a mask that may have missing values"""
+
+    if isinstance(m, pd.Series):
+        if m.dtype != bool:
+            m = m.fillna(False)
+        m = m.to_numpy()
+    return np.asarray(m, dtype=bool)
+
 class QueryDialog(Frame):
     """Use string query to filter. Will not work with spaces in column
         names, so these would need to be converted first."""
@@ -1326,6 +1452,10 @@ class QueryDialog(Frame):
         self.table = table
         self.setup()
         self.filters = []
+        #masks of recent filters, see applyFilter
+        self.masks = OrderedDict()
+        #rows found by the last query
+        self.filtmask = None
         return
 
     def setup(self):
@@ -1367,40 +1497,46 @@ class QueryDialog(Frame):
 
         table = self.table
         s = self.queryvar.get()
-        if table.filtered == True:
-            table.model.df = table.dataframe
         df = table.model.df
         mask = None
+        self.checkCache()
 
         #string query first
         if s!='':
-            try:
-                mask = df.eval(s)
-            except:
-                mask = df.eval(s, engine='python')
+            key = ('query', s, table.model.version)
+            mask = self.getCachedMask(key)
+            if mask is None:
+                try:
+                    mask = df.eval(s)
+                except:
+                    mask = df.eval(s, engine='python')
+                mask = toMask(mask)
+                self.setCachedMask(key, [mask, None])
+            else:
+                mask = mask[0]
         #add any filters from widgets
         if len(self.filters)>0:
             mask = self.applyFilter(df, mask)
         if mask is None:
+            self.filtmask = None
             table.showAll()
             self.queryresultvar.set('')
             return
-        #apply the final mask
-        self.filtdf = filtdf = df[mask]
-        self.queryresultvar.set('%s rows found' %len(filtdf))
+        #the table shows the found rows without copying them
+        self.filtmask = mask = toMask(mask)
+        self.filtversion = table.model.version
+        rows = np.flatnonzero(mask)
+        self.queryresultvar.set('%s rows found' %len(rows))
 
         if self.applyqueryvar.get() == 1:
-            #replace current dataframe but keep a copy!
-            table.dataframe = table.model.df.copy()
             table.delete('rowrect')
-            table.multiplerowlist = []
-            table.model.df = filtdf
-            table.filtered = True
+            table.multiplerowlist = Selection()
+            table.model.setRowView(rows)
         else:
-            idx = filtdf.index
-            rows = table.multiplerowlist = table.getRowsFromIndex(idx)
+            table.model.setRowView(None)
+            table.multiplerowlist = Selection.fromMask(mask)
             if len(rows)>0:
-                table.currentrow = rows[0]
+                table.currentrow = int(rows[0])
 
         table.redraw()
         return
@@ -1430,10 +1566,17 @@ class QueryDialog(Frame):
         return
 
     def applyFilter(self, df, mask=None):
-        """Apply the widget based filters, returns a boolean mask"""
+        """Apply the widget based filters, returns a boolean mask. The mask
+        of each filter is cached until its column changes. An AND filter is
+        only evaluated for rows that passed the filters before it and an OR
+        filter for rows that did not, so changing one filter mostly reuses
+        cached masks."""
 
+        model = self.table.model
         if mask is None:
-            mask = df.index==df.index
+            mask = np.ones(len(df), dtype=bool)
+        else:
+            mask = toMask(mask)
 
         for f in self.filters:
             col, val, op, b = f.getFilter()
@@ -1444,33 +1587,19 @@ class QueryDialog(Frame):
             if col not in df.columns:
                 print (f'column {col} is not in the table')
                 continue
-            if op == 'contains':
-                m = df[col].str.contains(str(val))
-            elif op == 'equals':
-                m = df[col]==val
-            elif op == 'not equals':
-                m = df[col]!=val
-            elif op == '>':
-                m = df[col]>val
-            elif op == '<':
-                m = df[col]<val
-            elif op == 'is empty':
-                m = df[col].isnull()
-            elif op == 'not empty':
-                m = ~df[col].isnull()
-            elif op == 'excludes':
-                m = -df[col].str.contains(val)
-            elif op == 'starts with':
-                m = df[col].str.startswith(val)
-            elif op == 'has length':
-                m = df[col].str.len()>val
-            elif op == 'is number':
-                m = df[col].astype('object').str.isnumeric()
-            elif op == 'is lowercase':
-                m = df[col].astype('object').str.islower()
-            elif op == 'is uppercase':
-                m = df[col].astype('object').str.isupper()
+            if df is model.df:
+                version = model.getColumnVersion(col)
+            else:
+                version = id(df)
+            key = (col, version, op, val)
+            if b == 'AND':
+                need = mask
+            elif b == 'OR':
+                need = ~mask
             else:
+                need = None
+            m = self.getFilterMask(df, key, need)
+            if m is None:
                 continue
             if b == 'AND':
                 mask = mask & m
@@ -1480,17 +1609,159 @@ class QueryDialog(Frame):
                 mask = mask ^ m
         return mask
 
+    def getFilterMask(self, df, key, need=None):
+        """Get the mask of a filter for the needed rows, evaluating it only
+        for rows not already done. Rows that aren't needed are False.
+        Args:
+            df: dataframe
+            key: tuple of column, column version, operator and value
+            need: boolean array of rows needed, None for all rows
+        """
+
+        entry = self.getCachedMask(key)
+        if entry is None:
+            entry = [np.zeros(len(df), dtype=bool), np.zeros(len(df), dtype=bool)]
+        m, done = entry
+        if done is not None:
+            #rows needed but not yet evaluated
+            if need is None:
+                missing = ~done
+            else:
+                missing = need & ~done
+            if missing.any():
+                col, version, op, val = key
+                if missing.all():
+                    rows = None
+                else:
+                    rows = np.flatnonzero(missing)
+                sub = self.evalFilter(df, col, op, val, rows)
+                if sub is None:
+                    return None
+                m = m.copy()
+                if rows is None:
+                    m = sub
+                else:
+                    m[rows] = sub
+                done = done | missing
+                if done.all():
+                    done = None
+                entry = [m, done]
+        self.setCachedMask(key, entry)
+        return m
+
+    def evalFilter(self, df, col, op, val, rows=None):
+        """Evaluate one filter for all rows or the given row positions"""
+
+        s = df[col]
+        if rows is not None:
+            s = s.iloc[rows]
+        m = None
+        if op in ['contains','excludes'] and self.canUseIndex(df, col):
+            model = self.table.model
+            index = model.getTextIndex(df.columns.get_loc(col),
+                                       int(self.table.textindexrows))
+            if index is not None:
+                m = index.lookup(str(val))
+        if m is not None:
+            if rows is not None:
+                m = m[rows]
+            if op == 'excludes':
+                m = ~m
+        elif op == 'contains':
+            m = s.str.contains(str(val))
+        elif op == 'equals':
+            m = s==val
+        elif op == 'not equals':
+            m = s!=val
+        elif op == '>':
+            m = s>val
+        elif op == '<':
+            m = s<val
+        elif op == 'is empty':
+            m = s.isnull()
+        elif op == 'not empty':
+            m = ~s.isnull()
+        elif op == 'excludes':
+            m = ~toMask(s.str.contains(val))
+        elif op == 'starts with':
+            m = s.str.startswith(val)
+        elif op == 'ends with':
+            m = s.str.endswith(val)
+        elif op == 'has length':
+            m = s.str.len()>val
+        elif op == 'is number':
+            m = s.astype('object').str.isnumeric()
+        elif op == 'is lowercase':
+            m = s.astype('object').str.islower()
+        elif op == 'is uppercase':
+            m = s.astype('object').str.isupper()
+        else:
+            return None
+        return toMask(m)
+
+    def checkCache(self):
+        """Clear the cached masks if the table has a new model or its
+        rows were changed or reordered, as masks follow row positions"""
+
+        model = self.table.model
+        if getattr(self, 'cachemodel', None) is not model or self.cacheversion != model.allversion:
+            self.masks.clear()
+            self.cachemodel = model
+            self.cacheversion = model.allversion
+        return
+
+    def removeFilterMasks(self, col, op, val):
+        """Drop the cached masks of a filter that was removed"""
+
+        try:
+            val = float(val)
+        except:
+            pass
+        keys = [k for k in self.masks if len(k) == 4 and k[0] == col
+                and k[2:] == (op, val)]
+        for k in keys:
+            del self.masks[k]
+        return
+
+    def getCachedMask(self, key):
+
+        if key in self.masks:
+            self.masks.move_to_end(key)
+            return self.masks[key]
+        return None
+
+    def setCachedMask(self, key, entry):
+
+        self.masks[key] = entry
+        self.masks.move_to_end(key)
+        while len(self.masks) > 20:
+            self.masks.popitem(last=False)
+        return
+
+    def canUseIndex(self, df, col):
+        """Check if a text index of the table model can be used for
+        filtering a column of df"""
+
+        if df is not self.table.model.df or not df.columns.is_unique:
+            return False
+        s = df[col]
+        return pd.api.types.infer_dtype(s.iloc[:1000], skipna=True) == 'string'
+
     def colorResult(self):
         """Color filtered rows in main table"""
 
         table=self.table
-        if not hasattr(self.table,'dataframe') or not hasattr(self, 'filtdf'):
+        if self.filtmask is None:
             return
+        if self.filtversion != table.model.version:
+            #rows may have changed since the query so find them again
+            self.query()
+            if self.filtmask is None:
+                return
         clr =  pickColor(self,'#dcf1fc')
         if clr is None: return
-        df = table.model.df = table.dataframe
-        idx = self.filtdf.index
-        rows = table.multiplerowlist = table.getRowsFromIndex(idx)
+        table.model.setRowView(None)
+        rows = table.multiplerowlist = Selection.fromMask(self.filtmask)
         table.setRowColors(rows, clr, cols='all')
         return
 
@@ -1550,7 +1821,9 @@ class FilterBar(Frame):
     def close(self):
         """Destroy and remove from parent"""
 
+        col, val, op, b = self.getFilter()
         self.parent.filters.remove(self)
+        self.parent.removeFilterMasks(col, op, val)
         self.destroy()
         return
 
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+    Implements display formatting of table cells.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+def formatFloats(vals, precision=2, thousandseparator=''):
+    """Format an array of floats using the table precision. Values
+    between -1 and 1 use general format so small numbers are not lost.
+
+    Args:
+        vals: numpy float array
+        precision: number of decimal places
+        thousandseparator: ',' to group thousands, otherwise ''
+    Returns:
+        numpy object array of strings, with '' for nan values
+    """
+
+    p = int(precision)
+    out = np.full(len(vals), '', dtype=object)
+    notnull = ~np.isnan(vals)
+    small = notnull & (np.abs(vals) < 1)
+    large = notnull & ~small
+    if small.any():
+        out[small] = np.char.mod('%.'+str(p)+'g', vals[small])
+    if large.any():
+        if thousandseparator == ',':
+            out[large] = ['{:,.{}f}'.format(x, p) for x in vals[large]]
+        else:
+            out[large] = np.char.mod('%.'+str(p)+'f', vals[large])
+    return out
+
+def formatIntegers(coldata, thousandseparator=''):
+    """Format an integer column exactly, without going through floats.
+
+    Args:
+        coldata: pandas series with an integer dtype
+        thousandseparator: ',' to group thousands, otherwise ''
+    Returns:
+        numpy object array of strings, with '' for missing values
+    """
+
+    mask = coldata.isna().to_numpy()
+    vals = coldata.to_numpy(dtype=object)
+    if thousandseparator == ',':
+        fmt = '{:,}'.format
+    else:
+        fmt = str
+    out = np.array([fmt(int(v)) for v in vals[~mask]], dtype=object)
+    if not mask.any():
+        return out
+    full = np.full(len(vals), '', dtype=object)
+    full[~mask] = out
+    return full
+
+def formatColumn(coldata, precision=2, timeformat="%Y-%m-%d %H:%M:%S",
+                 thousandseparator=''):
+    """Convert a column slice to display strings in one pass.
+
+    Args:
+        coldata: pandas series
+        precision: float precision
+        timeformat: strftime format for datetime columns
+        thousandseparator: ',' or ''
+    Returns:
+        numpy object array of strings
+    """
+
+    dtype = coldata.dtype
+    if pd.api.types.is_integer_dtype(dtype):
+        return formatIntegers(coldata, thousandseparator)
+    if isinstance(dtype, pd.ArrowDtype):
+        dtype = dtype.numpy_dtype
+    if dtype in ['float64','float32']:
+        vals = coldata.to_numpy(dtype=float, na_value=np.nan)
+        return formatFloats(vals, precision, thousandseparator)
+    if pd.api.types.is_datetime64_any_dtype(coldata):
+        if isinstance(coldata.dtype, pd.ArrowDtype):
+            #arrow strftime differs for seconds so use numpy datetimes
+            coldata = coldata.astype(dtype)
+        coldata = coldata.dt.strftime(timeformat)
+    vals = coldata.to_numpy(dtype=object)
+    mask = pd.isnull(vals)
+    out = vals.astype(str).astype(object)
+    out[mask] = ''
+    return out
+
+class CellFormatter(object):
+    """Converts column data to display strings for a table, caching the
+    results in blocks of rows so that already seen rows are not
+    formatted again. Blocks are kept until the model reports that the
+    column or the shown rows changed, see TableModel.markChanged.
+
+    Args:
+        blocksize: rows per cached block
+        maxblocks: maximum number of blocks kept
+    """
+
+    def __init__(self, blocksize=256, maxblocks=512):
+
+        self.blocksize = blocksize
+        self.maxblocks = maxblocks
+        self.cache = OrderedDict()
+        self.model = None
+        return
+
+    def getText(self, model, col, start, end, precision=2,
+                timeformat="%Y-%m-%d %H:%M:%S", thousandseparator=''):
+        """Get display strings for rows start to end of a column
+
+        Args:
+            model: table model
+            col: column position
+            start: first row
+            end: row after the last one
+        Returns:
+            numpy object array of strings
+        """
+
+        if end <= start:
+            return np.array([], dtype=object)
+        settings = (precision, timeformat, thousandseparator)
+        bs = self.blocksize
+        parts = []
+        for b in range(start//bs, (end-1)//bs+1):
+            text = self.getBlock(model, col, b, settings)
+            parts.append(text)
+        if len(parts) == 1:
+            text = parts[0]
+        else:
+            text = np.concatenate(parts)
+        offset = start - (start//bs)*bs
+        return text[offset:offset+end-start]
+
+    def getBlock(self, model, col, block, settings):
+        """Get the formatted strings for one block of a column. Cached
+        blocks are used while the column and row view versions of the
+        model are unchanged."""
+
+        if model is not self.model:
+            self.clear()
+            self.model = model
+        name = model.df.columns[col]
+        key = (col, name, block, settings)
+        version = (model.getColumnVersion(name), model.viewversion)
+        if key in self.cache and self.cache[key][0] == version:
+            self.cache.move_to_end(key)
+            return self.cache[key][1]
+        bs = self.blocksize
+        raw = model.getDataBlock(block*bs, (block+1)*bs, col)
+        text = formatColumn(raw, *settings)
+        self.cache[key] = (version, text)
+        if len(self.cache) > self.maxblocks:
+            self.cache.popitem(last=False)
+        return text
+
+    def clear(self):
+        """Clear all cached strings"""
+
+        self.cache.clear()
+        return
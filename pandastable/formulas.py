@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+    Implements dependency tracking for table column formulae.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import ast
+
+#A formula such as c = a*2+b creates or replaces column c. The column
+#names used by each formula are found by parsing it, giving a graph of
+#which columns each formula depends on. When columns change only the
+#formulae that use them, directly or through other formulae, are
+#evaluated again and in an order where inputs are always done first.
+
+def getNames(ex):
+    """Names of the columns used in an expression, function names
+    are not included.
+    Args:
+        ex: numexpr expression string
+    Returns:
+        list of names in the order they first appear
+    """
+
+    tree = ast.parse(ex.strip(), mode='eval')
+    funcs = set()
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            funcs.add(id(node.func))
+        elif isinstance(node, ast.Name):
+            found.append(node)
+    #ast.walk is breadth first so sort by position in the text
+    found.sort(key=lambda node: (node.lineno, node.col_offset))
+    names = []
+    for node in found:
+        if id(node) not in funcs and node.id not in names:
+            names.append(node.id)
+    return names
+
+def evaluate(df, ex, names=None):
+    """Evaluate an expression with numexpr using the columns of a
+    dataframe. Only the columns used are converted to arrays.
+    Args:
+        df: dataframe
+        ex: expression string
+        names: column names used, found from ex if not given
+    """
+
+    import numexpr as ne
+    if names is None:
+        names = getNames(ex)
+    local = {}
+    for c in names:
+        if c in df.columns:
+            local[c] = df[c].to_numpy()
+    return ne.evaluate(ex, local_dict=local, global_dict={})
+
+class FormulaEngine(object):
+    """Keeps track of the columns used by formulae so that only those
+    affected by a change are evaluated again.
+
+    Args:
+        formulae: dict of column names and expressions, this is used
+            directly so the table and the engine share it
+    """
+
+    def __init__(self, formulae=None):
+
+        if formulae is None:
+            formulae = {}
+        self.formulae = formulae
+        self.parsed = {}
+        self.versions = {}
+        return
+
+    def getInputs(self, name):
+        """Columns used by the formula of a column"""
+
+        ex = self.formulae[name]
+        if name not in self.parsed or self.parsed[name][0] != ex:
+            self.parsed[name] = (ex, getNames(ex))
+        return self.parsed[name][1]
+
+    def getUsers(self):
+        """Dict of each column and the formulae that use it"""
+
+        users = {}
+        for n in self.formulae:
+            try:
+                inputs = self.getInputs(n)
+            except SyntaxError:
+                continue
+            for c in inputs:
+                users.setdefault(c, []).append(n)
+        return users
+
+    def getDependents(self, cols):
+        """Formulae that depend on any of the given columns, directly
+        or through other formulae"""
+
+        users = self.getUsers()
+        found = set()
+        stack = list(cols)
+        while len(stack) > 0:
+            c = stack.pop()
+            for n in users.get(c, []):
+                if n not in found:
+                    found.add(n)
+                    stack.append(n)
+        return found
+
+    def add(self, name, ex):
+        """Add or replace the formula of a column. Raises ValueError if
+        the formula would depend on its own result."""
+
+        inputs = getNames(ex)
+        if name in inputs or len(set(inputs) & self.getDependents([name])) > 0:
+            raise ValueError('circular reference in formula for %s' %name)
+        self.formulae[name] = ex
+        self.parsed[name] = (ex, inputs)
+        self.versions.pop(name, None)
+        return
+
+    def remove(self, name):
+        """Remove the formula of a column"""
+
+        self.formulae.pop(name, None)
+        self.parsed.pop(name, None)
+        self.versions.pop(name, None)
+        return
+
+    def getOrder(self, names=None):
+        """Order formulae so that each comes after those it uses.
+        Formulae in a circular reference are left out.
+        Args:
+            names: formulae to order, all if None
+        """
+
+        if names is None:
+            names = list(self.formulae.keys())
+        names = set(names)
+        inputs = {}
+        for n in self.formulae:
+            if n not in names:
+                continue
+            try:
+                inputs[n] = set(self.getInputs(n)) & names
+            except SyntaxError:
+                continue
+        order = []
+        done = set()
+        while len(inputs) > 0:
+            ready = [n for n in inputs if inputs[n] <= done]
+            if len(ready) == 0:
+                break
+            for n in ready:
+                order.append(n)
+                done.add(n)
+                del inputs[n]
+        return order
+
+    def getInputVersion(self, model, name):
+        """Latest version of the columns used by a formula"""
+
+        return max([model.getColumnVersion(c) for c in self.getInputs(name)] + [0])
+
+    def setEvaluated(self, name, model):
+        """Record that a formula was evaluated with the current data"""
+
+        self.versions[name] = (self.formulae[name], self.getInputVersion(model, name))
+        return
+
+    def getStale(self, model):
+        """Formulae whose inputs changed since they were evaluated"""
+
+        stale = []
+        for n in self.formulae:
+            try:
+                v = (self.formulae[n], self.getInputVersion(model, n))
+            except SyntaxError:
+                continue
+            if self.versions.get(n) != v:
+                stale.append(n)
+        return stale
+
+    def recalculate(self, model, cols=None):
+        """Evaluate formulae again after data changed.
+        Args:
+            model: TableModel
+            cols: columns that changed, if None any formulae whose inputs
+                changed since they were last evaluated are used
+        Returns:
+            list of updated columns and a dict of errors
+        """
+
+        if cols is None:
+            names = set(self.getStale(model))
+            names.update(self.getDependents(names))
+        else:
+            names = self.getDependents(cols)
+        updated = []
+        errors = {}
+        for n in self.getOrder(names):
+            df = model.df
+            ex = self.formulae[n]
+            try:
+                df[n] = evaluate(df, ex, self.getInputs(n))
+            except Exception as e:
+                errors[n] = e
+                continue
+            model.markChanged([n])
+            self.setEvaluated(n, model)
+            updated.append(n)
+        return updated, errors
@@ -32,6 +32,7 @@ except:
 import numpy as np
 import pandas as pd
 from . import util
+from .selection import Selection, asSelection
 from .dialogs import *
 import textwrap
 
@@ -129,31 +130,66 @@ class ColumnHeader(Canvas):
         self.delete('rect')
         self.delete('dragrect')
         self.atdivider = None
-        font = self.thefont
-        anchor = align
-        pad = 5
+        self.drawn = None
 
-        x_start = self.table.x_start
         if cols == 0:
             return
+        #height of one level of labels
+        self.levelheight = self.height
+        if multiindex == 1:
+            self.height *= len(df.columns.levels)
+        visible = self.table.visiblecols
+        self.drawLabels(visible, align)
+        self.drawEndLine(visible[-1])
+        self.drawn = (visible[0], visible[-1]+1)
+        self.config(height=self.height,bg=self.bgcolor)
+        return
+
+    def redrawScrolled(self, align='w'):
+        """Update the header after the table has scrolled. Labels still in
+        view are kept and only columns that came into view are drawn."""
+
+        visible = self.table.visiblecols
+        if getattr(self, 'drawn', None) is None or len(visible) == 0:
+            self.redraw(align)
+            return
+        start, end = visible[0], visible[-1]+1
+        ostart, oend = self.drawn
+        if start >= oend or end <= ostart:
+            self.redraw(align)
+            return
+        gone = ['col%s' %c for c in range(ostart, oend) if c < start or c >= end]
+        if len(gone) > 0:
+            self.delete(*gone)
+        new = [c for c in visible if c < ostart or c >= oend]
+        self.drawLabels(new, align)
+        self.drawEndLine(visible[-1])
+        self.drawn = (start, end)
+        return
 
+    def drawLabels(self, cols, align='w'):
+        """Draw column labels and dividers for the given columns. Items
+        are tagged by column so they can be removed when out of view."""
+
+        df = self.model.df
+        multiindex = util.check_multiindex(df.columns)
+        wrap = self.wrap
+        colwidths = self.table.columnwidths
+        font = self.thefont
+        anchor = align
+        pad = 5
+        h = self.levelheight
         if multiindex == 1:
             anchor = 'nw'
-            y=2
-            levels = df.columns.levels
-            h = self.height
-            self.height *= len(levels)
+            nlevels = len(df.columns.levels)
             y=3
         else:
-            levels = [df.columns.values]
-            h = self.height
+            nlevels = 1
             y = h/2
-        i=0
         #iterate over index levels
-        col=0
-        for level in levels:
+        for i in range(nlevels):
             values = df.columns.get_level_values(i)
-            for col in self.table.visiblecols:
+            for col in cols:
                 colname = values[col]
                 try:
                     colstr = colname.encode('utf-8','ignore').decode('utf-8')
@@ -185,20 +221,24 @@ class ColumnHeader(Canvas):
                 else:
                     colname = colname[0:int(length)]
 
-                line = self.create_line(x, 0, x, self.height, tag=('gridline', 'vertline'),
+                coltag = 'col%s' %col
+                line = self.create_line(x, 0, x, self.height, tag=('gridline', 'vertline', coltag),
                                      fill='white', width=1)
                 self.create_text(xt,y,
                                     text=colname,
                                     fill=self.fgcolor,
                                     font=self.thefont,
-                                    tag='text', anchor=anchor)
-
-            x = self.table.col_positions[col+1]
-            self.create_line(x,0, x, self.height, tag='gridline',
-                            fill='white', width=2)
-            i+=1
+                                    tag=('text', coltag), anchor=anchor)
             y=y+h-2
-        self.config(height=self.height,bg=self.bgcolor)
+        return
+
+    def drawEndLine(self, col):
+        """Draw the divider after the last visible column"""
+
+        self.delete('endline')
+        x = self.table.col_positions[col+1]
+        self.create_line(x,0, x, self.height, tag=('gridline','endline'),
+                        fill='white', width=2)
         return
 
     def handle_left_click(self,event):
@@ -310,6 +350,16 @@ class ColumnHeader(Canvas):
                 return v
         return None
 
+    def nearestDivider(self, x, d):
+        """Get index of the first column divider within d of x, found by
+        binary search of the table column positions"""
+
+        pos = self.table.col_positions
+        i = np.searchsorted(pos, x-d, side='left')
+        if i < len(pos) and abs(pos[i]-x) <= d:
+            return int(i)
+        return None
+
     def leave(self, event):
         """Mouse left canvas event"""
         self.delete('resizesymbol')
@@ -331,11 +381,11 @@ class ColumnHeader(Canvas):
         if x > self.tablewidth+w:
             return
         #if event x is within x pixels of divider, draw resize symbol
-        nearest = self.within(x, self.table.col_positions, 4)
+        nearest = self.nearestDivider(x, 4)
 
         if x != x_start and nearest != None:
             #col = self.table.get_col_clicked(event)
-            col = self.table.col_positions.index(nearest)-1
+            col = nearest-1
             self.nearestcol = col
             #print (nearest,col,self.model.df.columns[col])
             if col == None:
@@ -551,16 +601,60 @@ class RowHeader(Canvas):
         self.configure(scrollregion=(0,0, self.width, self.height))
         self.delete('rowheader','text')
         self.delete('rect')
+        self.drawn = None
 
-        xstart = 1
-        pad = 5
-        maxw = self.maxwidth
         v = self.table.visiblerows
         if len(v) == 0:
             return
+        cols, widths, xpos, w = self.getLabels(v)
+        self.widths = widths
+        if self.width != w:
+            self.config(width=w)
+            self.width = w
+        self.drawLabels(v, cols, xpos, align)
+        self.config(bg=self.bgcolor)
+        self.drawn = (v[0], v[-1]+1)
+        return
+
+    def redrawScrolled(self, align='w'):
+        """Update the header after the table has scrolled. Rows still in
+        view are kept and only those that came into view are drawn."""
+
+        v = self.table.visiblerows
+        if getattr(self, 'drawn', None) is None or len(v) == 0:
+            self.redraw(align)
+            return
+        start, end = v[0], v[-1]+1
+        ostart, oend = self.drawn
+        if start >= oend or end <= ostart:
+            self.redraw(align)
+            return
+        new = [r for r in v if r < ostart or r >= oend]
+        if len(new) > 0:
+            cols, widths, xpos, w = self.getLabels(new)
+            #labels got wider so everything needs to be redrawn
+            if w > self.width or len(widths) != len(self.widths) or \
+                np.any(np.array(widths) > np.array(self.widths)):
+                self.redraw(align)
+                return
+            if len(widths) > 1:
+                xpos = [0]+list(np.cumsum(self.widths))[:-1]
+        gone = ['row%s' %r for r in range(ostart, oend) if r < start or r >= end]
+        if len(gone) > 0:
+            self.delete(*gone)
+        if len(new) > 0:
+            self.drawLabels(new, cols, xpos, align)
+        self.drawn = (start, end)
+        return
+
+    def getLabels(self, v):
+        """Get the row labels to show for the given rows and the widths
+        needed for them"""
+
+        xstart = 1
+        maxw = self.maxwidth
         scale = self.table.getScale()
-        h = self.table.rowheight
-        index = self.model.df.index
+        index = self.model.getIndex()
         names = index.names
 
         if self.table.showindex == True:
@@ -594,33 +688,32 @@ class RowHeader(Canvas):
             widths = [w]
             xpos = [xstart]
 
-        self.widths = widths
         if w>maxw:
             w = maxw
         elif w<45:
             w = 45
+        return cols, widths, xpos, w
 
-        if self.width != w:
-            self.config(width=w)
-            self.width = w
+    def drawLabels(self, v, cols, xpos, align='w'):
+        """Draw label cells for rows v. Items are tagged by row so they
+        can be removed when scrolled out of view."""
 
+        pad = 5
+        h = self.table.rowheight
+        w = self.width
         i=0
         for col in cols:
-            r=v[0]
             x = xpos[i]
             i+=1
-            #col=pd.Series(col.tolist()).replace('nan','')
-            for row in col:
-                text = row
+            for r,text in zip(v, col):
                 x1,y1,x2,y2 = self.table.getCellCoords(r,0)
+                rowtag = 'row%s' %r
                 self.create_rectangle(x,y1,w-1,y2, #fill=self.color,
                                         outline='white', width=1,
-                                        tag='rowheader')
+                                        tag=('rowheader',rowtag))
                 self.create_text(x+pad,y1+h/2, text=text,
                                   fill=self.fgcolor, font=self.table.thefont,
-                                  tag='text', anchor=align)
-                r+=1
-        self.config(bg=self.bgcolor)
+                                  tag=('text',rowtag), anchor=align)
         return
 
     def setWidth(self, w):
@@ -657,7 +750,8 @@ class RowHeader(Canvas):
         """Handle ctrl clicks - for multiple row selections"""
 
         rowclicked = self.table.get_row_clicked(event)
-        multirowlist = self.table.multiplerowlist
+        multirowlist = asSelection(self.table.multiplerowlist)
+        self.table.multiplerowlist = multirowlist
         if 0 <= rowclicked < self.table.rows:
             if rowclicked not in multirowlist:
                 multirowlist.append(rowclicked)
@@ -702,17 +796,16 @@ class RowHeader(Canvas):
         #draw the selected rows
         if self.endrow != self.startrow:
             if self.endrow < self.startrow:
-                rowlist=list(range(self.endrow, self.startrow+1))
+                rowlist = Selection.fromRange(self.endrow, self.startrow+1)
             else:
-                rowlist=list(range(self.startrow, self.endrow+1))
+                rowlist = Selection.fromRange(self.startrow, self.endrow+1)
             self.drawSelectedRows(rowlist)
             self.table.multiplerowlist = rowlist
             self.table.drawMultipleRows(rowlist)
             self.table.drawMultipleCells()
             self.table.allrows = False
         else:
-            self.table.multiplerowlist = []
-            self.table.multiplerowlist.append(rowover)
+            self.table.multiplerowlist = Selection([rowover])
             self.drawSelectedRows(rowover)
             self.table.drawMultipleRows(self.table.multiplerowlist)
         return
@@ -760,22 +853,21 @@ class RowHeader(Canvas):
         return popupmenu
 
     def drawSelectedRows(self, rows=None):
-        """Draw selected rows, accepts a list or integer"""
+        """Draw selected rows, accepts a Selection, list or integer. Only
+        the rows in view are drawn."""
 
         self.delete('rect')
-        if type(rows) is not list:
-            rowlist=[]
-            rowlist.append(rows)
-        else:
-           rowlist = rows
-        for r in rowlist:
-            if r not in self.table.visiblerows:
-                continue
-            self.drawRect(r, delete=0)
+        v = self.table.visiblerows
+        if rows is None or len(v) == 0:
+            return
+        rowlist = asSelection(rows)
+        for start,end in rowlist.intersect(v[0], v[-1]+1):
+            self.drawRect(start, end=end, delete=0)
         return
 
-    def drawRect(self, row=None, tag=None, color=None, outline=None, delete=1):
-        """Draw a rect representing row selection"""
+    def drawRect(self, row=None, tag=None, color=None, outline=None, delete=1, end=None):
+        """Draw a rect representing row selection, from row to end-1 if
+        end is given"""
 
         if tag==None:
             tag='rect'
@@ -788,6 +880,8 @@ class RowHeader(Canvas):
         w=0
         i = self.inset
         x1,y1,x2,y2 = self.table.getCellCoords(row, 0)
+        if end is not None:
+            y2 = y1 + (end-row)*self.table.rowheight
         rect = self.create_rectangle(0+i,y1+i,self.width-i,y2,
                                       fill=color,
                                       outline=outline,
@@ -22,7 +22,29 @@ try:
      import tkinter as tk
 except:
      import Tkinter as tk
+import functools, weakref
 
+#images for each root window, dropped when the root goes away
+_cache = weakref.WeakKeyDictionary()
+
+def cached(func):
+    """Decode an image the first time it is used and return the same
+    PhotoImage afterwards. Images belong to a Tk instance so they are
+    cached per root window."""
+
+    @functools.wraps(func)
+    def getimage():
+        root = tk._default_root
+        if root is None:
+            return func()
+        images = _cache.setdefault(root, {})
+        name = func.__name__
+        if name not in images:
+            images[name] = func()
+        return images[name]
+    return getimage
+
+@cached
 def tableapp_logo():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhAAEAAcZxAAAAAAcABxQAKxUALRsFAyUAJCQAJycAJiQIACYKACgO'
@@ -130,6 +152,7 @@ def tableapp_logo():
             +'rKBbLKocfL0REAgAOw==')
      return img
 
+@cached
 def add_row():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAACFfHSZlIixtJzN1Ljd6MTl9Mzp+NEJ3uzyBNj2C'
@@ -157,6 +180,7 @@ def add_row():
             +'AlOcKDEiBAgOGmLLRmCwdsGAADs=')
      return img
 
+@cached
 def add_col():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAADdrGT5wIkx7MUR3a09/e1OMKFePLV+JSWCJSWaO'
@@ -184,6 +208,7 @@ def add_col():
             +'FCREeNCAgIESRkoY4GtwYIDbt+kEBAA7')
      return img
 
+@cached
 def del_row():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAEJ3u3y+dlKEw1aHx12KxVmKyFuKyV6Oy1+Py2OS'
@@ -211,6 +236,7 @@ def del_row():
             +'DBQgOEBggOvXAQzKLhgQADs=')
      return img
 
+@cached
 def del_col():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAHy+dlKEw1WGxlaHx1mKyFuKyV6Oy1+Py2OSzmST'
@@ -238,6 +264,7 @@ def del_col():
             +'DxosSHDAAAEBIkq8UEGCwwWDBEdk0JDhdkAAOw==')
      return img
 
+@cached
 def delete():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZvALdKK7hKKrpLLrhOLrxLML5PNrxQMr1RNb5TOMFNM9BP'
@@ -256,6 +283,7 @@ def delete():
             +'QEeUKDcSKGwEB8EBAQMoahwUCAA7')
      return img
 
+@cached
 def new_proj():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAEJ3u3y+dlKEw1SGxFWGxlaHx12KxVyKxl+MxlmK'
@@ -283,6 +311,7 @@ def new_proj():
             +'qAMYXE0wIAA7')
      return img
 
+@cached
 def open_proj():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAABV5ABt5AB57AyF9ACV/ACZ+ECR8FUJ3uy2DAS2D'
@@ -310,6 +339,7 @@ def open_proj():
             +'DShoAcHghEAbNGTAcNFiRYoUCj4cMIHAYEECAwgGBAA7')
      return img
 
+@cached
 def save_proj():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAACBarS5fpjppqj5qqzNoukRtq0RwsFd+u1F/w1N/'
@@ -338,6 +368,7 @@ def save_proj():
             +'NkB88MDBgICAADs=')
      return img
 
+@cached
 def prefs():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAElJSU5OTlFRUVJSUlNTU1hYWFpaWltbW1xcXGFh'
@@ -365,6 +396,7 @@ def prefs():
             +'HZ4sWWDGgACIAjcE0YEANsEIBgZADAgAOw==')
     return img
 
+@cached
 def plot():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAC5fpTBiqTBiqjJkrDNmrjRosTVosjZrtTdrtjxy'
@@ -390,6 +422,7 @@ def plot():
             +'Bi8gaUBR4AQGCrqKHWswIAA7')
     return img
 
+@cached
 def plot_clear():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPedAGVCPXZsJXsueXwzfH04f2pBbWhTe6pJB6lMCblFA7tC'
@@ -418,6 +451,7 @@ def plot_clear():
             +'FiQQGBAAOw==')
     return img
 
+@cached
 def plot_prefs():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAFU9ETxyvz10wj51wz52xD92xT93xltujUJ3xkB4'
@@ -444,6 +478,7 @@ def plot_prefs():
             +'GCgGqOCjB8KAADs=')
     return img
 
+@cached
 def fit():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAADd1LTh1K/8CBv0NEfwOEvsWGvsXG/kZHPkhJPcrLvkq'
@@ -461,6 +496,7 @@ def fit():
             +'2oQ3gxzmgx8bhDVYAQABhhoZg+yKhjQx+DD7KjAq/ylU2FMUCAA7')
     return img
 
+@cached
 def refresh():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAACNhHyRjICVlIidmIyloJCprJixtJzJ0LDN2Ljd7Mjp+'
@@ -478,6 +514,7 @@ def refresh():
             +'Gtc3VlVTTps1OSEFhCMwUk9LST4zKhYEhhwrKA4MCQc+LWKWrCChQAA7')
     return img
 
+@cached
 def start():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhGAAYAKUAAP///+bm/+Xl/uPj/OHh++Df+d7d993d99vb9dvb9NnZ'
@@ -492,6 +529,7 @@ def start():
             +'S0gA6OvsSUEAOw==')
      return img
 
+@cached
 def end():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhGAAYAKUAAP///+bm/+Xl/uPj/OHh++Df+d7d993d99vb9dvb9NnZ'
@@ -506,6 +544,7 @@ def end():
             +'R6ncQ+JN7e7vREEAOw==')
      return img
 
+@cached
 def next():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAACBeHSRjISlpJS9wKjV4LzuANUKIO0WIP0mLREqM'
@@ -530,6 +569,7 @@ def next():
             +'F1akOFFiRIgPHTZksKBAgMCLGTdGNIAAQgKfDAcgZbj0odOnUA8GBAA7')
      return img
 
+@cached
 def prev():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAACBeHSRjISlpJS9wKjV4LzuANUKIO0mRQU+ZR1ah'
@@ -554,6 +594,7 @@ def prev():
             +'KlCYICECRAcMFSI8EDDQAQQLDDRy9DhAQACCGB8KTKC0qdOnDwMCADs=')
      return img
 
+@cached
 def search():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAIcAAAAAAHaczXufzXug0H+l05JaEJNbEZVdFJdfGJpiG51l'
@@ -580,6 +621,7 @@ def search():
             +'fwMCADs=')
      return img
 
+@cached
 def transpose():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAACxsJyxtKC1uKC1uKS9xKzFzLDd7MTl9Mzt/NT6EOEGH'
@@ -597,6 +639,7 @@ def transpose():
             +'hxswSD5EQj49GAWHESU1PTo6NxUDiQkJBhf1j4ME9v0EASQUCAA7')
      return img
 
+@cached
 def melt():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAMZnACxsJy9wKi9xKzJ1LTN2LjV4LzV4MDZ5MDh8Mjp+ND6E'
@@ -614,6 +657,7 @@ def melt():
             +'KykZx4QMsP07FAgAOw==')
      return img
 
+@cached
 def pivot():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAMZQACFfHiNiICRiICZlIidmIylpJSprJixtKC5vKTByKzJ0'
@@ -631,6 +675,7 @@ def pivot():
             +'DA4Qp+rrgQA7')
      return img
 
+@cached
 def aggregate():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAMZbACFfHiNiICZlIilpJSxtKC1sKS5vKTBwLDJ0LTN1LzV4'
@@ -648,6 +693,7 @@ def aggregate():
             +'+4+BADs=')
      return img
 
+@cached
 def merge():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZlADyANT6DN0CGOUKIO0eGQ0+ZR1CQSlGbSVOeS1ebUFia'
@@ -667,6 +713,7 @@ def merge():
 
      return img
 
+@cached
 def table_multiple():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZbAHy+doDBeoTDfkJ3u1KEw1SGxFWGxlaHx12KxVmKyF+P'
@@ -686,6 +733,7 @@ def table_multiple():
             +'IBAAOw==')
      return img
 
+@cached
 def filtering():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPcAAMh/M81/OIF7c9mYP/LSOLmIScWIR9WOSMqTQMmWQ82X'
@@ -714,6 +762,7 @@ def filtering():
             +'WAh0IUpRI0UUwFxQsIWWrVwnFrJowYKFgAUFYqhQwSK5roAAOw==')
      return img
 
+@cached
 def importcsv():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAOe1ACpgtyxity5kth57AyxltC5luS9lujBluiJ7DjBmuiN6'
@@ -743,6 +792,7 @@ def importcsv():
             +'IIDAgAA7')
      return img
 
+@cached
 def excel():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAOenACpgtyxity1kuS5kuS5luTN0GS9lujBlujN1GTN1GjN1'
@@ -771,6 +821,7 @@ def excel():
             +'lACBDiAxUpQIESJKlCJ9CmUKQMMDDBZIP2CAAIEBAwIIDAgAOw==')
      return img
 
+@cached
 def add():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZ2ADSBLDSCLDeELzmFMDyHMj2INECJNkKNNkKLOEOPOESM'
@@ -789,6 +840,7 @@ def add():
             +'8BCDBj+wWNlxYGCjOwkMEBBwseOgQAA7')
      return img
 
+@cached
 def cross():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAAOQiJOYqLOktL+ovMekyNes0Nuw8Pu49P+0+QO0/QfE/'
@@ -806,6 +858,7 @@ def cross():
             +'DIIEEC0UAoQbLBsIhAEKFAOFFe2FAPLC+fpZgQA7')
      return img
 
+@cached
 def accept():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPeGAB1sGh5uGh5wGh5xGh9xGx5zGh94Gx56Gx96Gx5/Gx+D'
@@ -833,6 +886,7 @@ def accept():
             +'uMSIsSVODAAHGXjgkiaNlQmYGx5CUAAAAdGoBwYEADs=')
      return img
 
+@cached
 def calculate():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZaAHJycnp6en5+fttYUuh0c01yp1Z7sGSLwWaNw2eNw2eP'
@@ -851,6 +905,7 @@ def calculate():
             +'xIePHhAjApFAKEAEChg1aKBggQKEAIZCFgoEADs=')
      return img
 
+@cached
 def table_delete():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZ5ALlEA7lFA7xCBLxDBbxNBbxWHb1XHrhWIr5bKN1kAeFo'
@@ -870,6 +925,7 @@ def table_delete():
             +'wJAhAAMW6gkEADs=')
      return img
 
+@cached
 def function():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPUAACYmJikpKSoqKi0tLS4uLi8vLzExMTIyMjQ0NDU1NTc3'
@@ -882,6 +938,7 @@ def function():
             +'fQIAaoiJX0EAOw==')
      return img
 
+@cached
 def copy():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZtAEJzxUR0xUV1xkV1x0d5x0h9w0l5x0p5x0V1yEZ1yEt5'
@@ -901,6 +958,7 @@ def copy():
             +'MACDQAA7')
      return img
 
+@cached
 def paste():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAAEZGRkhISElJSUpKSkxMTE9PT1JSUlNTU1VVVVZWVlhY'
@@ -920,6 +978,7 @@ def paste():
             +'xs1MOQAkCVKA4EABAgQC5AwEADs=')
      return img
 
+@cached
 def tilevertical():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZrAEBZl0Bal0FbmEVenUZin0pnoUhlo0tnpUtpo01tpU1q'
@@ -938,6 +997,7 @@ def tilevertical():
 
      return img
 
+@cached
 def tilehorizontal():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZTAEBZl0Bal0Jbl0NdmUNemkVgnEVgnUZinUlln0pnpEtp'
@@ -955,6 +1015,7 @@ def tilehorizontal():
             +'AvyG/v8ABwUCADs=')
      return img
 
+@cached
 def expand_col():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZvADp+NESHPUWGPkKIO1SOUF6VWVyiVF6rVF+hWGGiWmSv'
@@ -974,6 +1035,7 @@ def expand_col():
             +'s+agQAA7')
     return img
 
+@cached
 def contract_col():
     img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPZmACBeHSVlIixtJzp+NDx/N1SVTV2aV16XWVWhTVugU16p'
@@ -992,6 +1054,7 @@ def contract_col():
             +'IliVK1kABEGoTMOZDC1YrEhxgsQIESA+dNiQIYOhkyhTDgoEADs=')
     return img
 
+@cached
 def font():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAACtNwytQxDFVxjNhzDdjzDdmzDdnzTVpzzhozjlozjpq'
@@ -1009,6 +1072,7 @@ def font():
             +'QIEAOw==')
      return img
 
+@cached
 def color_swatch():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPMAAP5va1DMbf+qc/DVZ1h6sP93sWCw69Drstmb3QAAAAAA'
@@ -1017,6 +1081,7 @@ def color_swatch():
             +'eCUftI0bulktcMvBYIRkAsFMFJ6VJGHZfBaiSibCCT16v+AIADs=')
      return img
 
+@cached
 def zoom_in():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAACprJi5vKTBxKzJ0LDN2LjV5MIdIKKVcM6tkN6tnN6tk'
@@ -1034,6 +1099,7 @@ def zoom_in():
             +'BQIAUVJECqODJ01QTjgG6YIjQUEqCfGCBxn3U4EAOw==')
      return img
 
+@cached
 def zoom_out():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPYAAOoRHOwaI+4mLvE1OodIKKVcM6tkN6tnN6tkPbd+R/RF'
@@ -1051,6 +1117,7 @@ def zoom_out():
             +'H0FEQjAE4EkaOTkfB+hJBQ/uSYEAOw==')
      return img
 
+@cached
 def save():
      img = tk.PhotoImage(format='gif',data=
              'R0lGODlhEAAQAPcAAIjAYjFgpjFgpzFgqDFhqDJhqDJhqTJhqjJiqjJiqzJj'
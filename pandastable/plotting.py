@@ -44,6 +44,7 @@ from collections import OrderedDict
 import operator
 from .dialogs import *
 from . import util, images
+from .selection import Selection
 import logging
 
 colormaps = sorted(m for m in plt.cm.datad if not m.endswith("_r"))
@@ -2086,7 +2087,7 @@ class AnimateOptions(TkOptions):
             #finally draw the plot
             self.parent.canvas.draw()
 
-            table.multiplerowlist = rows
+            table.multiplerowlist = Selection.fromRange(rows.start, rows.stop)
             if refresh == 1:
                 table.drawMultipleRows(rows)
             time.sleep(delay)
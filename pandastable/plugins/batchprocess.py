@@ -39,8 +39,8 @@ else:
 import re, glob
 import pandas as pd
 from pandastable.plugin import Plugin
-from pandastable import Table, TableModel, dialogs
-import pylab as plt
+from pandastable import Table, TableModel, dialogs, util
+plt = util.lazyImport('pylab')
 
 class MyTable(Table):
     """
@@ -157,7 +157,7 @@ class BatchProcessPlugin(Plugin):
         b.pack(side=TOP,fill=BOTH,pady=2)
 
         table = self.parent.getCurrentTable()
-        self.pf = table.pf
+        self.pf = table.showPlotViewer()
         return
 
     def selectSaveFolder(self):
@@ -24,7 +24,8 @@ import sys,os
 import subprocess
 import numpy as np
 from pandastable.plugin import Plugin
-from pandastable import core, plotting, dialogs
+from pandastable import core, dialogs, util
+plotting = util.lazyImport('pandastable.plotting')
 try:
     from tkinter import *
     from tkinter.ttk import *
@@ -32,7 +33,7 @@ except:
     from Tkinter import *
     from ttk import *
 import pandas as pd
-import pylab as plt
+plt = util.lazyImport('pylab')
 from collections import OrderedDict
 
 class DiffExpressionPlugin(Plugin):
@@ -101,7 +102,7 @@ class DiffExpressionPlugin(Plugin):
         sheet = self.parent.getCurrentSheet()
         #reference to parent frame in sheet
         pw = self.parent.sheetframes[sheet]
-        self.pf = self.table.pf
+        self.pf = self.table.showPlotViewer()
         return
 
     def applyOptions(self):
@@ -133,7 +134,7 @@ class DiffExpressionPlugin(Plugin):
         self.table = self.parent.getCurrentTable()
 
         slabels = self.tkvars['sample_labels'].get()
-        st = self.parent.sheets[slabels]
+        st = self.parent.getTable(slabels)
         self.labels = df = st.model.df
 
         cols = list(df.columns)
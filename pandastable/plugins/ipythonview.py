@@ -22,10 +22,13 @@ import os
 import io
 import platform
 import subprocess
-import IPython
-from pkg_resources import parse_version
 from pandastable.plugin import Plugin
 from pandastable import images, dialogs, util
+IPython = util.lazyImport('IPython')
+
+def parse_version(v):
+    from pkg_resources import parse_version
+    return parse_version(v)
 
 class IterableIPShell:
     def __init__(self,argv=None,user_ns=None,user_global_ns=None,
@@ -24,7 +24,8 @@ import sys,os
 import subprocess
 import numpy as np
 from pandastable.plugin import Plugin
-from pandastable import core, plotting, dialogs
+from pandastable import core, dialogs, util
+plotting = util.lazyImport('pandastable.plotting')
 try:
     from tkinter import *
     from tkinter.ttk import *
@@ -32,8 +33,7 @@ except:
     from Tkinter import *
     from ttk import *
 import pandas as pd
-import pylab as plt
-from mpl_toolkits.mplot3d import Axes3D
+plt = util.lazyImport('pylab')
 from collections import OrderedDict
 
 class MultivariatePlugin(Plugin):
@@ -94,7 +94,7 @@ class MultivariatePlugin(Plugin):
         sheet = self.parent.getCurrentSheet()
         #reference to parent frame in sheet
         pw = self.parent.sheetframes[sheet]
-        self.pf = self.table.pf
+        self.pf = self.table.showPlotViewer()
 
         return
 
@@ -153,6 +153,7 @@ class MultivariatePlugin(Plugin):
         #setup plot
         self.pf._initFigure()
         if plot3d == True:
+            from mpl_toolkits.mplot3d import Axes3D
             fig = self.pf.fig
             ax = self.pf.ax = ax = Axes3D(fig)
         else:
@@ -22,7 +22,8 @@
 from __future__ import absolute_import, division, print_function
 import os, datetime
 from pandastable.plugin import Plugin
-from pandastable import plotting, dialogs
+from pandastable import dialogs, util
+plotting = util.lazyImport('pandastable.plotting')
 try:
     from tkinter import *
     from tkinter.ttk import *
@@ -30,7 +31,7 @@ except:
     from Tkinter import *
     from ttk import *
 import pandas as pd
-import pylab as plt
+plt = util.lazyImport('pylab')
 from collections import OrderedDict
 #from pandastable.dialogs import *
 
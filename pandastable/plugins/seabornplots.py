@@ -21,7 +21,8 @@
 
 from __future__ import absolute_import, division, print_function
 from pandastable.plugin import Plugin
-from pandastable import plotting, dialogs
+from pandastable import dialogs, util
+plotting = util.lazyImport('pandastable.plotting')
 try:
     from tkinter import *
     from tkinter.ttk import *
@@ -29,7 +30,7 @@ except:
     from Tkinter import *
     from ttk import *
 import pandas as pd
-import pylab as plt
+plt = util.lazyImport('pylab')
 from collections import OrderedDict
 #import seaborn as sns
 
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""
+    Implements reading and writing of DataExplore project files.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import os, time, json, shutil, tempfile
+import zipfile, gzip, pickle
+from collections import OrderedDict
+import pandas as pd
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+from .data import PagedTableModel
+from .undo import snapshot
+
+FORMAT_VERSION = 2
+
+#Project files are zip archives laid out as
+#
+#    index.json                 sheet names and the members for each sheet
+#    sheets/<n>/data.feather    table data as an arrow ipc file, or
+#    sheets/<n>/data.pickle     a pickled dataframe if arrow can't store it
+#    sheets/<n>/meta.pickle     plot options and table settings
+#
+#Sheets are read separately so a project can be opened without decoding
+#every sheet. Older projects are a single gzipped pickle of all sheets.
+
+def isLegacyProject(filename):
+    """Check if a file is an older gzipped pickle project"""
+
+    with open(filename, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+def loadLegacyProject(filename):
+    """Load all sheets of an older project file as a dict"""
+
+    return pickle.load(gzip.GzipFile(filename, 'r'))
+
+def canUseArrow(df):
+    """Check if a dataframe can be stored as arrow without changing it"""
+
+    if pa is None:
+        return False
+    cols = df.columns
+    if isinstance(cols, pd.MultiIndex) or not cols.is_unique:
+        return False
+    return all(isinstance(c, str) for c in cols)
+
+def toArrow(df):
+    """Arrow table for a dataframe, None if it can't be converted"""
+
+    if not canUseArrow(df):
+        return None
+    try:
+        return pa.Table.from_pandas(df)
+    except Exception:
+        return None
+
+def writeFrame(z, member, df):
+    """Write a dataframe into a zip file as arrow, or pickle if arrow can't
+    be used. Returns the member name used."""
+
+    table = toArrow(df)
+    kind = 'pickle' if table is None else 'feather'
+    zi = zipfile.ZipInfo(member + '.' + kind, date_time=time.localtime()[:6])
+    if table is None:
+        zi.compress_type = zipfile.ZIP_DEFLATED
+    with z.open(zi, 'w', force_zip64=True) as f:
+        if table is None:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression='lz4')
+            with pa.ipc.new_file(f, table.schema, options=options) as writer:
+                writer.write_table(table)
+    return zi.filename
+
+class ProjectReader(object):
+    """Reads sheets from a project file as they are needed.
+
+    Args:
+        filename: project file name
+    """
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.zip = zipfile.ZipFile(filename, 'r')
+        self.index = json.loads(self.zip.read('index.json').decode('utf-8'))
+        self.sheets = OrderedDict((s['name'], s) for s in self.index['sheets'])
+        return
+
+    def getSheetNames(self):
+        return list(self.sheets.keys())
+
+    def readData(self, name):
+        """Read the dataframe for a sheet, None if it has no stored data"""
+
+        s = self.sheets[name]
+        if 'data' not in s:
+            return None
+        member = s['data']
+        if member.endswith('.feather'):
+            if pa is None:
+                raise ImportError('pyarrow is needed to read this project')
+            buf = pa.py_buffer(self.zip.read(member))
+            return pa.ipc.open_file(buf).read_all().to_pandas()
+        with self.zip.open(member) as f:
+            return pickle.load(f)
+
+    def readMeta(self, name):
+        """Read the meta data for a sheet"""
+
+        s = self.sheets[name]
+        if 'meta' not in s:
+            return None
+        with self.zip.open(s['meta']) as f:
+            return pickle.load(f)
+
+    def readSheet(self, name):
+        """Get the data, meta data and source file for a sheet"""
+
+        s = self.sheets[name]
+        return self.readData(name), self.readMeta(name), s.get('source')
+
+    def close(self):
+        self.zip.close()
+        return
+
+def copyMember(src, dest, member, newname):
+    """Copy a zip member without decoding it"""
+
+    info = src.getinfo(member)
+    zi = zipfile.ZipInfo(newname, date_time=info.date_time)
+    zi.compress_type = info.compress_type
+    with src.open(member) as fin, dest.open(zi, 'w', force_zip64=True) as fout:
+        shutil.copyfileobj(fin, fout, 2**20)
+    return
+
+def tempName(filename):
+    """Temporary file next to filename, so it can be renamed into place"""
+
+    path = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=path)
+    os.close(fd)
+    return tmp
+
+def writeArchive(filename, sheets, source=None):
+    """Write sheets to a new project archive. This only reads the given
+    frames and the source file so it can be run in a worker thread.
+
+    Args:
+        filename: file to write
+        sheets: list of dicts with the keys name, df, meta and source.
+            Data or meta data not given are copied unchanged from the
+            same sheet in the source file
+        source: file name of the previous project file, if any
+    """
+
+    old = None
+    if source is not None and os.path.exists(source):
+        old = ProjectReader(source)
+    index = {'format': 'dataexplore', 'version': FORMAT_VERSION, 'sheets': []}
+    try:
+        with zipfile.ZipFile(filename, 'w', allowZip64=True) as z:
+            for i in range(len(sheets)):
+                s = sheets[i]
+                name = s['name']
+                folder = 'sheets/%s/' %i
+                entry = {'name': name}
+                prev = {}
+                if old is not None and name in old.sheets:
+                    prev = old.sheets[name]
+                if s.get('source') is not None:
+                    entry['source'] = s['source']
+                elif s.get('df') is not None:
+                    entry['data'] = writeFrame(z, folder + 'data', s['df'])
+                elif 'data' in prev or 'source' in prev:
+                    if 'source' in prev:
+                        entry['source'] = prev['source']
+                    else:
+                        entry['data'] = folder + os.path.basename(prev['data'])
+                        copyMember(old.zip, z, prev['data'], entry['data'])
+                if s.get('meta') is not None:
+                    entry['meta'] = folder + 'meta.pickle'
+                    data = pickle.dumps(s['meta'], protocol=pickle.HIGHEST_PROTOCOL)
+                    z.writestr(entry['meta'], data, compress_type=zipfile.ZIP_DEFLATED)
+                elif 'meta' in prev:
+                    entry['meta'] = folder + 'meta.pickle'
+                    copyMember(old.zip, z, prev['meta'], entry['meta'])
+                index['sheets'].append(entry)
+            z.writestr('index.json', json.dumps(index, indent=1),
+                       compress_type=zipfile.ZIP_DEFLATED)
+    finally:
+        if old is not None:
+            old.close()
+    return
+
+def getSheet(name, model, meta, reader=None):
+    """Sheet dict for writeArchive. The data is only included if it has
+    changed since the last save or is not in the current file.
+
+    Args:
+        name: sheet name
+        model: TableModel of the sheet
+        meta: meta data dict
+        reader: ProjectReader of the currently open project, if any
+    """
+
+    s = {'name': name, 'meta': meta}
+    if isinstance(model, PagedTableModel):
+        #only the file name is stored for paged tables
+        s['source'] = model.filename
+    elif model.isChanged() or reader is None or name not in reader.sheets:
+        s['df'] = snapshot(model.df)
+    return s
+
+def replaceProject(tmp, filename, reader=None):
+    """Move a newly written project file into place.
+
+    Args:
+        tmp: the new file, see tempName
+        filename: project file name
+        reader: ProjectReader of the currently open project, closed first
+    Returns:
+        a ProjectReader for the new file
+    """
+
+    if reader is not None:
+        reader.close()
+    os.replace(tmp, filename)
+    return ProjectReader(filename)
+
+def writeProject(filename, sheets, reader=None):
+    """Write a project file. The file is written to a temporary file first
+    and then moved into place. DataExplore does the same steps with the
+    archive written in a thread.
+
+    Args:
+        filename: project file name
+        sheets: list of sheet dicts, see writeArchive
+        reader: ProjectReader of the currently open project, if any
+    Returns:
+        a ProjectReader for the new file
+    """
+
+    tmp = tempName(filename)
+    source = None
+    if reader is not None:
+        source = reader.filename
+    try:
+        writeArchive(tmp, sheets, source)
+    except:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return replaceProject(tmp, filename, reader)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""
+    Implements a compact selection of table rows or columns.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import bisect
+import numpy as np
+import pandas as pd
+
+class Selection(object):
+    """Set of row or column positions stored as sorted, non-overlapping
+    [start, end) intervals. Behaves like a sorted list of positions so it
+    can be used in place of the old selection lists, but selecting a range
+    of any size only stores one interval.
+
+    Args:
+        items: optional iterable of positions or another Selection
+    """
+
+    def __init__(self, items=None):
+
+        self.starts = []
+        self.ends = []
+        self.size = 0
+        if isinstance(items, Selection):
+            self.starts = list(items.starts)
+            self.ends = list(items.ends)
+            self.size = items.size
+        elif isinstance(items, range) and items.step == 1:
+            self.addRange(items.start, items.stop)
+        elif items is not None:
+            for i in sorted(set(items)):
+                self.append(i)
+        return
+
+    @classmethod
+    def fromRange(cls, start, end):
+        """Selection of all positions from start up to but not including end"""
+
+        s = cls()
+        s.addRange(start, end)
+        return s
+
+    @classmethod
+    def fromMask(cls, mask):
+        """Selection of the positions where a boolean array is True"""
+
+        m = np.asarray(mask, dtype=np.int8)
+        d = np.diff(np.concatenate([[0], m, [0]]))
+        s = cls()
+        s.starts = np.flatnonzero(d == 1).tolist()
+        s.ends = np.flatnonzero(d == -1).tolist()
+        s.size = int(m.sum())
+        return s
+
+    def addRange(self, start, end):
+        """Add positions start to end-1, merging with touching intervals"""
+
+        start = int(start)
+        end = int(end)
+        if end <= start:
+            return
+        #intervals that overlap or touch the new one
+        i = bisect.bisect_left(self.ends, start)
+        j = bisect.bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j-1])
+            removed = sum(e-s for s,e in zip(self.starts[i:j], self.ends[i:j]))
+        else:
+            removed = 0
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+        self.size += end - start - removed
+        return
+
+    def removeRange(self, start, end):
+        """Remove positions start to end-1"""
+
+        start = int(start)
+        end = int(end)
+        if end <= start:
+            return
+        i = bisect.bisect_right(self.ends, start)
+        j = bisect.bisect_left(self.starts, end)
+        if i >= j:
+            return
+        starts = []
+        ends = []
+        if self.starts[i] < start:
+            starts.append(self.starts[i])
+            ends.append(start)
+        if self.ends[j-1] > end:
+            starts.append(end)
+            ends.append(self.ends[j-1])
+        removed = sum(e-s for s,e in zip(self.starts[i:j], self.ends[i:j]))
+        kept = sum(e-s for s,e in zip(starts, ends))
+        self.starts[i:j] = starts
+        self.ends[i:j] = ends
+        self.size -= removed - kept
+        return
+
+    def append(self, i):
+        """Add a single position"""
+
+        self.addRange(i, i+1)
+        return
+
+    def remove(self, i):
+        """Remove a single position, raises ValueError if not selected"""
+
+        if i not in self:
+            raise ValueError('%s not in selection' %i)
+        self.removeRange(i, i+1)
+        return
+
+    def clear(self):
+        """Remove all positions"""
+
+        self.starts = []
+        self.ends = []
+        self.size = 0
+        return
+
+    def copy(self):
+        return Selection(self)
+
+    def intervals(self):
+        """List of (start, end) intervals"""
+
+        return list(zip(self.starts, self.ends))
+
+    def intersect(self, start, end):
+        """Intervals clipped to the range start to end-1, e.g. the rows
+        currently in view"""
+
+        i = bisect.bisect_right(self.ends, start)
+        j = bisect.bisect_left(self.starts, end)
+        return [(max(s, start), min(e, end))
+                for s,e in zip(self.starts[i:j], self.ends[i:j])]
+
+    def toIndexer(self):
+        """Positional indexer for use with iloc. A single interval gives a
+        slice so that no index array is created."""
+
+        if len(self.starts) == 1:
+            return slice(self.starts[0], self.ends[0])
+        if len(self.starts) == 0:
+            return np.array([], dtype=int)
+        return np.concatenate([np.arange(s, e) for s,e in zip(self.starts, self.ends)])
+
+    def toMask(self, length):
+        """Boolean array of the given length that is True for selected positions"""
+
+        mask = np.zeros(length, dtype=bool)
+        for s,e in zip(self.starts, self.ends):
+            mask[s:e] = True
+        return mask
+
+    def __array__(self, dtype=None, copy=None):
+
+        idx = self.toIndexer()
+        if isinstance(idx, slice):
+            idx = np.arange(idx.start, idx.stop)
+        if dtype is not None:
+            idx = idx.astype(dtype)
+        return idx
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, i):
+
+        try:
+            i = int(i)
+        except (TypeError, ValueError):
+            return False
+        k = bisect.bisect_right(self.starts, i) - 1
+        return k >= 0 and i < self.ends[k]
+
+    def __iter__(self):
+
+        for s,e in zip(self.starts, self.ends):
+            for i in range(s, e):
+                yield i
+
+    def __getitem__(self, i):
+
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += self.size
+        if i < 0 or i >= self.size:
+            raise IndexError('selection index out of range')
+        for s,e in zip(self.starts, self.ends):
+            if i < e - s:
+                return s + i
+            i -= e - s
+
+    def __eq__(self, other):
+
+        if isinstance(other, Selection):
+            return self.starts == other.starts and self.ends == other.ends
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+
+        s = ', '.join('%s:%s' %(s,e) for s,e in zip(self.starts, self.ends))
+        return 'Selection([%s])' %s
+
+def asSelection(items):
+    """Return items as a Selection, accepting a single position, a list or
+    a Selection"""
+
+    if isinstance(items, Selection):
+        return items
+    if items is None:
+        return Selection()
+    if np.ndim(items) == 0:
+        return Selection([items])
+    return Selection(items)
+
+def getIndexer(items):
+    """Positional indexer for a Selection or list of positions"""
+
+    if isinstance(items, Selection):
+        return items.toIndexer()
+    return np.asarray(items, dtype=int)
+
+def labelMask(index, labels):
+    """Boolean array of the positions in index holding any of the given
+    labels. All positions of a repeated label are included and labels
+    not in the index are ignored.
+    Args:
+        index: pandas index
+        labels: list, array or index of labels
+    """
+
+    if not isinstance(labels, pd.Index):
+        labels = pd.Index(labels)
+    if index.is_unique:
+        pos = index.get_indexer(labels)
+        mask = np.zeros(len(index), dtype=bool)
+        mask[pos[pos >= 0]] = True
+        return mask
+    return np.asarray(index.isin(labels), dtype=bool)
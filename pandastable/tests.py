@@ -27,10 +27,20 @@ try:
 except:
     from Tkinter import *
     from ttk import *
+import tempfile, shutil, types, pickle
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from .core import Table
-from .data import TableModel
+from .data import TableModel, PagedTableModel
+from . import data
 from .app import DataExplore
+from .dialogs import QueryDialog
+from .formatting import CellFormatter, formatColumn
+from .selection import Selection, labelMask
+from . import project, undo, util
+from .textindex import TrigramIndex
+from .formulas import FormulaEngine, getNames
 import unittest
 import threading
 
@@ -61,6 +71,15 @@ class App(Frame):
         pt.show()
         return
 
+def getTestData(rows=100):
+    """Frame with fixed column names, sample data can repeat names"""
+
+    rs = np.random.RandomState(1)
+    return pd.DataFrame({'a': rs.normal(5, 1, rows), 'b': rs.normal(1, 1, rows),
+                         'c': rs.randint(0, 100, rows),
+                         'label': rs.choice(['low','medium','high'], rows),
+                         'date': pd.date_range('1/1/2016', periods=rows, freq='h')})
+
 class TableTests(unittest.TestCase):
     """Pandastable tests - test anything involving table manipulation
        but avoid actions that trigger dialogs"""
@@ -127,6 +146,682 @@ class TableTests(unittest.TestCase):
     def quit(self):
         self.app.quit()
 
+class ModelTests(unittest.TestCase):
+    """Table model tests for row selections and undo"""
+
+    def testAddRemove(self):
+        """Ranges are merged and split"""
+
+        s = Selection.fromRange(0, 10)
+        s.addRange(20, 30)
+        s.addRange(10, 15)
+        self.assertEqual(s.intervals(), [(0,15),(20,30)])
+        self.assertEqual(len(s), 25)
+        s.removeRange(5, 25)
+        self.assertEqual(s.intervals(), [(0,5),(25,30)])
+        s.append(5)
+        s.remove(0)
+        self.assertEqual(list(s), [1,2,3,4,5,25,26,27,28,29])
+        self.assertEqual(len(s), 10)
+        self.assertRaises(ValueError, s.remove, 10)
+        self.assertIn(27, s)
+        self.assertNotIn(24, s)
+        self.assertEqual(s[5], 25)
+        self.assertEqual(s[-1], 29)
+        self.assertEqual(s, Selection([29,28,27,26,25,5,4,3,2,1]))
+        return
+
+    def testIntersect(self):
+        """Intervals clipped to the rows in view"""
+
+        s = Selection([1,2,3,10,11,50])
+        self.assertEqual(s.intersect(2, 11), [(2,4),(10,11)])
+        self.assertEqual(s.intersect(20, 40), [])
+        return
+
+    def testMask(self):
+        """Selections from and to boolean masks"""
+
+        mask = np.random.random(1000) > .5
+        s = Selection.fromMask(mask)
+        self.assertEqual(len(s), mask.sum())
+        self.assertTrue((s.toMask(1000) == mask).all())
+        self.assertTrue((np.asarray(s) == np.flatnonzero(mask)).all())
+        index = pd.Index(['a','b','a','c'])
+        self.assertEqual(list(labelMask(index, ['a','x'])), [True,False,True,False])
+        index = pd.Index([5,6,7])
+        self.assertEqual(list(labelMask(index, [7,5])), [True,False,True])
+        return
+
+    def changes(self):
+        """Functions making changes like the table actions, some in place"""
+
+        def setcells(df):
+            df.iloc[[1,5],0] = 99.0
+            return df
+        def addcol(df):
+            df['new'] = df.iloc[:,0]*2
+            return df
+        def droprows(df):
+            return df.drop(df.index[10:20])
+        def dropcol(df):
+            return df.drop(columns=[df.columns[1]])
+        def sort(df):
+            return df.sort_values(df.columns[0])
+        return [setcells, addcol, droprows, dropcol, sort]
+
+    def roundTrip(self, journal):
+        """Make each change and undo them all in turn"""
+
+        df = getTestData(100)
+        frames = [df.copy()]
+        for change in self.changes():
+            journal.push(df)
+            df = change(df)
+            frames.append(df.copy())
+        for prev in reversed(frames[:-1]):
+            df = journal.undo(df)
+            self.assertTrue(df.equals(prev))
+            self.assertTrue(df.columns.equals(prev.columns))
+        self.assertFalse(journal.canUndo())
+        self.assertIsNone(journal.undo(df))
+        return
+
+    def testUndo(self):
+        """Multi level undo in memory"""
+
+        journal = undo.UndoJournal(levels=10, budget=200)
+        self.roundTrip(journal)
+        return
+
+    def testSpill(self):
+        """Multi level undo with entries written to disk"""
+
+        journal = undo.UndoJournal(levels=10, budget=0)
+        journal.minspill = 0
+        self.roundTrip(journal)
+        journal.clear()
+        return
+
+    def testLevels(self):
+        """Only the given number of steps are kept"""
+
+        journal = undo.UndoJournal(levels=2)
+        df = pd.DataFrame({'a': range(5)})
+        for i in range(5):
+            journal.push(df)
+            df = df + 1
+        self.assertEqual(journal.undo(df).a[0], 4)
+        self.assertEqual(journal.undo(df - 1).a[0], 3)
+        self.assertFalse(journal.canUndo())
+        return
+
+    def testVersions(self):
+        """Only columns marked as changed are compared"""
+
+        model = TableModel(getTestData(100))
+        journal = undo.UndoJournal()
+        def store():
+            journal.push(model.df, versions=(model, model.getColumnVersions()))
+            model.markChanged()
+            journal.setVersions((model, model.getColumnVersions()))
+        store()
+        if not undo.copyOnWrite():
+            self.assertGreater(journal.getMemoryUsage(), 0)
+        prev = model.df.copy()
+        model.setValueAt(99.0, 3, 1)
+        #a change that isn't marked is not looked for
+        model.df.iloc[3, 0] = 99.0
+        store()
+        entry = journal.entries[0]
+        self.assertEqual(entry.kind, 'cells')
+        self.assertEqual(list(entry.data['data'].keys()), [1])
+        df = journal.undo(journal.undo(model.df))
+        self.assertTrue(df.iloc[:,1].equals(prev.iloc[:,1]))
+        self.assertEqual(df.iloc[3, 0], 99.0)
+        return
+
+class QueryTests(unittest.TestCase):
+    """Text search, filter and formula tests"""
+
+    def testSearchSort(self):
+        """Cached search values follow the rows when sorted"""
+
+        model = TableModel(getTestData(50))
+        col = list(model.df.columns).index('label')
+        strings = model.getStringColumn(col)
+        self.assertIs(model.getStringColumn(col), strings)
+        model.sortRows([col])
+        strings = model.getStringColumn(col)
+        self.assertTrue((strings.to_numpy() == model.df['label'].to_numpy()).all())
+        mask = model.containsMask(col, 'low')
+        self.assertTrue((mask == (model.df['label'] == 'low').to_numpy()).all())
+        return
+
+    def testTrigramIndex(self):
+        """Index lookups give the same rows as str.contains"""
+
+        words = ['Apple', 'apples', 'PINEAPPLE', 'grape', 'Grapefruit', 'ümlaut',
+                 'ÜMLAUT', 'pear', None, np.nan, 12345, 'app le']
+        s = pd.Series(words*20, dtype=object)
+        index = TrigramIndex(s)
+        index.build()
+        strings = s.astype('object').astype('str')
+        for text in ['app', 'APP', 'apple', 'grapef', 'ümla', 'UML', '234',
+                     'p le', 'xyz']:
+            for case in [True, False]:
+                mask = index.lookup(text, case, regex=False)
+                expected = strings.str.contains(text, case=case, regex=False)
+                self.assertTrue((mask == expected.to_numpy(bool)).all(), (text, case))
+        #too short or a regular expression can't use the index
+        self.assertIsNone(index.lookup('ap'))
+        self.assertIsNone(index.lookup('app.e'))
+        return
+
+    def testTextIndexSort(self):
+        """A new text index is made after sorting"""
+
+        df = pd.DataFrame({'name': ['x%s' %i for i in range(200)][::-1]})
+        model = TableModel(df)
+        model.getTextIndex(0, minrows=100)
+        index = model.textindexes[0]
+        index.thread.join()
+        self.assertIs(model.getTextIndex(0, minrows=100), index)
+        model.sortRows([0])
+        model.getTextIndex(0, minrows=100)
+        self.assertIsNot(model.textindexes[0], index)
+        self.assertNotEqual(model.textindexes[0].key, index.key)
+        model.textindexes[0].thread.join()
+        mask = model.containsMask(0, 'x19', minrows=100)
+        self.assertTrue((mask == model.df['name'].str.contains('x19').to_numpy()).all())
+        return
+
+    def testFilterCache(self):
+        """Cached filter masks are kept until the rows change"""
+
+        class Var(object):
+            def __init__(self, value):
+                self.value = value
+            def get(self):
+                return self.value
+            def set(self, value):
+                self.value = value
+        class Filter(object):
+            def __init__(self, *args):
+                self.args = args
+            def getFilter(self):
+                return self.args
+        model = TableModel(pd.DataFrame({'a': [3, 1, 2, 5], 'b': list('wxyz')}))
+        table = types.SimpleNamespace(model=model, redraw=lambda: None,
+                                      showAll=lambda: None, delete=lambda tag: None)
+        d = QueryDialog.__new__(QueryDialog)
+        d.table = table
+        d.queryvar = Var('a>1')
+        d.applyqueryvar = Var(1)
+        d.queryresultvar = Var('')
+        d.masks = OrderedDict()
+        d.filters = [Filter('b', 'z', 'not equals', 'AND')]
+        d.query()
+        self.assertEqual(list(model.rowview), [0, 2])
+        self.assertEqual(len(d.masks), 2)
+        #a change to another column keeps the filter mask
+        model.setRowView(None)
+        model.setValueAt(7, 1, 0)
+        d.query()
+        self.assertEqual(list(model.rowview), [0, 1, 2])
+        self.assertIn(('b', model.getColumnVersion('b'), 'not equals', 'z'), d.masks)
+        #sorted rows don't match the cached masks
+        model.setRowView(None)
+        model.sortRows([0])
+        d.query()
+        self.assertEqual(list(model.df.a.iloc[model.rowview]), [2, 3, 7])
+        d.removeFilterMasks('b', 'not equals', 'z')
+        self.assertEqual([k[0] for k in d.masks], ['query'])
+        table.model = TableModel(pd.DataFrame({'a': [9, 1], 'b': ['x', 'y']}))
+        d.query()
+        self.assertEqual(list(table.model.rowview), [0])
+        return
+
+    def testNames(self):
+        """Column names in the order they appear"""
+
+        self.assertEqual(getNames('where(a>1, b, c)'), ['a','b','c'])
+        self.assertEqual(getNames('x*(y+z) - sin(w) + x'), ['x','y','z','w'])
+        return
+
+    def testOrder(self):
+        """Formulae come after those they use"""
+
+        fe = FormulaEngine()
+        fe.add('d', 'c+b')
+        fe.add('c', 'b*2')
+        fe.add('b', 'a+1')
+        fe.add('e', 'x*2')
+        order = fe.getOrder()
+        self.assertEqual(sorted(order), ['b','c','d','e'])
+        self.assertLess(order.index('b'), order.index('c'))
+        self.assertLess(order.index('c'), order.index('d'))
+        self.assertEqual(fe.getDependents(['a']), {'b','c','d'})
+        self.assertEqual(fe.getOrder(['d','b']), ['b','d'])
+        return
+
+    def testCircular(self):
+        """Formulae that use their own result are rejected"""
+
+        fe = FormulaEngine()
+        fe.add('b', 'a+1')
+        fe.add('c', 'b*2')
+        self.assertRaises(ValueError, fe.add, 'a', 'c-1')
+        self.assertRaises(ValueError, fe.add, 'b', 'b*2')
+        self.assertNotIn('a', fe.formulae)
+        self.assertEqual(fe.formulae['b'], 'a+1')
+        return
+
+    def testRecalculate(self):
+        """Only formulae using changed columns are evaluated"""
+
+        model = TableModel(pd.DataFrame({'a': np.arange(5.0), 'x': np.ones(5)}))
+        fe = FormulaEngine()
+        fe.add('c', 'b*2')
+        fe.add('b', 'a+1')
+        fe.add('y', 'x*3')
+        updated, errors = fe.recalculate(model)
+        self.assertEqual(sorted(updated), ['b','c','y'])
+        self.assertEqual(errors, {})
+        model.df['a'] = 10.0
+        model.markChanged(['a'])
+        updated, errors = fe.recalculate(model)
+        self.assertEqual(updated, ['b','c'])
+        self.assertTrue((model.df['c'] == 22).all())
+        self.assertEqual(fe.getStale(model), [])
+        return
+
+class FileTests(unittest.TestCase):
+    """Reading and saving files"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.reader = None
+        return
+
+    def tearDown(self):
+        if self.reader is not None:
+            self.reader.close()
+        shutil.rmtree(self.path)
+        return
+
+    def checkPaged(self, model, df):
+        """Paged model gives the same values as the dataframe"""
+
+        self.assertEqual(model.getRowCount(), len(df))
+        self.assertEqual(list(model.df.columns), list(df.columns))
+        #blocks across chunk boundaries
+        for start, end in [(0,10), (95,305), (990,1000), (500,2000)]:
+            for col in range(3):
+                block = model.getDataBlock(start, end, col)
+                self.assertEqual(list(block), list(df.iloc[start:end, col]))
+        self.assertEqual(model.getValueAt(123, 2), 'x123')
+        self.assertFalse(model.setValueAt(1, 0, 0))
+        self.assertTrue(model.getDataFrame(100, 200).equals(df.iloc[100:200]))
+        return
+
+    def getPagedData(self):
+        return pd.DataFrame({'a': np.arange(1000),
+                             'b': np.random.random(1000),
+                             'c': ['x%s' %i for i in range(1000)]})
+
+    @unittest.skipIf(data.pa is None, 'needs pyarrow')
+    def testParquet(self):
+        """Read row groups of a parquet file"""
+
+        import pyarrow.parquet as pq
+        df = self.getPagedData()
+        filename = os.path.join(self.path, 'test.parquet')
+        table = data.pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, filename, row_group_size=100)
+        model = PagedTableModel(filename)
+        self.checkPaged(model, df)
+        return
+
+    @unittest.skipIf(data.pa is None, 'needs pyarrow')
+    def testFeather(self):
+        """Read record batches of a feather file, with a small cache"""
+
+        df = self.getPagedData()
+        filename = os.path.join(self.path, 'test.feather')
+        table = data.pa.Table.from_pandas(df, preserve_index=False)
+        import pyarrow.feather as feather
+        feather.write_feather(table, filename, chunksize=100)
+        model = PagedTableModel(filename, maxmemory=0.001)
+        self.checkPaged(model, df)
+        self.assertLessEqual(len(model.pages), 2)
+        return
+
+    @unittest.skipIf(data.pa is None, 'needs pyarrow')
+    def testEdit(self):
+        """Edit arrow typed columns and save them again"""
+
+        filename = os.path.join(self.path, 'test.feather')
+        df = pd.DataFrame({'f': [1.5, 2.5, 3.5], 'i': [1, 2, 3],
+                           's': ['a', 'b', 'c'],
+                           'd': pd.to_datetime(['2020-01-01','2020-01-02','2020-01-03'])})
+        TableModel(df).saveArrow(filename)
+        model = TableModel()
+        model.load(filename, '.feather')
+        self.assertIsInstance(model.df.f.dtype, pd.ArrowDtype)
+        self.assertTrue(model.setValueAt('7.25', 0, 0))
+        self.assertTrue(model.setValueAt('', 1, 0))
+        self.assertTrue(model.setValueAt('42', 0, 1))
+        self.assertFalse(model.setValueAt('x', 1, 1))
+        self.assertTrue(model.setValueAt(5.5, 2, 1))
+        self.assertTrue(model.setValueAt('z', 0, 2))
+        self.assertTrue(model.setValueAt('2021-06-01', 0, 3))
+        model.saveArrow(filename)
+        new = TableModel()
+        new.load(filename, '.feather')
+        df = new.df
+        self.assertEqual(df.f[0], 7.25)
+        self.assertTrue(pd.isnull(df.f[1]))
+        self.assertEqual(list(df.i), [42, 2, 5.5])
+        self.assertEqual(df.s[0], 'z')
+        self.assertEqual(df.d[0], pd.Timestamp('2021-06-01'))
+        return
+
+    def save(self, models):
+        """Save models as sheets, only writing the changed ones like
+        DataExplore.doSaveProject"""
+
+        sheets = [project.getSheet(name, models[name], {}, self.reader)
+                  for name in models]
+        self.reader = project.writeProject(os.path.join(self.path, 'test.dexpl'), sheets, self.reader)
+        for name in models:
+            models[name].savedversion = models[name].version
+        return
+
+    def testSortSave(self):
+        """Sorted rows are saved"""
+
+        model = TableModel(getTestData(50))
+        other = TableModel(getTestData(20))
+        self.save({'a': model, 'b': other})
+        self.assertFalse(model.isChanged())
+        model.sortRows([0], ascending=0)
+        self.assertTrue(model.isChanged())
+        self.assertFalse(other.isChanged())
+        self.save({'a': model, 'b': other})
+        df = self.reader.readData('a')
+        self.assertTrue(df.index.equals(model.df.index))
+        self.assertTrue(df.iloc[:,0].is_monotonic_decreasing)
+        #unchanged sheet was copied from the previous file
+        self.assertTrue(self.reader.readData('b').equals(other.df))
+        return
+
+    def testMutations(self):
+        """In place changes mark the model as changed"""
+
+        model = TableModel(getTestData(20))
+        actions = [lambda: model.sortRows(index=True),
+                   lambda: model.addColumn('new'),
+                   lambda: model.deleteColumn(0),
+                   lambda: model.setindex([0]),
+                   lambda: model.resetIndex(),
+                   lambda: model.copyIndex(),
+                   lambda: model.deleteCells([0], [0])]
+        for action in actions:
+            model.savedversion = model.version
+            action()
+            self.assertTrue(model.isChanged())
+        return
+
+    def testDtypes(self):
+        """Column types are kept when saved and read back"""
+
+        n = 10
+        df = pd.DataFrame({'int': np.arange(n, dtype='int32'),
+                           'float': np.linspace(0, 1, n).astype('float32'),
+                           'nullint': pd.array([1, None]*5, dtype='Int64'),
+                           'bool': np.arange(n) % 2 == 0,
+                           'cat': pd.Categorical(['a','b']*5),
+                           'date': pd.date_range('1/1/2020', periods=n, freq='D'),
+                           'tz': pd.date_range('1/1/2020', periods=n, tz='UTC'),
+                           'str': pd.Series(list('abcdefghij'), dtype='string')},
+                          index=pd.Index(np.arange(n)*2, name='id'))
+        #columns that aren't strings can't be stored as arrow
+        other = pd.DataFrame({1: ['x', 2.5]*5, 2: pd.Categorical(['a','b']*5)})
+        models = {'a': TableModel(df), 'b': TableModel(other)}
+        self.save(models)
+        for name in models:
+            pd.testing.assert_frame_equal(self.reader.readData(name),
+                                          models[name].df)
+        return
+
+    def writeCSV(self):
+        filename = os.path.join(self.path, 'test.csv')
+        getTestData(5000).to_csv(filename, index=False)
+        return filename
+
+    def read(self, reader):
+        """Run the reader and get all the chunks"""
+
+        reader.start()
+        reader.thread.join()
+        self.assertTrue(reader.done)
+        self.assertIsNone(reader.error)
+        return reader.getChunks()
+
+    def testChunks(self):
+        """Chunks together are the same as reading the whole file"""
+
+        filename = self.writeCSV()
+        reader = data.CSVChunkReader(filename, chunksize=1000, firstchunk=100)
+        chunks = self.read(reader)
+        self.assertEqual(len(chunks[0]), 100)
+        self.assertEqual(len(chunks), 6)
+        self.assertTrue(reader.isFinished())
+        self.assertEqual(reader.getProgress(), 1)
+        df = pd.concat(chunks)
+        pd.testing.assert_frame_equal(df, pd.read_csv(filename))
+        return
+
+    def testCancel(self):
+        """Reading stops when cancelled"""
+
+        filename = self.writeCSV()
+        reader = data.CSVChunkReader(filename, chunksize=1000, firstchunk=100)
+        reader.cancel()
+        self.assertEqual(self.read(reader), [])
+        self.assertTrue(reader.isFinished())
+        return
+
+    def testAppendRows(self):
+        """Appended rows keep the row view"""
+
+        filename = self.writeCSV()
+        reader = data.CSVChunkReader(filename, chunksize=1000, firstchunk=100)
+        chunks = self.read(reader)
+        model = TableModel(chunks[0])
+        model.setRowView([5, 2])
+        version = model.version
+        model.appendRows(chunks[1:])
+        self.assertEqual(len(model.df), 5000)
+        self.assertEqual(list(model.rowview), [5, 2])
+        self.assertGreater(model.version, version)
+        return
+
+class FormattingTests(unittest.TestCase):
+    """Cell text and redraw tests"""
+
+    def testFormatColumn(self):
+        """Display strings of column types"""
+
+        s = pd.Series([1.2345, np.nan, 0.012345, 1234.5])
+        self.assertEqual(list(formatColumn(s, 2)), ['1.23','','0.012','1234.50'])
+        self.assertEqual(formatColumn(s, 1, thousandseparator=',')[3], '1,234.5')
+        big = 2**53 + 1
+        s = pd.Series([big, -5, 0])
+        self.assertEqual(list(formatColumn(s)), [str(big),'-5','0'])
+        self.assertEqual(formatColumn(s, thousandseparator=',')[0], '{:,}'.format(big))
+        s = pd.Series([big, None], dtype='Int64')
+        self.assertEqual(list(formatColumn(s)), [str(big),''])
+        return
+
+    def testCache(self):
+        """Cached text is used until the data changes"""
+
+        model = TableModel(pd.DataFrame({'a': np.arange(1000, dtype=float)}))
+        f = CellFormatter(blocksize=100)
+        text = f.getText(model, 0, 0, 10)
+        self.assertIs(f.getText(model, 0, 0, 10).base, text.base)
+        model.setValueAt(7.5, 0, 0)
+        self.assertEqual(f.getText(model, 0, 0, 1)[0], '7.50')
+        model.sortRows([0], ascending=0)
+        self.assertEqual(f.getText(model, 0, 0, 1)[0], '999.00')
+        model.setRowView([5, 3])
+        self.assertEqual(list(f.getText(model, 0, 0, 2)), ['994.00','996.00'])
+        return
+
+    def testScheduler(self):
+        """Several redraw requests are rendered once"""
+
+        from .core import RedrawScheduler
+        class FakeTable(object):
+            def __init__(self):
+                self.idle = []
+                self.drawn = 0
+            def after_idle(self, func):
+                self.idle.append(func)
+                return len(self.idle)
+            def after_cancel(self, id):
+                return
+            def redrawVisible(self):
+                self.drawn += 1
+        table = FakeTable()
+        s = RedrawScheduler(table)
+        for i in range(5):
+            s.schedule('table')
+        self.assertEqual(len(table.idle), 1)
+        self.assertEqual(s.avoided, 4)
+        table.idle[0]()
+        self.assertEqual((table.drawn, s.renders), (1, 1))
+        s.schedule('table')
+        s.done('table')
+        s.flush()
+        self.assertEqual(table.drawn, 1)
+        self.assertEqual(s.avoided, 5)
+        return
+
+    def testFontMetrics(self):
+        """Text is measured from the widths of its characters"""
+
+        class Font(object):
+            def __init__(self):
+                self.calls = 0
+            def measure(self, text):
+                self.calls += 1
+                return 10 if text == 'W' else 5
+        fm = util.FontMetrics.__new__(util.FontMetrics)
+        fm.font = Font()
+        fm.maxsize = 2
+        fm.widths = {}
+        fm.measured = OrderedDict()
+        self.assertEqual(fm.measure('aWa'), 20)
+        self.assertEqual(fm.font.calls, 2)
+        self.assertEqual(fm.fitLength('aWaaa', 19), 2)
+        fm.measure('b')
+        fm.measure('c')
+        self.assertNotIn('aWa', fm.measured)
+        util.FONTMETRICS['test'] = fm
+        try:
+            self.assertEqual(util.getTextLength('aaaa', 40, font='test'), (20, 8))
+            self.assertEqual(util.getTextLength('aWaaa', 19, font='test'), (30, 2))
+        finally:
+            util.FONTMETRICS.pop('test')
+        return
+
+class UtilTests(unittest.TestCase):
+    """Util function tests"""
+
+    def testCompactDtypes(self):
+        """Columns get smaller dtypes and keep their values"""
+
+        n = 100
+        df = pd.DataFrame({'int': np.arange(n), 'half': np.arange(n)/2,
+                           'float': np.arange(n)/10,
+                           'label': ['low','high']*50,
+                           'name': ['x%s' %i for i in range(n)],
+                           'mixed': ['a', 1]*50})
+        new, report = util.compactDtypes(df)
+        self.assertEqual(list(report.index), list(df.columns))
+        self.assertEqual(new['int'].dtype, np.int8)
+        self.assertEqual(new['half'].dtype, np.float32)
+        self.assertEqual(new['float'].dtype, np.float64)
+        self.assertEqual(new['label'].dtype, 'category')
+        self.assertEqual(new['name'].dtype, df['name'].dtype)
+        self.assertIs(new['mixed'].dtype, df['mixed'].dtype)
+        for c in df.columns:
+            self.assertTrue((new[c].astype(df[c].dtype) == df[c]).all())
+            r = report.loc[c]
+            self.assertLessEqual(r['new memory'], r['memory'])
+            self.assertEqual(r['new dtype'], str(new[c].dtype))
+        self.assertTrue(df['int'].dtype == np.int64)
+        #categories can be turned off
+        new = util.compactDtypes(df, catratio=0)[0]
+        self.assertEqual(new['label'].dtype, df['label'].dtype)
+        return
+
+    def testEqualData(self):
+        """Compare saved settings that hold dataframes"""
+
+        df = pd.DataFrame({'a': [1, 2]})
+        meta = {'table': {'columnwidths': {'a': 80}, 'rowcolors': df}}
+        same = {'table': {'columnwidths': {'a': 80}, 'rowcolors': df.copy()}}
+        self.assertTrue(util.equalData(meta, same))
+        same['table']['columnwidths']['a'] = 90
+        self.assertFalse(util.equalData(meta, same))
+        self.assertFalse(util.equalData(meta, None))
+        self.assertFalse(util.equalData({'x': df}, {'x': df + 1}))
+        return
+
+    def testColumnWidths(self):
+        """Column widths count changes and are saved as a plain dict"""
+
+        cw = util.ColumnWidths({'a': 80})
+        v = cw.version
+        cw['a'] += 10
+        cw.update(b=50)
+        del cw['b']
+        cw.setdefault('c', 60)
+        cw.clear()
+        self.assertEqual(cw.version, v+5)
+        cw['a'] = 100
+        obj = types.SimpleNamespace(columnwidths=cw)
+        saved = util.getAttributes(obj)['columnwidths']
+        self.assertIs(type(saved), dict)
+        self.assertIs(type(pickle.loads(pickle.dumps(cw))), dict)
+        return
+
+    def testFileHead(self):
+        """File previews end at a whole line and guess the format"""
+
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'test.csv')
+            getTestData(1000).to_csv(filename, sep=';', index=False)
+            data, complete = util.readFileHead(filename, size=1000)
+            self.assertFalse(complete)
+            self.assertTrue(data.endswith(b'\n'))
+            self.assertLessEqual(len(data), 1000)
+            self.assertIs(util.readFileHead(filename, size=1000)[0], data)
+            self.assertEqual(util.sniffText(data),
+                             {'encoding': 'utf-8', 'delimiter': ';'})
+            self.assertTrue(util.readFileHead(filename)[1])
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual(util.sniffText('a,b\n\xe9,1\n'.encode('cp1252'))['encoding'],
+                         'cp1252')
+        return
+
+
 class DataExploreTests(unittest.TestCase):
     def setUp(self):
         return
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+    Implements a trigram index for substring searches of text columns.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import threading
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+#Each distinct value of a column is lower cased and split into the
+#three byte sequences (trigrams) of its utf-8 form. For every trigram the
+#index stores the sorted ids of the values containing it. A search text
+#can only be in values that have all of its trigrams, so only those
+#values are checked. Texts shorter than three bytes and regular
+#expressions can't use the index.
+
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+BLOCKSIZE = 2**24
+
+def sortedUnique(a):
+    """Sorted unique values of an array and the position of the first
+    of each in the sorted array"""
+
+    a = np.sort(a)
+    if len(a) == 0:
+        return a, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], a[1:] != a[:-1]]))
+    return a[starts], starts
+
+def isRegex(text):
+    """Check if text has regular expression characters"""
+
+    return len(REGEX_CHARS.intersection(text)) > 0
+
+def lowerText(strings):
+    """Lower case an array of strings"""
+
+    if pa is not None:
+        return pc.utf8_lower(pa.array(strings, type=pa.large_string()))
+    return [s.lower() for s in strings]
+
+def encodeStrings(strings):
+    """Lower case and utf-8 encode strings. Returns the joined bytes and
+    the offset of the start of each string, with the end as the last
+    offset."""
+
+    low = lowerText(strings)
+    if pa is not None:
+        bufs = low.buffers()
+        offsets = np.frombuffer(bufs[1], dtype=np.int64)
+        offsets = offsets[low.offset:low.offset+len(low)+1]
+        if bufs[2] is None:
+            data = np.zeros(0, dtype=np.uint8)
+        else:
+            data = np.frombuffer(bufs[2], dtype=np.uint8)
+        return data, offsets - offsets[0]
+    enc = [s.encode('utf-8') for s in low]
+    lens = np.fromiter((len(e) for e in enc), dtype=np.int64, count=len(enc))
+    offsets = np.concatenate([[0], np.cumsum(lens)])
+    return np.frombuffer(b''.join(enc), dtype=np.uint8), offsets
+
+def getTrigrams(data, offsets, start=0):
+    """Unique trigram and string id pairs as int64 keys with the trigram
+    in the upper bits.
+    Args:
+        data: bytes of the strings, see encodeStrings
+        offsets: string start offsets in data
+        start: id of the first string
+    """
+
+    n = len(data)
+    if n < 3:
+        return np.zeros(0, dtype=np.int64)
+    ids = np.repeat(np.arange(len(offsets)-1, dtype=np.int64), np.diff(offsets))
+    ids = ids[:-2]
+    d = data.astype(np.int64)
+    gram = (d[:-2] << 16) | (d[1:-1] << 8) | d[2:]
+    #trigrams must not run into the next string
+    valid = np.arange(3, n+1) <= offsets[ids+1]
+    keys = (gram[valid] << 32) | (ids[valid] + start)
+    return sortedUnique(keys)[0]
+
+class TrigramIndex(object):
+    """Index of the string values of a column for substring searches.
+    The index can be built in a worker thread with start().
+
+    Args:
+        values: pandas series of the column
+        key: anything identifying the version of the column indexed
+    """
+
+    def __init__(self, values, key=None):
+
+        self.values = values
+        self.key = key
+        self.ready = False
+        self.error = None
+        self.thread = None
+        return
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return
+
+    def run(self):
+        try:
+            self.build()
+        except Exception as e:
+            self.error = e
+        return
+
+    def build(self):
+        """Build the index"""
+
+        #same strings as TableModel.getStringColumn so results match
+        s = self.values.astype('object').astype('str')
+        self.values = None
+        codes, uniques = pd.factorize(s)
+        self.nrows = len(codes)
+        self.uniques = np.asarray(uniques, dtype=object)
+        #rows grouped by value, missing values are sorted first
+        self.codes = codes
+        order = np.argsort(codes, kind='stable')
+        self.order = order[np.count_nonzero(codes < 0):]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.uniques))
+        self.rowstarts = np.concatenate([[0], np.cumsum(counts)])
+
+        keys = []
+        i = 0
+        while i < len(self.uniques):
+            data, offsets = encodeStrings(self.uniques[i:i+100000])
+            #keep blocks small so memory use stays bounded
+            j = np.searchsorted(offsets, BLOCKSIZE, side='right') - 1
+            j = max(j, 1)
+            keys.append(getTrigrams(data[:offsets[j]], offsets[:j+1], i))
+            i += j
+        keys = np.sort(np.concatenate(keys)) if len(keys) > 0 else np.zeros(0, dtype=np.int64)
+        grams = keys >> 32
+        self.ids = (keys & 0xffffffff).astype(np.int32)
+        self.grams, starts = sortedUnique(grams)
+        self.gramstarts = np.concatenate([starts, [len(keys)]])
+        self.ready = True
+        return
+
+    def getCandidates(self, text):
+        """Ids of values that have all the trigrams of text, None if
+        text is too short"""
+
+        data, offsets = encodeStrings([text])
+        if len(data) < 3:
+            return None
+        d = data.astype(np.int64)
+        grams = set((d[:-2] << 16) | (d[1:-1] << 8) | d[2:])
+        postings = []
+        for g in grams:
+            i = np.searchsorted(self.grams, g)
+            if i >= len(self.grams) or self.grams[i] != g:
+                return np.zeros(0, dtype=np.int64)
+            postings.append(self.ids[self.gramstarts[i]:self.gramstarts[i+1]])
+        postings.sort(key=len)
+        cand = postings[0]
+        for p in postings[1:]:
+            cand = np.intersect1d(cand, p, assume_unique=True)
+            if len(cand) == 0:
+                break
+        return cand
+
+    def lookup(self, text, case=True, regex=True):
+        """Find the rows whose value contains text.
+        Args:
+            text: text to find
+            case: case sensitive search
+            regex: text is a regular expression, the index is only used
+                if it has no special characters
+        Returns:
+            boolean array of rows, None if the index can't be used
+        """
+
+        if self.ready == False:
+            return None
+        if regex == True and isRegex(text):
+            return None
+        cand = self.getCandidates(text)
+        if cand is None:
+            return None
+        vals = self.uniques[cand]
+        if case == True:
+            found = [text in v for v in vals]
+        else:
+            t = text.lower()
+            found = [t in v.lower() for v in vals]
+        matched = cand[np.array(found, dtype=bool)]
+        mask = np.zeros(self.nrows, dtype=bool)
+        if len(matched) > 1000:
+            mask[np.isin(self.codes, matched)] = True
+        elif len(matched) > 0:
+            starts = self.rowstarts
+            rows = [self.order[starts[i]:starts[i+1]] for i in matched]
+            mask[np.concatenate(rows)] = True
+        return mask
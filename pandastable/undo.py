@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+"""
+    Implements a multi-level undo history for tables.
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import os, shutil, tempfile
+import pickle
+import numpy as np
+import pandas as pd
+
+def copyOnWrite():
+    """Check if pandas copy on write is enabled"""
+
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except:
+        return False
+
+def snapshot(df):
+    """Copy of a dataframe to keep in the undo history. A shallow copy is
+    only made when copy on write is enabled, the data is then shared with
+    the table until one of them is changed. Otherwise this is a deep copy
+    that uses as much memory as the frame."""
+
+    if copyOnWrite():
+        return df.copy(deep=False)
+    return df.copy()
+
+def columnData(df, i):
+    """Numpy array for column i, without copying where possible"""
+
+    return df.iloc[:,i].to_numpy()
+
+def sameData(x, y):
+    """True if two arrays are views of the same memory"""
+
+    if x.dtype != y.dtype or x.shape != y.shape or x.strides != y.strides:
+        return False
+    return x.__array_interface__['data'][0] == y.__array_interface__['data'][0]
+
+def changedPositions(old, new):
+    """Positions where two columns of the same length differ. Returns
+    None if they can't be compared or have different types."""
+
+    if old.dtype != new.dtype:
+        return None
+    x = old.to_numpy()
+    y = new.to_numpy()
+    if sameData(x, y):
+        return np.array([], dtype=int)
+    try:
+        diff = np.asarray(x != y, dtype=bool)
+        diff &= ~(pd.isnull(x) & pd.isnull(y))
+    except Exception:
+        return None
+    return np.flatnonzero(diff)
+
+def columnDelta(old, new):
+    """What is needed to get the old column back from the new one, either
+    the changed values or the whole column if many have changed"""
+
+    pos = changedPositions(old, new)
+    if pos is None or len(pos) > len(old)//4:
+        return ('column', old.copy())
+    if len(pos) == 0:
+        return None
+    return ('values', pos, old.iloc[pos].copy())
+
+def applyColumnDelta(col, delta):
+
+    if delta[0] == 'column':
+        return delta[1]
+    pos, vals = delta[1], delta[2]
+    col = col.copy()
+    col.iloc[pos] = vals.to_numpy()
+    return col
+
+def dataSize(obj):
+    """Approximate bytes held by an undo entry"""
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=True, deep=False)))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, pd.Index):
+        return obj.memory_usage()
+    if isinstance(obj, dict):
+        return sum(dataSize(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(dataSize(v) for v in obj)
+    return 0
+
+def frameSize(df, other):
+    """Bytes used by columns of df that are not shared with other"""
+
+    size = 0
+    for i in range(len(df.columns)):
+        x = columnData(df, i)
+        if i < len(other.columns) and sameData(x, columnData(other, i)):
+            continue
+        size += x.nbytes
+    return size
+
+def makeDelta(before, after, same=None):
+    """Work out a compact record of the change from before to after so
+    that before can be rebuilt from after. Returns a (kind, data) tuple,
+    or None if the whole previous frame has to be kept, e.g. for reorders.
+    Args:
+        before: the previous frame
+        after: the current frame
+        same: positions of columns known not to have changed, these are
+            not compared
+    """
+
+    if same is None:
+        same = set()
+    sameindex = before.index.equals(after.index) and before.index.names == after.index.names
+    if sameindex and before.shape[1] == after.shape[1]:
+        #changed cells, types or column names
+        cols = {}
+        for i in range(before.shape[1]):
+            if i in same:
+                continue
+            d = columnDelta(before.iloc[:,i], after.iloc[:,i])
+            if d is not None:
+                cols[i] = d
+        return ('cells', {'columns': before.columns, 'data': cols})
+
+    if (sameindex and before.columns.is_unique and after.columns.is_unique):
+        #added or dropped columns
+        cols = {}
+        for c in before.columns:
+            if c in after.columns:
+                d = columnDelta(before[c], after[c])
+            else:
+                d = ('column', before[c].copy())
+            if d is not None:
+                cols[c] = d
+        return ('columns', {'columns': before.columns, 'data': cols})
+
+    if (len(after) < len(before) and before.columns.equals(after.columns)
+        and before.index.is_unique):
+        #dropped rows
+        keep = before.index.isin(after.index)
+        if not before.index[keep].equals(after.index):
+            return None
+        kept = before[keep]
+        for i in range(before.shape[1]):
+            pos = changedPositions(kept.iloc[:,i], after.iloc[:,i])
+            if pos is None or len(pos) > 0:
+                return None
+        return ('rows', {'keep': keep, 'dropped': before[~keep].copy()})
+    return None
+
+def applyDelta(kind, data, df):
+    """Rebuild the previous frame from the current one"""
+
+    if kind == 'frame':
+        return data
+    if kind == 'cells':
+        df = df.copy(deep=False)
+        for i in data['data']:
+            df.isetitem(i, applyColumnDelta(df.iloc[:,i], data['data'][i]))
+        df.columns = data['columns']
+        return df
+    if kind == 'columns':
+        cols = {}
+        for c in data['columns']:
+            if c in data['data']:
+                d = data['data'][c]
+                cols[c] = applyColumnDelta(df[c] if d[0] == 'values' else None, d)
+            else:
+                cols[c] = df[c]
+        new = pd.DataFrame(cols, index=df.index, copy=False)
+        new.columns = data['columns']
+        return new
+    if kind == 'rows':
+        keep = data['keep']
+        dropped = data['dropped']
+        new = pd.concat([df, dropped])
+        order = np.empty(len(keep), dtype=int)
+        order[keep] = np.arange(len(df))
+        order[~keep] = np.arange(len(df), len(new))
+        return new.iloc[order]
+    return None
+
+class UndoEntry(object):
+    """One step in the undo history"""
+
+    def __init__(self, kind, data, label=None):
+
+        self.kind = kind
+        self.data = data
+        self.label = label
+        #shape and columns of the frame the entry is applied to
+        self.target = None
+        #column versions of the table after the entry was made
+        self.versions = None
+        self.size = 0
+        self.filename = None
+        return
+
+class UndoJournal(object):
+    """Undo history for a table. The state before each change is first
+    kept as a reference to the previous frame which, with pandas copy on
+    write, shares memory with the table. When the next change is recorded
+    it is replaced by a delta such as the changed cells, added or dropped
+    columns or dropped rows. Entries over the memory budget are written
+    to a temporary folder and read back when needed.
+
+    Args:
+        levels: maximum number of undo steps
+        budget: memory budget in MB for entries kept in memory
+    """
+
+    def __init__(self, levels=20, budget=200):
+
+        self.levels = levels
+        self.budget = budget
+        self.entries = []
+        self.path = None
+        self.minspill = 2**16
+        return
+
+    def push(self, df, label=None, versions=None):
+        """Record the current frame before a change is made.
+        Args:
+            df: the current frame
+            label: name of the change
+            versions: the data source and a list of the version of each
+                column, see setVersions. Columns with the same version as
+                when the last entry was made are not compared
+        """
+
+        if len(self.entries) > 0:
+            self.compact(self.entries[-1], df, versions)
+        entry = UndoEntry('frame', snapshot(df), label)
+        if not copyOnWrite():
+            #the copy is not shared with the table
+            entry.size = dataSize(entry.data)
+        self.entries.append(entry)
+        self.trim()
+        return
+
+    def setVersions(self, versions):
+        """Set the column versions of the table for the newest entry,
+        once any changes made when it was stored are marked"""
+
+        if len(self.entries) > 0:
+            self.entries[-1].versions = versions
+        return
+
+    def getUnchanged(self, entry, df, versions):
+        """Positions of columns whose version is the same as when the
+        entry was made"""
+
+        old = entry.versions
+        if old is None or versions is None or old[0] is not versions[0]:
+            return None
+        if len(old[1]) != len(versions[1]) or len(versions[1]) != df.shape[1]:
+            return None
+        return set(i for i in range(len(old[1])) if old[1][i] == versions[1][i])
+
+    def compact(self, entry, df, versions=None):
+        """Replace the newest entry with a delta now that the frame it
+        leads to is known"""
+
+        if entry.kind != 'frame' or entry.target is not None:
+            return
+        before = entry.data
+        try:
+            delta = makeDelta(before, df, self.getUnchanged(entry, df, versions))
+        except Exception as e:
+            print ('undo: %s' %e)
+            delta = None
+        if delta is not None:
+            entry.kind, entry.data = delta
+            entry.size = dataSize(entry.data)
+        else:
+            entry.size = frameSize(before, df)
+        entry.target = (df.shape, df.columns)
+        return
+
+    def trim(self):
+        """Drop the oldest entries over the level limit and move entries
+        to disk if over the memory budget"""
+
+        while len(self.entries) > max(self.levels, 1):
+            self.remove(self.entries.pop(0))
+        limit = self.budget * 1024**2
+        used = sum(e.size for e in self.entries if e.filename is None)
+        for e in self.entries[:-1]:
+            if used <= limit:
+                break
+            #small entries are not worth writing out
+            if e.filename is not None or e.size < self.minspill:
+                continue
+            self.spill(e)
+            used -= e.size
+        return
+
+    def spill(self, entry):
+        """Write an entry to disk"""
+
+        if self.path is None:
+            self.path = tempfile.mkdtemp(prefix='pandastable_undo_')
+        fd, filename = tempfile.mkstemp(suffix='.pickle', dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry.data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        entry.filename = filename
+        entry.data = None
+        return
+
+    def load(self, entry):
+        """Get the data for an entry, reading it from disk if needed"""
+
+        if entry.filename is None:
+            return entry.data
+        with open(entry.filename, 'rb') as f:
+            data = pickle.load(f)
+        return data
+
+    def remove(self, entry):
+
+        if entry.filename is not None and os.path.exists(entry.filename):
+            os.remove(entry.filename)
+        entry.data = None
+        return
+
+    def canUndo(self):
+        return len(self.entries) > 0
+
+    def undo(self, df):
+        """Get the previous version of the frame.
+
+        Args:
+            df: the current table dataframe
+        Returns:
+            the previous dataframe or None if there is nothing to undo
+        """
+
+        if len(self.entries) == 0:
+            return
+        entry = self.entries.pop()
+        if entry.kind != 'frame' and entry.target is not None:
+            shape, columns = entry.target
+            if df.shape != shape or not df.columns.equals(columns):
+                print ('table has changed, cannot undo')
+                self.remove(entry)
+                self.clear()
+                return
+        try:
+            prev = applyDelta(entry.kind, self.load(entry), df)
+        except Exception as e:
+            print ('undo failed: %s' %e)
+            prev = None
+        self.remove(entry)
+        return prev
+
+    def clear(self):
+        """Remove all entries and any files"""
+
+        for e in self.entries:
+            self.remove(e)
+        self.entries = []
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+        return
+
+    def getMemoryUsage(self):
+        """Bytes held in memory by the history"""
+
+        return sum(e.size for e in self.entries if e.filename is None)
@@ -23,35 +23,214 @@ from __future__ import absolute_import, division, print_function
 try:
     from tkinter import *
     from tkinter.ttk import *
+    from tkinter import font as tkFont
 except:
     from Tkinter import *
     from ttk import *
+    import tkFont
 import math, time
 import os, types
 import string, copy
+import bisect, itertools
+import csv
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
 
 SCRATCH = None
+FONTMETRICS = {}
+FILEHEADS = OrderedDict()
+
+class FontMetrics(object):
+    """Caches character advance widths for a font so that text can be
+    measured without drawing it on a canvas.
+
+    Args:
+        font: font tuple or string, None for the default font
+        maxsize: number of measured strings to remember
+    """
+
+    def __init__(self, font=None, maxsize=20000):
+
+        if font is None:
+            self.font = tkFont.nametofont('TkDefaultFont')
+        else:
+            self.font = tkFont.Font(font=font)
+        self.maxsize = maxsize
+        self.widths = {}
+        self.measured = OrderedDict()
+        return
+
+    def getCharWidths(self, text):
+        """Get advance widths of each character, measuring new ones"""
+
+        widths = self.widths
+        for c in set(text) - widths.keys():
+            widths[c] = self.font.measure(c)
+        return [widths[c] for c in text]
+
+    def measure(self, text):
+        """Width of a string in pixels"""
+
+        m = self.measured
+        if text in m:
+            m.move_to_end(text)
+            return m[text]
+        width = sum(self.getCharWidths(text))
+        m[text] = width
+        if len(m) > self.maxsize:
+            m.popitem(last=False)
+        return width
+
+    def fitLength(self, text, w):
+        """Number of leading characters of text that fit in width w"""
+
+        prefix = list(itertools.accumulate(self.getCharWidths(text)))
+        return bisect.bisect_right(prefix, w)
+
+class ColumnWidths(dict):
+    """Dict of column widths that counts its changes, so column positions
+    only need to be rebuilt when the version is different"""
+
+    def __init__(self, *args, **kwargs):
+
+        dict.__init__(self, *args, **kwargs)
+        self.version = 0
+        return
+
+    def changed(self):
+        self.version += 1
+        return
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.changed()
+        return
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.changed()
+        return
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.changed()
+        return
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self.changed()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self.changed()
+        return item
+
+    def clear(self):
+        dict.clear(self)
+        self.changed()
+        return
+
+    def __reduce__(self):
+        #saved as a plain dict
+        return (dict, (dict(self),))
+
+def getFontMetrics(font=None):
+    """Get the shared metrics object for a font"""
+
+    if type(font) is list:
+        font = tuple(font)
+    if font not in FONTMETRICS:
+        FONTMETRICS[font] = FontMetrics(font)
+    return FONTMETRICS[font]
+
+def clearFontMetrics():
+    """Remove cached font metrics, needed if the tk root is destroyed"""
+
+    FONTMETRICS.clear()
+    return
 
 
 def getTextLength(text, w, font=None):
     """Get correct canvas text size (chars) that will fit in \
-    a given canvas width"""
+    a given canvas width. Uses cached font metrics rather than
+    measuring on a canvas.
 
-    global SCRATCH
-    if SCRATCH is None:
-        SCRATCH = Canvas()
-    scratch = SCRATCH
+    Returns:
+        text width in pixels and number of characters that fit
+    """
+
+    fm = getFontMetrics(font)
     length = len(text)
-    t = scratch.create_text((0,0), text=text, font=font)
-    b = scratch.bbox(t)
-    scratch.delete(t)
-    twidth = b[2]-b[0]
-    ratio = length/twidth
-    length = math.floor(w*ratio)
+    twidth = fm.measure(text)
+    if twidth == 0:
+        return twidth, length
+    if twidth <= w:
+        ratio = length/twidth
+        length = math.floor(w*ratio)
+    else:
+        length = fm.fitLength(text, w)
     return twidth,length
 
+def readFileHead(filename, size=262144):
+    """Read the start of a file, ending at the last complete line. Results
+    are cached by file name, size and modification time so previews of
+    the same file don't read it again.
+    Args:
+        filename: file to read
+        size: maximum bytes to read
+    Returns:
+        the bytes read and True if this is the whole file
+    """
+
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns, size)
+    if key in FILEHEADS:
+        FILEHEADS.move_to_end(key)
+        return FILEHEADS[key]
+    with open(filename, 'rb') as f:
+        data = f.read(size)
+    complete = len(data) >= st.st_size
+    if not complete:
+        end = data.rfind(b'\n')
+        if end >= 0:
+            data = data[:end+1]
+    FILEHEADS[key] = (data, complete)
+    if len(FILEHEADS) > 8:
+        FILEHEADS.popitem(last=False)
+    return data, complete
+
+def sniffText(data):
+    """Guess the encoding and delimiter of the start of a text file.
+    Args:
+        data: bytes from the file
+    Returns:
+        dict with encoding and delimiter keys
+    """
+
+    encoding = 'utf-8'
+    try:
+        text = data.decode(encoding)
+    except UnicodeDecodeError:
+        encoding = 'cp1252'
+        text = data.decode(encoding, errors='replace')
+    try:
+        dialect = csv.Sniffer().sniff(text[:65536], delimiters=',\t;| ')
+        delimiter = dialect.delimiter
+    except csv.Error:
+        delimiter = ','
+    return {'encoding': encoding, 'delimiter': delimiter}
+
 def check_multiindex(index):
     """Check if index is a multiindex"""
 
@@ -72,11 +251,71 @@ def getAttributes(obj):
         item = obj.__dict__[key]
         if type(item) in allowed:
             d[key] = item
+        elif type(item) is ColumnWidths:
+            d[key] = dict(item)
         elif type(item) is dict:
             if checkDict(item) == 1:
                 d[key] = item
     return d
 
+def compactSeries(s, catratio=0.5, arrowstrings=False):
+    """Convert a series to a smaller dtype that holds the same values.
+    Args:
+        s: pandas series
+        catratio: strings with fewer unique values than this fraction
+            of rows are made categories, 0 to never use categories
+        arrowstrings: store other string columns as pyarrow strings
+    Returns:
+        a new series, or s if it can't be made smaller
+    """
+
+    dtype = s.dtype
+    new = None
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+        if len(s) > 0:
+            new = pd.to_numeric(s, downcast='integer')
+    elif isinstance(dtype, np.dtype) and dtype == np.float64:
+        f = s.astype(np.float32)
+        if np.array_equal(f.to_numpy(np.float64), s.to_numpy(), equal_nan=True):
+            new = f
+    elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        if pd.api.types.infer_dtype(s, skipna=True) != 'string':
+            return s
+        if len(s) > 0 and s.nunique() < catratio * len(s):
+            new = s.astype('category')
+        elif arrowstrings == True and pd.api.types.is_object_dtype(dtype):
+            try:
+                new = s.astype('string[pyarrow]')
+            except ImportError:
+                pass
+    if new is None or new.dtype == dtype:
+        return s
+    if new.memory_usage(deep=True) >= s.memory_usage(deep=True):
+        return s
+    return new
+
+def compactDtypes(df, catratio=0.5, arrowstrings=False):
+    """Convert the columns of a dataframe to smaller dtypes without
+    changing any values. See compactSeries.
+    Returns:
+        the new dataframe and a report of the dtype and memory in bytes
+        of each column before and after
+    """
+
+    new = df.copy(deep=False)
+    rows = []
+    for i in range(len(df.columns)):
+        s = df.iloc[:, i]
+        c = compactSeries(s, catratio, arrowstrings)
+        if c is not s:
+            new.isetitem(i, c)
+        rows.append([str(s.dtype), str(c.dtype),
+                     s.memory_usage(index=False, deep=True),
+                     c.memory_usage(index=False, deep=True)])
+    report = pd.DataFrame(rows, index=df.columns,
+                          columns=['dtype','new dtype','memory','new memory'])
+    return new, report
+
 def setAttributes(obj, data):
     """Set attributes from a dict. Used for restoring settings in tables"""
 
@@ -87,6 +326,24 @@ def setAttributes(obj, data):
             print (e)
     return
 
+def equalData(a, b):
+    """Compare nested dicts and lists that can hold dataframes"""
+
+    if isinstance(a, (pd.DataFrame, pd.Series)) or isinstance(b, (pd.DataFrame, pd.Series)):
+        return type(a) is type(b) and a.equals(b)
+    if isinstance(a, dict):
+        if not isinstance(b, dict) or set(a.keys()) != set(b.keys()):
+            return False
+        return all(equalData(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        if type(a) is not type(b) or len(a) != len(b):
+            return False
+        return all(equalData(x, y) for x, y in zip(a, b))
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
 def checkDict(d):
     """Check a dict recursively for non serializable types"""
 
@@ -115,6 +372,31 @@ def getFonts():
      #print (matplotlib.font_manager.findfont(f))
      return fonts
 
+def lazyImport(name):
+    """Get a module that is only loaded when one of its attributes is
+    first used. Used for heavy optional modules such as matplotlib so
+    they don't slow down startup. Raises ImportError if the module is
+    not installed.
+    Args:
+        name: full module name e.g. 'pandastable.plotting'
+    """
+
+    import sys, importlib.util
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError('No module named %s' %name, name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent != '':
+        setattr(sys.modules[parent], child, module)
+    return module
+
 def adjustColorMap(cmap, minval=0.0, maxval=1.0, n=100):
     """Adjust colormap to avoid using white in plots"""
 